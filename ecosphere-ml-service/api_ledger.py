@@ -0,0 +1,181 @@
+"""
+API LEDGER
+Append-only record of OpenWeather API calls in SQLite, shared by every worker
+process. Each call is one INSERT plus an upsert of that day's counter inside a
+single write transaction, so SQLite's file lock makes the increment atomic
+across processes. Reading today's count is a primary-key lookup.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    day TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    success INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_counts (
+    day TEXT PRIMARY KEY,
+    calls INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    last_call TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def read_day_counts(db_path, day):
+    """
+    (calls, failures, last_call) for a day, opening the database read-only
+    
+    Nothing is created: a missing or uninitialised ledger reads as no calls.
+    """
+    if not os.path.exists(db_path):
+        return (0, 0, None)
+    try:
+        conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, timeout=5)
+        try:
+            row = conn.execute("SELECT calls, failures, last_call FROM daily_counts WHERE day = ?", (day,)).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return (0, 0, None)
+    return row or (0, 0, None)
+
+def read_json_day_counts(json_path, day):
+    """
+    (calls, failures, last_call) for a day from a legacy api_calls.json, read-only
+
+    Counts the day's history entries; the stored counter wins when it is for
+    that day, as in migrate_json_log (history was truncated to 1000 entries).
+    """
+    try:
+        with open(json_path, 'r') as f:
+            call_log = json.load(f)
+    except (OSError, ValueError):
+        return (0, 0, None)
+
+    entries = [entry for entry in call_log.get('history', []) if entry.get('timestamp', '')[:10] == day]
+    calls = len(entries)
+    if call_log.get('today') == day:
+        calls = max(calls, call_log.get('calls_today', 0))
+    failures = sum(1 for entry in entries if not entry.get('success', True))
+    last_call = max((entry['timestamp'] for entry in entries), default=None)
+    return (calls, failures, last_call)
+
+class ApiLedger:
+    def __init__(self, db_path, keep_days=90):
+        """
+        Args:
+            db_path: SQLite database file (created if missing)
+            keep_days: Call rows older than this are pruned when the ledger is opened
+        """
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        # WAL lets readers proceed while another process appends
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        cutoff = (datetime.now() - timedelta(days=keep_days)).strftime('%Y-%m-%d')
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM calls WHERE day < ?", (cutoff,))
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction taking SQLite's reserved lock up front"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def record(self, endpoint, success, when):
+        """Append one call and increment its day's counter, returns the day's call count"""
+        day = when.strftime('%Y-%m-%d')
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO calls (timestamp, day, endpoint, success) VALUES (?, ?, ?, ?)",
+                         (when.isoformat(), day, endpoint, int(bool(success))))
+            conn.execute(
+                "INSERT INTO daily_counts (day, calls, failures, last_call) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET calls = calls + 1, failures = failures + excluded.failures, "
+                "last_call = excluded.last_call",
+                (day, 0 if success else 1, when.isoformat())
+            )
+            return conn.execute("SELECT calls FROM daily_counts WHERE day = ?", (day,)).fetchone()[0]
+
+    def day_counts(self, day):
+        """(calls, failures, last_call) for a 'YYYY-MM-DD' day"""
+        with self._lock:
+            row = self._conn.execute("SELECT calls, failures, last_call FROM daily_counts WHERE day = ?",
+                                     (day,)).fetchone()
+        return row or (0, 0, None)
+
+    def calls_on(self, day):
+        return self.day_counts(day)[0]
+
+    def history(self, limit=100):
+        """Most recent calls, newest first"""
+        with self._lock:
+            rows = self._conn.execute("SELECT timestamp, endpoint, success FROM calls ORDER BY id DESC LIMIT ?",
+                                      (limit,)).fetchall()
+        return [{'timestamp': timestamp, 'endpoint': endpoint, 'success': bool(success)}
+                for timestamp, endpoint, success in rows]
+
+    def migrate_json_log(self, json_path):
+        """
+        Import a legacy api_calls.json once (history rows plus today's counter)
+
+        The JSON file is left in place; the import is recorded in the meta table.
+        """
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json_log'").fetchone():
+                return False
+
+            try:
+                with open(json_path, 'r') as f:
+                    call_log = json.load(f)
+            except FileNotFoundError:
+                call_log = None
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable call log {json_path}: {e}", file=sys.stderr)
+                call_log = None
+
+            if call_log:
+                for entry in call_log.get('history', []):
+                    conn.execute("INSERT INTO calls (timestamp, day, endpoint, success) VALUES (?, ?, ?, ?)",
+                                 (entry['timestamp'], entry['timestamp'][:10], entry.get('endpoint', 'onecall'),
+                                  int(bool(entry.get('success', True)))))
+                conn.execute(
+                    "INSERT OR REPLACE INTO daily_counts (day, calls, failures, last_call) "
+                    "SELECT day, COUNT(*), SUM(1 - success), MAX(timestamp) FROM calls GROUP BY day"
+                )
+                # History was truncated to 1000 entries; the stored counter is authoritative for its day
+                if call_log.get('today'):
+                    conn.execute(
+                        "INSERT INTO daily_counts (day, calls) VALUES (?, ?) "
+                        "ON CONFLICT(day) DO UPDATE SET calls = MAX(calls, excluded.calls)",
+                        (call_log['today'], call_log.get('calls_today', 0))
+                    )
+                print(f"Migrated {len(call_log.get('history', []))} calls from {json_path}", file=sys.stderr)
+
+            conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_json_log', ?)", (datetime.now().isoformat(),))
+            return bool(call_log)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,116 @@
+"""
+FORECAST BENCHMARK
+Throughput and latency of the whole forecast path (site resolution, weather
+snapshot, quota, prediction, result cache) against the replay weather backend,
+so it runs on an isolated machine without the OpenWeather API.
+
+Every run uses fresh temporary cache directories and three phases:
+- cold:  one request per distinct site, each fetching weather and predicting
+- warm:  the same requests again, answered from the result cache
+- mixed: concurrent requests over random sites and date ranges
+
+Usage: python benchmark_forecast.py [requests] [concurrency] [sites] [model_path]
+Inject upstream behaviour with WEATHER_REPLAY_LATENCY_MS, WEATHER_REPLAY_JITTER_MS
+and WEATHER_REPLAY_FAILURE_RATE (see weather_backends.py).
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Configure an isolated replay environment before the services are imported
+_workdir = tempfile.mkdtemp(prefix='forecast-benchmark-')
+os.environ.setdefault('WEATHER_BACKEND', 'replay')
+os.environ.setdefault('WEATHER_CACHE_DIR', os.path.join(_workdir, 'weather_cache'))
+os.environ.setdefault('RESULT_CACHE_DIR', os.path.join(_workdir, 'result_cache'))
+os.environ.setdefault('WEATHER_ARCHIVE_DIR', '')
+os.environ.setdefault('WEATHER_QUOTA_BURST', '1000000')
+os.environ.setdefault('WEATHER_MAX_CALLS_PER_DAY', '1000000')
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def percentiles(latencies):
+    values = np.array(latencies) * 1000.0
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p95_ms': round(float(np.percentile(values, 95)), 2),
+        'p99_ms': round(float(np.percentile(values, 99)), 2),
+        'max_ms': round(float(values.max()), 2)
+    }
+
+def run_phase(service, requests_list, concurrency):
+    """Run (start, end, lat, lon) requests, returns throughput, latency and failure counts"""
+    def one(request):
+        started = time.perf_counter()
+        result = service.predict_range(*request)
+        return time.perf_counter() - started, bool(result and result.get('success'))
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, requests_list))
+    else:
+        outcomes = [one(request) for request in requests_list]
+    elapsed = time.perf_counter() - started
+
+    stats = {
+        'requests': len(outcomes),
+        'failed': sum(1 for _, ok in outcomes if not ok),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(outcomes) / elapsed, 1) if elapsed else None
+    }
+    stats.update(percentiles([latency for latency, _ in outcomes]))
+    return stats
+
+def main():
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    n_sites = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    model_path = sys.argv[4] if len(sys.argv) > 4 else 'solar_forecast_openweather.pkl'
+
+    from node_service import SolarForecastService, get_weather_service
+
+    service = SolarForecastService(model_path)
+    rng = random.Random(0)
+
+    # Sites on distinct grid cells around Calgary
+    sites = [(51.0 + 0.05 * (i // 10), -114.3 + 0.05 * (i % 10)) for i in range(n_sites)]
+    today = datetime.now()
+    ranges = [(today.strftime('%Y-%m-%d'), (today + timedelta(days=days)).strftime('%Y-%m-%d')) for days in (0, 1, 2)]
+
+    cold = [(ranges[1][0], ranges[1][1], lat, lon) for lat, lon in sites]
+    mixed = [rng.choice(ranges) + rng.choice(sites) for _ in range(n_requests)]
+
+    report = {
+        'config': {
+            'requests': n_requests,
+            'concurrency': concurrency,
+            'sites': n_sites,
+            'model': service.model_name,
+            'workdir': _workdir
+        },
+        'cold': run_phase(service, cold, 1),
+        'warm': run_phase(service, cold, 1),
+        'mixed': run_phase(service, mixed, concurrency)
+    }
+
+    api_stats = get_weather_service().get_api_stats()
+    report['weather'] = {
+        'api_calls': api_stats['calls_today'],
+        'failed_calls': api_stats['failed_calls_today'],
+        'http': api_stats['http'],
+        'backend': api_stats['backend']
+    }
+    report['result_cache'] = service.result_cache.stats()
+    report['hour_cache'] = service.hour_cache.stats()
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
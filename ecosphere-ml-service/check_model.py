@@ -1,15 +1,37 @@
 import json
-import joblib
 import sys
 import os
 import traceback
 
+from model_artifacts import read_sidecar
+
 def main():
     try:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         model_path = os.path.join(current_dir, 'solar_forecast_openweather.pkl')
         
         print(f"Looking for model at: {model_path}", file=sys.stderr)
+        
+        # Answer from the sidecar unless a full load is requested
+        sidecar = read_sidecar(model_path) if '--full' not in sys.argv else None
+        if sidecar:
+            info = {
+                'success': True,
+                'model': {
+                    'type': sidecar['model_type'],
+                    'keys': sidecar['package_keys'],
+                    'loaded': True,
+                    'source': 'sidecar',
+                    'features': sidecar['feature_count'],
+                    'metrics': sidecar['metrics'],
+                    'fingerprint': sidecar['fingerprint'],
+                    'compiled': sidecar['compiled'] is not None,
+                    'compiled_max_abs_diff': sidecar.get('max_abs_diff')
+                }
+            }
+            print(json.dumps(info))
+            return
+        
         print(f"File exists: {os.path.exists(model_path)}", file=sys.stderr)
         
         if not os.path.exists(model_path):
@@ -18,6 +40,7 @@ def main():
         print(f"File size: {os.path.getsize(model_path)} bytes", file=sys.stderr)
         
         # Try to load with more specific error handling
+        import joblib
         model_data = joblib.load(model_path)
         
         print("Model loaded successfully!", file=sys.stderr)
@@ -10,11 +10,11 @@ current_datetime = datetime.now().isoformat()
 print(f"Running get_api_stats.py at {current_datetime}", file=sys.stderr)
 
 try:
-    # Try to import weather service to get actual stats
+    # Read the counters straight from the API ledger, without starting the weather service
     sys.path.append(os.path.dirname(__file__))
-    from weather_service import weather_service
+    from weather_config import read_ledger_stats
     
-    stats = weather_service.get_api_stats()
+    stats = read_ledger_stats()
     stats.update({
         "success": True,
         "generated_at": current_datetime,
@@ -0,0 +1,163 @@
+"""
+HOURLY WEATHER
+Processed forecast held as arrays with one row per hour slot, indexed by the
+hour offset from the first slot. A target time resolves to its row in O(1),
+and a list of target times becomes a WEATHER_FEATURES block in one step.
+"""
+import time
+import numpy as np
+from datetime import datetime
+
+from solar_features import WEATHER_DEFAULTS, WEATHER_FEATURES
+
+FORMAT = 'hourly-v1'
+
+def onecall_row(entry):
+    """WEATHER_FEATURES values for one OneCall hourly entry (with per-field fallbacks)"""
+    rain = entry.get('rain', {}).get('1h', 0)
+    snow = entry.get('snow', {}).get('1h', 0)
+
+    return [
+        entry.get('uvi', 0),
+        entry.get('temp', 15),
+        entry.get('humidity', 50),
+        entry.get('pressure', 1013) / 10.0,
+        entry.get('dew_point', 10),
+        entry.get('wind_speed', 3),
+        entry.get('wind_deg', 0),
+        entry.get('clouds', 50),
+        entry.get('visibility', 10000),
+        rain + snow
+    ]
+
+class HourlyWeather:
+    def __init__(self, start, values, present, weather_main, weather_description, fetched_at=None):
+        """
+        Args:
+            start: Epoch seconds of the first hour slot
+            values: (hours, len(WEATHER_FEATURES)) array, rows for absent hours are ignored
+            present: Boolean array, True where a forecast was aligned to the slot
+            weather_main: Condition per slot (None where absent)
+            weather_description: Description per slot (None where absent)
+            fetched_at: Epoch seconds when the forecast was fetched (default: now)
+        """
+        self.start = float(start)
+        self.values = np.asarray(values, dtype=np.float64).reshape(-1, len(WEATHER_FEATURES))
+        self.present = np.asarray(present, dtype=bool)
+        self.weather_main = list(weather_main)
+        self.weather_description = list(weather_description)
+        self.fetched_at = time.time() if fetched_at is None else float(fetched_at)
+
+    @property
+    def n_hours(self):
+        return len(self.present)
+
+    @property
+    def age_seconds(self):
+        return max(0.0, time.time() - self.fetched_at)
+
+    @classmethod
+    def from_onecall(cls, hourly, first_hour, hours=49, tolerance=3600):
+        """
+        Align OneCall hourly entries to whole-hour slots
+
+        Args:
+            hourly: The response's 'hourly' list (dicts with 'dt' epoch seconds)
+            first_hour: Local datetime of the first slot (truncated to the hour)
+            hours: Number of slots
+            tolerance: Maximum seconds between a slot and its nearest forecast
+        """
+        start = first_hour.replace(minute=0, second=0, microsecond=0).timestamp()
+        slots = start + 3600.0 * np.arange(hours)
+
+        values = np.tile(WEATHER_DEFAULTS, (hours, 1))
+        present = np.zeros(hours, dtype=bool)
+        weather_main = [None] * hours
+        weather_description = [None] * hours
+
+        if hourly:
+            entries = sorted(hourly, key=lambda entry: entry['dt'])
+            times = np.array([entry['dt'] for entry in entries], dtype=np.float64)
+
+            # Nearest entry per slot; the earlier one wins a tie
+            right = np.clip(np.searchsorted(times, slots), 0, len(times) - 1)
+            left = np.maximum(right - 1, 0)
+            nearest = np.where(slots - times[left] <= np.abs(times[right] - slots), left, right)
+            present = np.abs(times[nearest] - slots) <= tolerance
+
+            rows = np.array([onecall_row(entry) for entry in entries], dtype=np.float64)
+            values[present] = rows[nearest[present]]
+            for slot in np.flatnonzero(present):
+                condition = entries[nearest[slot]].get('weather', [{}])[0]
+                weather_main[slot] = condition.get('main', 'Clear')
+                weather_description[slot] = condition.get('description', 'clear sky')
+
+        return cls(start, values, present, weather_main, weather_description)
+
+    def slots(self, datetimes):
+        """Slot index per datetime, -1 where outside the forecast or not aligned"""
+        times = np.array([dt.timestamp() for dt in datetimes], dtype=np.float64)
+        index = np.rint((times - self.start) / 3600.0).astype(np.int64)
+
+        inside = (index >= 0) & (index < self.n_hours)
+        inside[inside] = self.present[index[inside]]
+        return np.where(inside, index, -1)
+
+    def block(self, datetimes):
+        """
+        Weather block for the given target times
+
+        Returns:
+            (matrix in WEATHER_FEATURES order with defaults where absent, slot index per row)
+        """
+        index = self.slots(datetimes)
+        matrix = np.tile(WEATHER_DEFAULTS, (len(index), 1))
+        matrix[index >= 0] = self.values[index[index >= 0]]
+        return matrix, index
+
+    def between(self, start, end):
+        """The slots falling in [start, end), sharing this forecast's arrays"""
+        first = min(max(0, int(np.ceil((start.timestamp() - self.start) / 3600.0))), self.n_hours)
+        last = min(max(first, int(np.ceil((end.timestamp() - self.start) / 3600.0))), self.n_hours)
+
+        return HourlyWeather(self.start + 3600.0 * first, self.values[first:last], self.present[first:last],
+                             self.weather_main[first:last], self.weather_description[first:last], self.fetched_at)
+
+    def hour(self, slot):
+        """One slot as a dict of WEATHER_FEATURES plus the condition text"""
+        details = dict(zip(WEATHER_FEATURES, self.values[slot].tolist()))
+        details['weather_main'] = self.weather_main[slot]
+        details['weather_description'] = self.weather_description[slot]
+        return details
+
+    def slot_time(self, slot):
+        return datetime.fromtimestamp(self.start + 3600.0 * slot)
+
+    def hours_by_date(self):
+        """{date: (hours with weather, of which daylight)} for logging"""
+        counts = {}
+        for slot in np.flatnonzero(self.present):
+            slot_time = self.slot_time(slot)
+            total, daylight = counts.get(slot_time.strftime("%Y-%m-%d"), (0, 0))
+            counts[slot_time.strftime("%Y-%m-%d")] = (total + 1, daylight + (6 <= slot_time.hour <= 21))
+        return counts
+
+    def to_dict(self):
+        """JSON-serializable form for the weather cache"""
+        return {
+            'format': FORMAT,
+            'start': self.start,
+            'values': self.values.tolist(),
+            'present': self.present.tolist(),
+            'weather_main': self.weather_main,
+            'weather_description': self.weather_description,
+            'fetched_at': self.fetched_at
+        }
+
+    @classmethod
+    def from_dict(cls, data, fetched_at=None):
+        """Inverse of to_dict, or None for other (e.g. legacy per-date) cache contents"""
+        if not isinstance(data, dict) or data.get('format') != FORMAT:
+            return None
+        return cls(data['start'], data['values'], data['present'], data['weather_main'], data['weather_description'],
+                   data.get('fetched_at', fetched_at))
@@ -0,0 +1,181 @@
+"""
+KV STORE
+Single-file key/value store in SQLite for the service's disk caches:
+- values are compressed blobs (msgpack when installed, JSON otherwise, then zlib)
+- every write is one transaction, so readers never see a partial entry
+- merge() reads and rewrites a key in one transaction, so concurrent
+  writers to the same key never lose each other's changes
+- expiry and age are indexed columns: a hit is one primary-key read, and
+  purging or evicting is a range query instead of a directory scan
+- an optional group column (e.g. a site) finds the newest entry of a group
+
+Shared by every worker process through SQLite's file locking (WAL mode).
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    grp TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+CREATE INDEX IF NOT EXISTS entries_stored ON entries (stored_at);
+CREATE INDEX IF NOT EXISTS entries_group ON entries (grp, stored_at);
+"""
+
+def encode(value):
+    """(codec, compressed blob) for a JSON-serializable value"""
+    if msgpack is not None:
+        return 'msgpack+zlib', zlib.compress(msgpack.packb(value, use_bin_type=True), 6)
+    return 'json+zlib', zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'), 6)
+
+def decode(codec, blob):
+    data = zlib.decompress(blob)
+    if codec == 'msgpack+zlib':
+        if msgpack is None:
+            raise ValueError("msgpack entry but msgpack is not installed")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+class KVStore:
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path: SQLite database file (created if missing)
+        """
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction taking SQLite's reserved lock up front"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _decoded(self, row):
+        """(key, stored_at, value) from a (key, stored_at, codec, value) row, None if undecodable"""
+        try:
+            return row[0], row[1], decode(row[2], row[3])
+        except (zlib.error, ValueError, TypeError):
+            return None
+
+    def get(self, key, now=None):
+        """(stored_at, value) for an unexpired key, or None"""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, stored_at, codec, value FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        entry = self._decoded(row) if row else None
+        return entry[1:] if entry else None
+
+    def latest(self, group, now=None):
+        """(key, stored_at, value) of the newest unexpired entry in a group, or None"""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, stored_at, codec, value FROM entries WHERE grp = ? AND expires_at > ? "
+                "ORDER BY stored_at DESC LIMIT 1", (group, now)
+            ).fetchone()
+        return self._decoded(row) if row else None
+
+    @staticmethod
+    def _write(conn, key, value, ttl_seconds, group, stored_at):
+        codec, blob = encode(value)
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, grp, stored_at, expires_at, codec, size, value) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, group, stored_at, stored_at + ttl_seconds, codec, len(blob), blob)
+        )
+        return len(blob)
+
+    def put(self, key, value, ttl_seconds, group=None, stored_at=None):
+        """Store a JSON-serializable value, returns its compressed size in bytes"""
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._transaction() as conn:
+            return self._write(conn, key, value, ttl_seconds, group, stored_at)
+
+    def merge(self, key, merge_fn, ttl_seconds, group=None, stored_at=None):
+        """
+        Read-modify-write of one key in a single transaction, so concurrent
+        writers (threads or processes) never lose each other's changes
+
+        Args:
+            merge_fn: Called with the current unexpired value (None if missing),
+                      returns the value to store
+
+        Returns:
+            The stored value
+        """
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT key, stored_at, codec, value FROM entries WHERE key = ? AND expires_at > ?", (key, stored_at)
+            ).fetchone()
+            entry = self._decoded(row) if row else None
+            value = merge_fn(entry[2] if entry else None)
+            self._write(conn, key, value, ttl_seconds, group, stored_at)
+        return value
+
+    def delete(self, key):
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount
+
+    def purge_expired(self, now=None):
+        """Delete expired entries, returns how many"""
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+
+    def evict(self, max_entries=None, max_bytes=None):
+        """Delete the oldest entries until within max_entries / max_bytes, returns the evicted keys"""
+        evicted = []
+        with self._transaction() as conn:
+            count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            if ((max_entries is None or count <= max_entries) and
+                    (max_bytes is None or total_bytes <= max_bytes)):
+                return evicted
+
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY stored_at").fetchall():
+                if ((max_entries is None or count <= max_entries) and
+                        (max_bytes is None or total_bytes <= max_bytes)):
+                    break
+                evicted.append(key)
+                count -= 1
+                total_bytes -= size
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in evicted])
+        return evicted
+
+    def usage(self):
+        """(entries, compressed bytes) currently stored"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,218 @@
+"""
+MODEL ARTIFACTS
+Small JSON sidecar plus memory-mappable array payloads written next to a
+joblib model package:
+
+    solar_forecast_openweather.pkl            full package (training / fallback)
+    solar_forecast_openweather.sidecar.json   feature names, metrics, model type, fingerprint
+    solar_forecast_openweather.arrays/        compiled tree arrays, one .npy each
+
+Health checks read only the sidecar; serving workers np.load the arrays with
+mmap_mode='r' so every process shares one page-cached copy. Arrays are only
+kept when the compiled model matches the original on threshold probe rows.
+
+Usage: python model_artifacts.py <model_package.pkl>
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+FORMAT_VERSION = 2
+
+# Largest prediction difference (model output units) allowed for the compiled arrays
+COMPILED_TOLERANCE = 1e-3
+
+def sidecar_path(model_path):
+    """Sidecar JSON path for a model package"""
+    return os.path.splitext(model_path)[0] + '.sidecar.json'
+
+def arrays_path(model_path):
+    """Directory holding the compiled .npy arrays for a model package"""
+    return os.path.splitext(model_path)[0] + '.arrays'
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def package_stamp(model_path):
+    """Identity of a package file on disk: name, size, mtime and content hash"""
+    stat = os.stat(model_path)
+    return {
+        'package': os.path.basename(model_path),
+        'package_size': stat.st_size,
+        'package_mtime_ns': stat.st_mtime_ns,
+        'fingerprint': file_fingerprint(model_path)
+    }
+
+def package_matches(metadata, model_path):
+    """
+    Whether metadata stamped by package_stamp() still describes the package at model_path
+
+    Compiled-only deployments may ship without the package, which counts as a match.
+    """
+    if not os.path.exists(model_path):
+        return True
+    stat = os.stat(model_path)
+    return stat.st_size == metadata.get('package_size') and stat.st_mtime_ns == metadata.get('package_mtime_ns')
+
+def package_info(package):
+    """Sidecar metadata fields taken from an unpickled model package"""
+    from tree_ensemble import json_scalars
+
+    model = package.get('model')
+    feature_names = list(package.get('feature_names') or [])
+
+    return {
+        'model_type': type(model).__name__,
+        'model_name': package.get('model_name', type(model).__name__),
+        'feature_names': feature_names,
+        'feature_count': len(feature_names),
+        'metrics': json_scalars(package.get('metrics')),
+        'training_info': json_scalars(package.get('training_info')),
+        'package_keys': list(package.keys())
+    }
+
+def write_artifacts(model_path, package=None):
+    """
+    Write the sidecar and compiled arrays for a saved model package
+
+    Args:
+        model_path: Path of the joblib package already written to disk
+        package: The package dict, if already in memory (avoids reloading it)
+
+    Returns:
+        The sidecar dict ('compiled' is None when the model cannot be compiled
+        or the compiled arrays disagree with the original model)
+    """
+    from tree_ensemble import compile_model, max_probe_diff
+
+    if package is None:
+        import joblib
+        package = joblib.load(model_path)
+
+    sidecar = package_info(package)
+
+    directory = arrays_path(model_path)
+    sidecar['compiled'] = None
+    try:
+        ensemble = compile_model(package['model'], package.get('scaler'), sidecar['feature_count'] or None)
+
+        # Compare against the original model on rows around every split
+        max_abs_diff = max_probe_diff(ensemble, package['model'], package.get('scaler'), sidecar['feature_count'] or None)
+        sidecar['max_abs_diff'] = max_abs_diff
+        if max_abs_diff <= COMPILED_TOLERANCE:
+            ensemble.save_arrays(directory)
+            sidecar['compiled'] = {
+                'arrays': os.path.basename(directory),
+                'n_trees': ensemble.n_trees,
+                'n_nodes': ensemble.n_nodes,
+                'max_depth': ensemble.max_depth,
+                'bias': ensemble.bias,
+                'scaler_folded': package.get('scaler') is not None,
+                'max_abs_diff': max_abs_diff
+            }
+        else:
+            print(f"Compiled arrays skipped: max abs difference {max_abs_diff:.3e} "
+                  f"exceeds {COMPILED_TOLERANCE:.0e}", file=sys.stderr)
+    except ValueError as e:
+        print(f"Compiled arrays skipped: {e}", file=sys.stderr)
+
+    # Never leave arrays from an earlier model next to a package they were not checked against
+    if sidecar['compiled'] is None and os.path.isdir(directory):
+        shutil.rmtree(directory, ignore_errors=True)
+
+    sidecar.update(package_stamp(model_path))
+    sidecar.update({
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.now().isoformat()
+    })
+
+    # Write atomically so readers never see a partial sidecar
+    path = sidecar_path(model_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f, indent=2)
+    os.replace(tmp_path, path)
+
+    return sidecar
+
+def read_sidecar(model_path):
+    """
+    Read the sidecar for a model package without unpickling anything
+
+    Returns None when there is no sidecar, or when the package beside it was
+    replaced after the sidecar was written (size or mtime changed).
+    """
+    path = sidecar_path(model_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if sidecar.get('format_version') != FORMAT_VERSION:
+        return None
+
+    if not package_matches(sidecar, model_path):
+        print(f"Sidecar {path} is stale, ignoring", file=sys.stderr)
+        return None
+
+    return sidecar
+
+def load_compiled(model_path, sidecar=None, mmap_mode='r'):
+    """Load the compiled arrays described by the sidecar, or None if there are none"""
+    sidecar = sidecar or read_sidecar(model_path)
+    if not sidecar or not sidecar.get('compiled'):
+        return None
+
+    from tree_ensemble import CompiledTreeEnsemble
+
+    compiled = sidecar['compiled']
+    directory = os.path.join(os.path.dirname(os.path.abspath(model_path)), compiled['arrays'])
+    if not os.path.isdir(directory):
+        return None
+
+    return CompiledTreeEnsemble.load_arrays(directory, compiled['bias'], compiled['max_depth'],
+                                            metadata=sidecar, mmap_mode=mmap_mode)
+
+def load_serving_model(model_path, mmap_mode='r'):
+    """
+    Load a model for prediction, preferring the memory-mapped compiled arrays
+
+    Returns:
+        (model, scaler, info) - scaler is None for compiled models (already folded);
+        info holds the sidecar fields (feature_names, metrics, model_type, ...)
+    """
+    sidecar = read_sidecar(model_path)
+    model = load_compiled(model_path, sidecar, mmap_mode)
+    if model is not None:
+        return model, None, sidecar
+
+    import joblib
+    package = joblib.load(model_path)
+    return package['model'], package.get('scaler'), sidecar or package_info(package)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python model_artifacts.py <model_package.pkl>")
+        sys.exit(1)
+
+    sidecar = write_artifacts(sys.argv[1])
+    print(f"Sidecar saved to: {sidecar_path(sys.argv[1])}")
+    if sidecar['compiled']:
+        print(f"Arrays saved to: {arrays_path(sys.argv[1])} ({sidecar['compiled']['n_trees']} trees)")
+    if 'max_abs_diff' in sidecar:
+        print(f"Max abs difference vs original model on probe rows: {sidecar['max_abs_diff']:.3e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,69 @@
 import sys
+import hashlib
 import json
-import joblib
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 import os
-import time
+import struct
+import warnings
 from pathlib import Path
 
-# Import weather service - ensure it's in the same directory
-try:
-    from weather_service import weather_service
-    print(f"Weather service imported successfully", file=sys.stderr)
-except ImportError as e:
-    print(f"Failed to import weather_service: {e}", file=sys.stderr)
-    # Create a dummy weather service
-    class DummyWeatherService:
-        def get_weather_forecast(self, *args, **kwargs):
-            print(f"Using dummy weather service (no real data)", file=sys.stderr)
-            return None
-        def get_api_stats(self):
-            return {'calls_today': 0, 'max_calls_per_day': 950, 'remaining_calls': 950}
-    
-    weather_service = DummyWeatherService()
+from solar_features import FeaturePlan, WEATHER_FEATURES, weather_matrix
+import model_artifacts
+from result_cache import HourlyPredictionCache, ResultCache
+import scaler_folding
+from single_flight import SingleFlight
+from site_registry import site_registry
+from tree_ensemble import CompiledTreeEnsemble, load_export
+from weather_config import backend_mode, read_ledger_stats
+from weather_prefetch import WeatherPrefetcher, parse_sites
+
+# The scaler was fitted on a DataFrame; serving passes arrays already in training column order
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+class DummyWeatherService:
+    def get_weather_forecast(self, *args, **kwargs):
+        print(f"Using dummy weather service (no real data)", file=sys.stderr)
+        return None
+    def get_api_stats(self):
+        return {'calls_today': 0, 'max_calls_per_day': 950, 'remaining_calls': 950}
+
+# Weather service is imported and built on first use, so runs without weather never load it
+_weather_service = None
+
+def get_weather_service():
+    """The process-wide WeatherService, or a dummy if it cannot be imported"""
+    global _weather_service
+    if _weather_service is None:
+        try:
+            # Import weather service - ensure it's in the same directory
+            from weather_service import get_weather_service as get_service
+            _weather_service = get_service()
+        except ImportError as e:
+            print(f"Failed to import weather_service: {e}", file=sys.stderr)
+            _weather_service = DummyWeatherService()
+    return _weather_service
+
+def weather_api_stats():
+    """API usage counters, read-only from the ledger unless this process already uses the weather service"""
+    if _weather_service is not None:
+        return _weather_service.get_api_stats()
+    return read_ledger_stats()
 
 class SolarForecastService:
-    def __init__(self, model_path='solar_forecast_openweather.pkl'):
-        """Load trained model"""
+    def __init__(self, model_path='solar_forecast_openweather.pkl', fold_scaler=None, compiled=None):
+        """
+        Load trained model
+        
+        Args:
+            model_path: Model package (.pkl) or compiled model (.npz) path, relative to this script
+            fold_scaler: Fold the scaler into the tree thresholds so serving skips
+                scaler.transform (defaults to the SOLAR_FOLD_SCALER env var)
+            compiled: Serve compiled tree arrays instead of unpickling the package, so
+                sklearn/xgboost/lightgbm are never imported (defaults to the
+                SOLAR_COMPILED_MODEL env var). Uses the memory-mapped arrays from a
+                fresh sidecar, falling back to a .npz exported from the same package.
+        """
         print(f"Loading ML model from {model_path}", file=sys.stderr)
         
         try:
@@ -34,24 +71,92 @@ class SolarForecastService:
             if not os.path.isabs(model_path):
                 model_path = os.path.join(os.path.dirname(__file__), model_path)
             
-            # Load the model package
-            self.model_data = joblib.load(model_path)
-            self.model = self.model_data['model']
-            self.feature_names = self.model_data['feature_names']
-            self.scaler = self.model_data['scaler']
-            self.metrics = self.model_data.get('metrics', {})
+            if compiled is None:
+                setting = os.getenv('SOLAR_COMPILED_MODEL', '').lower()
+                compiled = setting in ('1', 'true', 'yes')
             
-            print(f"Model loaded: {type(self.model).__name__}", file=sys.stderr)
+            # Flat tree arrays with the scaler already folded in (see tree_ensemble.py)
+            compiled_model = None
+            # File the model was actually read from (hashed when nothing else identifies it)
+            self.model_file = model_path
+            if model_path.endswith('.npz'):
+                compiled_model = CompiledTreeEnsemble.load(model_path)
+            elif compiled:
+                # Both sources are ignored once the package beside them has been replaced
+                compiled_model = model_artifacts.load_compiled(model_path)
+                if compiled_model is None:
+                    compiled_model = load_export(model_path)
+                    if compiled_model is not None:
+                        self.model_file = os.path.splitext(model_path)[0] + '.npz'
+                if compiled_model is None:
+                    print(f"No compiled arrays for {model_path}, loading package", file=sys.stderr)
+            compiled = compiled_model is not None
+            
+            if compiled:
+                self.model_data = None
+                self.model = compiled_model
+                self.model_name = self.model.metadata.get('model_type', 'CompiledTreeEnsemble')
+                self.feature_names = self.model.metadata['feature_names']
+                self.scaler = None
+                self.metrics = self.model.metadata.get('metrics', {})
+                print(f"Compiled model loaded ({self.model.n_trees} trees)", file=sys.stderr)
+            else:
+                # Load the model package
+                import joblib
+                self.model_data = joblib.load(model_path)
+                self.model = self.model_data['model']
+                self.model_name = type(self.model).__name__
+                self.feature_names = self.model_data['feature_names']
+                self.scaler = self.model_data['scaler']
+                self.metrics = self.model_data.get('metrics', {})
+            
+            print(f"Model loaded: {self.model_name}", file=sys.stderr)
             print(f"R² score: {self.metrics.get('r2', 0):.3f}", file=sys.stderr)
             print(f"Features: {len(self.feature_names)}", file=sys.stderr)
             
+            # Compile the feature column plan once per model
+            self.feature_plan = FeaturePlan(self.feature_names)
+            if self.feature_plan.missing_features:
+                print(f"Missing {len(self.feature_plan.missing_features)} features (filled with defaults): "
+                      f"{', '.join(self.feature_plan.missing_features)}", file=sys.stderr)
+            
+            # Optionally fold the scaler into the model (unfolded model kept for verification)
+            if fold_scaler is None:
+                fold_scaler = os.getenv('SOLAR_FOLD_SCALER', '').lower() in ('1', 'true', 'yes')
+            self.unfolded_model = self.model
+            self.scaler_folded = compiled
+            if fold_scaler and not compiled:
+                self._fold_scaler()
+            
             # Default coordinates (Calgary)
             self.lat = 51.0447
             self.lon = -114.0719
             
-            # Result cache
-            self.result_cache_dir = Path(__file__).parent / 'result_cache'
-            self.result_cache_dir.mkdir(exist_ok=True)
+            # Result cache (in-process LRU in front of a bounded disk store)
+            # Results computed from replayed weather are kept apart from live ones
+            default_result_dir = Path(__file__).parent / 'result_cache'
+            if backend_mode() == 'replay':
+                default_result_dir = default_result_dir / 'replay'
+            self.result_cache_dir = Path(os.getenv('RESULT_CACHE_DIR') or default_result_dir)
+            self.result_cache = ResultCache(
+                self.result_cache_dir,
+                ttl_seconds=600,
+                max_entries=int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '500')),
+                max_bytes=int(float(os.getenv('RESULT_CACHE_MAX_MB', '50')) * 1024 * 1024)
+            )
+            
+            # Model fingerprint scopes every prediction cache entry to this exact model
+            self.model_fingerprint = self._model_fingerprint(model_path)
+            print(f"Model fingerprint: {self.model_fingerprint}", file=sys.stderr)
+            
+            # Per-target-hour predictions, reused while the weather for that hour is unchanged
+            self.hour_cache = HourlyPredictionCache(self.result_cache_dir / 'hours', self.model_fingerprint)
+            
+            # Lock files coalescing concurrent computations of the same uncached result
+            self.single_flight = SingleFlight(self.result_cache_dir / 'locks')
+            
+            # Started by serve() for long-lived workers
+            self.weather_prefetcher = None
             
             # Print first 10 features for debugging
             print(f"First 10 features:", file=sys.stderr)
@@ -64,160 +169,145 @@ class SolarForecastService:
             traceback.print_exc(file=sys.stderr)
             raise
     
+    def _fold_scaler(self):
+        """Replace the model with an equivalent one that takes unscaled features"""
+        try:
+            self.model = scaler_folding.fold_scaler(self.unfolded_model, self.scaler, len(self.feature_names))
+            self.scaler_folded = True
+            print(f"Scaler folded into {type(self.unfolded_model).__name__} thresholds", file=sys.stderr)
+        except ValueError as e:
+            print(f"Scaler folding skipped: {e}", file=sys.stderr)
+    
+    def verify_scaler_folding(self, tolerance=1e-3, seed=0):
+        """
+        Compare the folded and unfolded prediction paths on synthetic inputs
+        
+        Every hour of a year is paired with random weather spanning plausible
+        Calgary ranges, so all time features and most weather splits are exercised.
+        """
+        if self.scaler is None:
+            return {'success': False, 'error': 'Compiled model has no separate scaler path to compare against'}
+        if not self.scaler_folded:
+            self._fold_scaler()
+        if not self.scaler_folded:
+            return {'success': False, 'error': f"Scaler folding not supported for {type(self.unfolded_model).__name__}"}
+        
+        timestamps = np.arange('2024-01-01T00', '2025-01-01T00', dtype='datetime64[h]')
+        
+        # Uniform ranges in WEATHER_FEATURES order
+        low = np.array([0.0, -35.0, 10.0, 98.0, -40.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+        high = np.array([11.0, 35.0, 100.0, 104.0, 25.0, 20.0, 360.0, 100.0, 10000.0, 10.0])
+        rng = np.random.default_rng(seed)
+        weather = rng.uniform(low, high, size=(len(timestamps), len(WEATHER_FEATURES)))
+        
+        features = self.feature_plan.build(timestamps, weather)
+        report = scaler_folding.verify_folding(self.unfolded_model, self.model, self.scaler, features, tolerance)
+        report['success'] = True
+        report['model_type'] = type(self.unfolded_model).__name__
+        report['folded_model_type'] = type(self.model).__name__
+        return report
+    
+    def _model_fingerprint(self, model_path):
+        """
+        Short, restart-stable identity of the loaded model
+        
+        Uses the package content hash from the sidecar or export metadata when present,
+        otherwise the training timestamp recorded in the model metadata, otherwise
+        hashes the file the model was loaded from.
+        """
+        sidecar = self.model.metadata if self.model_data is None else model_artifacts.read_sidecar(model_path)
+        if sidecar and sidecar.get('fingerprint'):
+            return sidecar['fingerprint'][:16]
+        
+        metadata = sidecar or self.model_data
+        training_timestamp = (metadata.get('training_info') or {}).get('timestamp')
+        if training_timestamp:
+            identity = f"{self.model_name}|{training_timestamp}|{','.join(self.feature_names)}"
+            return hashlib.sha256(identity.encode()).hexdigest()[:16]
+        
+        return model_artifacts.file_fingerprint(self.model_file)[:16]
+    
     def _get_result_cache_key(self, start_date, end_date, lat, lon, use_weather):
-        """Generate cache key for results"""
-        import hashlib
-        cache_str = f"{start_date}_{end_date}_{lat}_{lon}_{use_weather}"
+        """Generate cache key for results (scoped to the model fingerprint)"""
+        cache_str = f"{start_date}_{end_date}_{lat}_{lon}_{use_weather}_{self.model_fingerprint}"
         return hashlib.md5(cache_str.encode()).hexdigest()
     
-    def _get_cached_result(self, cache_key, max_age_minutes=10):
+    def _get_cached_result(self, cache_key, count_miss=True):
         """Get cached result if available and fresh"""
-        cache_path = self.result_cache_dir / f"{cache_key}.json"
-        
-        if cache_path.exists():
-            file_age = time.time() - cache_path.stat().st_mtime
-            if file_age <= (max_age_minutes * 60):
-                print(f"📦 Using cached forecast result", file=sys.stderr)
-                with open(cache_path, 'r') as f:
-                    return json.load(f)
-        
-        return None
+        result = self.result_cache.get(cache_key, count_miss=count_miss)
+        if result:
+            print(f"📦 Using cached forecast result", file=sys.stderr)
+        return result
     
     def _cache_result(self, cache_key, result):
         """Cache forecast result"""
-        cache_path = self.result_cache_dir / f"{cache_key}.json"
-        
         result['_cached'] = {
             'cached_at': datetime.now().isoformat(),
             'cache_key': cache_key
         }
         
-        with open(cache_path, 'w') as f:
-            json.dump(result, f, indent=2)
+        self.result_cache.put(cache_key, result)
         
         print(f"Cached forecast result", file=sys.stderr)
     
-    def create_features_from_datetime(self, dt, weather_data=None):
-        """Create features from datetime object with optional weather data"""
-        features = {}
-        
-        # Time features
-        hour = dt.hour
-        month = dt.month
-        day_of_year = dt.timetuple().tm_yday
+    def predict_batch(self, datetimes, weather_rows=None):
+        """
+        Predict solar generation for many datetimes with one scaler/model call
         
-        # Add weather data if provided
-        if weather_data:
-            # Ensure all expected weather features are present
-            weather_map = {
-                'uv_index': weather_data.get('uv_index', 1.0),
-                'temperature_c': weather_data.get('temperature_c', 15.0),
-                'humidity_pct': weather_data.get('humidity_pct', 50.0),
-                'pressure_kpa': weather_data.get('pressure_kpa', 101.3),
-                'dew_point_c': weather_data.get('dew_point_c', 10.0),
-                'wind_speed_ms': weather_data.get('wind_speed_ms', 3.0),
-                'wind_direction_deg': weather_data.get('wind_direction_deg', 180.0),
-                'clouds_pct': weather_data.get('clouds_pct', 50.0),
-                'visibility_m': weather_data.get('visibility_m', 10000.0),
-                'precipitation_mmh': weather_data.get('precipitation_mmh', 0.0)
-            }
-            features.update(weather_map)
-        else:
-            # Default values if no weather data
-            features.update({
-                'uv_index': 1.0,
-                'temperature_c': 15.0,
-                'humidity_pct': 50.0,
-                'pressure_kpa': 101.3,
-                'dew_point_c': 10.0,
-                'wind_speed_ms': 3.0,
-                'wind_direction_deg': 180.0,
-                'clouds_pct': 50.0,
-                'visibility_m': 10000.0,
-                'precipitation_mmh': 0.0
-            })
-        
-        # Circular time features (CRITICAL for ML)
-        features['hour_sin'] = np.sin(2 * np.pi * hour / 24)
-        features['hour_cos'] = np.cos(2 * np.pi * hour / 24)
-        features['month_sin'] = np.sin(2 * np.pi * month / 12)
-        features['month_cos'] = np.cos(2 * np.pi * month / 12)
-        features['day_of_year_sin'] = np.sin(2 * np.pi * day_of_year / 365)
-        features['day_of_year_cos'] = np.cos(2 * np.pi * day_of_year / 365)
+        weather_rows is a list of hourly weather dicts (or None) or an array
+        already in WEATHER_FEATURES order, e.g. a block from HourlyWeather.
+        """
+        weather = weather_matrix(weather_rows) if weather_rows is not None else None
         
-        # Additional features
-        features['is_daylight'] = 1 if 6 <= hour <= 21 else 0
+        # Build the feature matrix for every target hour, already in training order
+        features = self.feature_plan.build(datetimes, weather)
         
-        # Season (0=winter, 1=spring, 2=summer, 3=fall)
-        if month in [12, 1, 2]:
-            features['season'] = 0
-        elif month in [3, 4, 5]:
-            features['season'] = 1
-        elif month in [6, 7, 8]:
-            features['season'] = 2
-        else:
-            features['season'] = 3
+        # Scale features in float64 like training (skipped when folded into the model thresholds)
+        if not self.scaler_folded:
+            features = self.scaler.transform(features.astype(np.float64))
         
-        # Day length (Calgary-specific)
-        day_lengths = {
-            1: 8.5, 2: 10.0, 3: 11.8, 4: 13.7, 5: 15.3,
-            6: 16.3, 7: 16.0, 8: 14.5, 9: 12.7, 10: 10.8,
-            11: 9.1, 12: 8.2
-        }
-        features['day_length_hours'] = day_lengths.get(month, 12.0)
+        # Predict (model was trained on log1p transformed data)
+        predictions_log1p = self.model.predict(features)
         
-        # Additional derived features
-        features['hour'] = hour
-        features['month'] = month
-        features['day_of_week'] = dt.weekday()
-        features['day_of_year'] = day_of_year
+        # Convert back to kW (expm1 is inverse of log1p) and ensure non-negative
+        predictions_kw = np.maximum(np.expm1(predictions_log1p), 0)
         
-        return features
+        return predictions_kw.astype(float), self.feature_plan.missing_features
     
     def predict_for_datetime(self, dt, weather_data=None):
         """Predict solar generation for a specific datetime"""
-        # Create features
-        features = self.create_features_from_datetime(dt, weather_data)
-        
-        # Create DataFrame
-        features_df = pd.DataFrame([features])
-        
-        # Ensure all required features exist
-        missing_features = []
-        for req_feature in self.feature_names:
-            if req_feature not in features_df.columns:
-                missing_features.append(req_feature)
-                # Add sensible default based on feature name
-                if 'uv' in req_feature:
-                    features_df[req_feature] = 1.0
-                elif 'temp' in req_feature:
-                    features_df[req_feature] = 15.0
-                elif 'cloud' in req_feature:
-                    features_df[req_feature] = 50.0
-                elif any(x in req_feature for x in ['sin', 'cos']):
-                    features_df[req_feature] = 0.0
-                else:
-                    features_df[req_feature] = 0.0
-        
-        if missing_features:
-            print(f"Missing {len(missing_features)} features (filled with defaults)", file=sys.stderr)
-        
-        # Reorder to match training features
-        features_df = features_df[self.feature_names]
+        predictions_kw, missing_features = self.predict_batch([dt], [weather_data])
+        return float(predictions_kw[0]), missing_features
+    
+    def predict_range(self, start_date_str, end_date_str, lat=None, lon=None, use_weather=True, force_fresh=False):
+        """
+        Predict for a date range, serving from the result cache when possible
         
-        # Scale features
-        features_scaled = self.scaler.transform(features_df)
+        Concurrent identical requests (threads or worker processes) are coalesced:
+        one computes the forecast while the others wait and read its cached result.
+        Coordinates are first resolved to their site, so nearby buildings share results.
+        """
+        site = site_registry.resolve(lat or self.lat, lon or self.lon)
+        current_lat, current_lon = site.lat, site.lon
         
-        # Predict (model was trained on log1p transformed data)
-        prediction_log1p = self.model.predict(features_scaled)[0]
+        if force_fresh:
+            return self._predict_range(start_date_str, end_date_str, current_lat, current_lon, use_weather, force_fresh)
         
-        # Convert back to kW (expm1 is inverse of log1p)
-        prediction_kw = np.expm1(prediction_log1p)
+        # Check result cache first
+        cache_key = self._get_result_cache_key(start_date_str, end_date_str, current_lat, current_lon, use_weather)
+        cached_result = self._get_cached_result(cache_key)
+        if cached_result:
+            return cached_result
         
-        # Ensure non-negative
-        return max(0, float(prediction_kw)), missing_features
+        return self.single_flight.run(
+            cache_key,
+            lambda: self._predict_range(start_date_str, end_date_str, current_lat, current_lon, use_weather, force_fresh),
+            # The miss was already counted above
+            lambda: self._get_cached_result(cache_key, count_miss=False),
+            timeout=60
+        )
     
-    def predict_range(self, start_date_str, end_date_str, lat=None, lon=None, use_weather=True, force_fresh=False):
+    def _predict_range(self, start_date_str, end_date_str, lat=None, lon=None, use_weather=True, force_fresh=False):
     # """
     # Predict for a date range with constraints:
     # - Gets ALL 48 hours of weather data (for caching)
@@ -225,9 +315,9 @@ class SolarForecastService:
     # - Returns complete metadata for frontend display
     # """
         try:
-            # Set coordinates
-            current_lat = lat or self.lat
-            current_lon = lon or self.lon
+            # Set coordinates (the site's, so caches and the weather snapshot are shared)
+            site = site_registry.resolve(lat or self.lat, lon or self.lon, track=False)
+            current_lat, current_lon = site.lat, site.lon
             
             # Calculate date range constraints
             current_time = datetime.now()
@@ -237,41 +327,31 @@ class SolarForecastService:
             print(f"Current time: {current_time}", file=sys.stderr)
             print(f"Requested: {start_date_str} to {end_date_str}", file=sys.stderr)
             
-            # Check result cache first
             cache_key = self._get_result_cache_key(start_date_str, end_date_str, current_lat, current_lon, use_weather)
-            if not force_fresh:
-                cached_result = self._get_cached_result(cache_key)
-                if cached_result:
-                    return cached_result
             
             # Get weather data if requested
             weather_forecast = None
             if use_weather:
                 print(f"Fetching weather data...", file=sys.stderr)
-                weather_forecast = weather_service.get_weather_forecast(
+                weather_forecast = get_weather_service().get_weather_forecast(
                     current_lat, current_lon, 
                     start_date_str, end_date_str,
                     force_fresh=force_fresh
                 )
                 
-                if weather_forecast:
+                if weather_forecast is not None:
                     # Log what we received
-                    total_hours = sum(len(hours) for hours in weather_forecast.values())
-                    daylight_hours = sum(
-                        1 for hours in weather_forecast.values() 
-                        for h in hours if h.get('is_daylight') == 1
-                    )
+                    hours_by_date = weather_forecast.hours_by_date()
+                    total_hours = sum(total for total, _ in hours_by_date.values())
+                    daylight_hours = sum(daylight for _, daylight in hours_by_date.values())
                     print(f"Weather data received: {total_hours} total hours ({daylight_hours} daylight)", file=sys.stderr)
-                    for date_key, hours in weather_forecast.items():
-                        if hours:
-                            daylight = [h for h in hours if h.get('is_daylight') == 1]
-                            nighttime = [h for h in hours if h.get('is_daylight') == 0]
-                            print(f"   {date_key}: {len(hours)} hours ({len(daylight)} daylight, {len(nighttime)} nighttime)", file=sys.stderr)
+                    for date_key, (total, daylight) in hours_by_date.items():
+                        print(f"   {date_key}: {total} hours ({daylight} daylight, {total - daylight} nighttime)", file=sys.stderr)
                 else:
                     print(f"Could not fetch weather data, using default values", file=sys.stderr)
             
             # Get API stats
-            api_stats = weather_service.get_api_stats()
+            api_stats = weather_api_stats()
             
             # Start from next whole hour
             next_hour = current_time.replace(minute=0, second=0, microsecond=0)
@@ -281,10 +361,11 @@ class SolarForecastService:
             predictions = []
             missing_features_total = []
             skipped_night_hours = []
+            targets = []
             
             print(f"Starting predictions from {next_hour.strftime('%H:%M')}...", file=sys.stderr)
             
-            # Predict for next 48 hours, but only daylight hours
+            # Collect the next 48 hours, but only daylight hours
             for hour_offset in range(48):
                 prediction_time = next_hour + timedelta(hours=hour_offset)
                 
@@ -306,58 +387,87 @@ class SolarForecastService:
                     })
                     continue
                 
+                targets.append((prediction_time, hour, date_str))
+            
+            # Weather block for every target hour (defaults where the forecast has no slot)
+            target_times = [target[0] for target in targets]
+            if weather_forecast is not None:
+                weather_block, weather_slots = weather_forecast.block(target_times)
+            else:
+                weather_block, weather_slots = weather_matrix([None] * len(targets)), np.full(len(targets), -1)
+            
+            # Reuse hours already predicted against identical weather, batch-predict the rest
+            batch_error = None
+            if targets:
+                hour_keys = [
+                    self.hour_cache.hour_key(target_time, hashlib.md5(row.tobytes()).hexdigest()[:16])
+                    for target_time, row in zip(target_times, weather_block)
+                ]
+                cached_hours = {} if force_fresh else self.hour_cache.lookup(current_lat, current_lon, hour_keys)
+                pending = [i for i, key in enumerate(hour_keys) if key not in cached_hours]
+                print(f"Hour cache: {len(targets) - len(pending)} of {len(targets)} hours reused", file=sys.stderr)
+                
+                predicted_batch = [cached_hours.get(key) for key in hour_keys]
                 try:
-                    # Get weather data for this exact hour
-                    hour_weather = None
-                    if weather_forecast and date_str in weather_forecast:
-                        # Find exact hour match
-                        for weather_hour in weather_forecast[date_str]:
-                            if weather_hour['hour'] == hour:
-                                hour_weather = weather_hour
-                                break
-                    
-                    # Make prediction
-                    predicted_kw, missing = self.predict_for_datetime(prediction_time, hour_weather)
-                    missing_features_total.extend(missing)
-                    
-                    # Prepare prediction data
-                    prediction_data = {
-                        'timestamp': prediction_time.replace(minute=0, second=0, microsecond=0).isoformat(),
-                        'predicted_kw': round(predicted_kw, 2),
-                        'hour': hour,
-                        'date': date_str,
-                        'is_daylight': 1,
-                        'is_forecast': 1 if prediction_time > current_time else 0
-                    }
-                    
-                    # Add weather info if available
-                    if hour_weather:
-                        prediction_data['weather'] = {
-                            'uv_index': hour_weather.get('uv_index', 0),
-                            'temperature_c': hour_weather.get('temperature_c', 0),
-                            'clouds_pct': hour_weather.get('clouds_pct', 0),
-                            'precipitation_mmh': hour_weather.get('precipitation_mmh', 0),
-                            'weather_main': hour_weather.get('weather_main', 'Clear'),
-                            'weather_description': hour_weather.get('weather_description', 'clear sky')
-                        }
-                        print(f"   {prediction_time.strftime('%H:%M')}: {predicted_kw:.2f} kW | "
-                            f"UV: {hour_weather.get('uv_index', 0):.1f} | "
-                            f"Clouds: {hour_weather.get('clouds_pct', 0)}%", file=sys.stderr)
-                    else:
-                        print(f"   {prediction_time.strftime('%H:%M')}: {predicted_kw:.2f} kW (no weather)", file=sys.stderr)
-                    
-                    predictions.append(prediction_data)
-                    
+                    if pending:
+                        computed, missing = self.predict_batch(
+                            [target_times[i] for i in pending],
+                            weather_block[pending]
+                        )
+                        for i, predicted_kw in zip(pending, computed):
+                            predicted_batch[i] = float(predicted_kw)
+                        self.hour_cache.update(
+                            current_lat, current_lon,
+                            {hour_keys[i]: predicted_batch[i] for i in pending},
+                            hour_keys[0].split('|')[0]
+                        )
+                    missing_features_total.extend(self.feature_plan.missing_features)
                 except Exception as e:
-                    print(f"Prediction failed for {prediction_time}: {e}", file=sys.stderr)
+                    print(f"Batch prediction failed: {e}", file=sys.stderr)
+                    batch_error = str(e)
+            
+            for index, (prediction_time, hour, date_str) in enumerate(targets):
+                if batch_error is not None:
                     predictions.append({
                         'timestamp': prediction_time.isoformat(),
                         'predicted_kw': 0,
                         'hour': hour,
                         'date': date_str,
                         'is_daylight': 1,
-                        'error': str(e)
+                        'error': batch_error
                     })
+                    continue
+                
+                predicted_kw = float(predicted_batch[index])
+                
+                # Prepare prediction data
+                prediction_data = {
+                    'timestamp': prediction_time.replace(minute=0, second=0, microsecond=0).isoformat(),
+                    'predicted_kw': round(predicted_kw, 2),
+                    'hour': hour,
+                    'date': date_str,
+                    'is_daylight': 1,
+                    'is_forecast': 1 if prediction_time > current_time else 0
+                }
+                
+                # Add weather info if available
+                hour_weather = weather_forecast.hour(weather_slots[index]) if weather_slots[index] >= 0 else None
+                if hour_weather:
+                    prediction_data['weather'] = {
+                        'uv_index': hour_weather.get('uv_index', 0),
+                        'temperature_c': hour_weather.get('temperature_c', 0),
+                        'clouds_pct': hour_weather.get('clouds_pct', 0),
+                        'precipitation_mmh': hour_weather.get('precipitation_mmh', 0),
+                        'weather_main': hour_weather.get('weather_main', 'Clear'),
+                        'weather_description': hour_weather.get('weather_description', 'clear sky')
+                    }
+                    print(f"   {prediction_time.strftime('%H:%M')}: {predicted_kw:.2f} kW | "
+                        f"UV: {hour_weather.get('uv_index', 0):.1f} | "
+                        f"Clouds: {hour_weather.get('clouds_pct', 0)}%", file=sys.stderr)
+                else:
+                    print(f"   {prediction_time.strftime('%H:%M')}: {predicted_kw:.2f} kW (no weather)", file=sys.stderr)
+                
+                predictions.append(prediction_data)
             
             print(f"Generated {len(predictions)} daylight predictions", file=sys.stderr)
             print(f"Skipped {len(skipped_night_hours)} nighttime hours", file=sys.stderr)
@@ -384,6 +494,12 @@ class SolarForecastService:
             # Weather quality metrics
             weather_data_available = any('weather' in p for p in predictions)
             
+            # Cache counters (including this request's lookups)
+            api_stats['result_cache'] = self.result_cache.stats()
+            api_stats['hour_cache'] = self.hour_cache.stats()
+            api_stats['single_flight'] = self.single_flight.stats()
+            api_stats['sites'] = site_registry.stats()
+            
             # Prepare result
             result = {
                 'success': True,
@@ -409,7 +525,8 @@ class SolarForecastService:
                     }
                 },
                 'model_info': {
-                    'name': type(self.model).__name__,
+                    'name': self.model_name,
+                    'fingerprint': self.model_fingerprint,
                     'r2_score': self.metrics.get('r2', 0),
                     'features_used': len(self.feature_names),
                     'missing_features': len(set(missing_features_total)),
@@ -422,7 +539,8 @@ class SolarForecastService:
                     'generated_at': datetime.now().isoformat(),
                     'coordinates': {
                         'lat': current_lat,
-                        'lon': current_lon
+                        'lon': current_lon,
+                        'site': site.site_id
                     },
                     'time_constraints': {
                         'max_hours_ahead': 48,
@@ -434,7 +552,8 @@ class SolarForecastService:
                     },
                     'cache_info': {
                         'weather_cache_minutes': 10,
-                        'result_cache_minutes': 10,
+                        'weather_age_seconds': round(weather_forecast.age_seconds) if weather_forecast is not None else None,
+                        'result_cache_minutes': self.result_cache.ttl_seconds // 60,
                         'used_cached_data': False
                     },
                     'note': f"Model predicts only for daylight hours (6 AM - 9 PM). {len(skipped_night_hours)} nighttime hours excluded."
@@ -445,8 +564,9 @@ class SolarForecastService:
             if not weather_data_available and use_weather:
                 result['warning'] = "Using default weather values (API unavailable or rate limited)"
             
-            # Cache the result
-            self._cache_result(cache_key, result)
+            # Cache the result, unless it was built from a stale snapshot that is being refreshed
+            if weather_forecast is None or weather_forecast.age_seconds <= getattr(get_weather_service(), 'cache_ttl', 600):
+                self._cache_result(cache_key, result)
             
             return result
             
@@ -469,22 +589,160 @@ class SolarForecastService:
                     'name': 'Error',
                     'weather_integrated': False
                 },
-                'api_stats': weather_service.get_api_stats() if 'weather_service' in locals() else {},
+                'api_stats': weather_api_stats(),
                 'metadata': {
                     'generated_at': datetime.now().isoformat(),
                     'is_fallback': True
                 }
             }
 
+def read_frame(stream):
+    """Read one length-prefixed JSON frame (4-byte big-endian length + UTF-8 body)"""
+    header = stream.read(4)
+    if not header:
+        return None
+    if len(header) < 4:
+        raise EOFError("Truncated frame header")
+    
+    length = struct.unpack('>I', header)[0]
+    body = stream.read(length)
+    if len(body) < length:
+        raise EOFError("Truncated frame body")
+    
+    return json.loads(body.decode('utf-8'))
+
+def write_frame(stream, payload):
+    """Write one length-prefixed JSON frame"""
+    body = json.dumps(payload).encode('utf-8')
+    stream.write(struct.pack('>I', len(body)) + body)
+    stream.flush()
+
+def handle_request(service, request):
+    """Handle one worker request, returns (response, keep_running)"""
+    command = request.get('command', 'predict')
+    
+    if command == 'ping':
+        return {'success': True, 'pong': True, 'pid': os.getpid()}, True
+    
+    if command == 'stats':
+        return {
+            'success': True,
+            'result_cache': service.result_cache.stats(),
+            'hour_cache': service.hour_cache.stats(),
+            'sites': site_registry.stats(),
+            'weather_prefetch': service.weather_prefetcher.stats() if service.weather_prefetcher else None
+        }, True
+    
+    if command == 'shutdown':
+        return {'success': True, 'shutdown': True}, False
+    
+    if command != 'predict':
+        return {'success': False, 'error': f"Unknown command: {command}"}, True
+    
+    if not request.get('start_date') or not request.get('end_date'):
+        return {'success': False, 'error': 'Missing start_date or end_date'}, True
+    
+    result = service.predict_range(
+        request['start_date'],
+        request['end_date'],
+        request.get('lat'),
+        request.get('lon'),
+        request.get('use_weather', True),
+        request.get('force_fresh', False)
+    )
+    return result, True
+
+def serve_stream(service, in_stream, out_stream):
+    """Answer framed requests from in_stream until EOF or shutdown, returns False on shutdown"""
+    while True:
+        try:
+            request = read_frame(in_stream)
+        except (EOFError, ValueError) as e:
+            print(f"Dropping connection: {e}", file=sys.stderr)
+            return True
+        
+        if request is None:
+            return True
+        
+        try:
+            response, keep_running = handle_request(service, request)
+        except Exception as e:
+            print(f"Request failed: {e}", file=sys.stderr)
+            response, keep_running = {'success': False, 'error': str(e)}, True
+        
+        write_frame(out_stream, response)
+        
+        if not keep_running:
+            return False
+
+def serve(socket_path=None):
+    """
+    Long-lived worker mode: load the model once and answer framed requests
+    over stdin/stdout, or over a Unix domain socket when socket_path is given
+    """
+    service = SolarForecastService('solar_forecast_openweather.pkl')
+    service.result_cache.start_sweeper()
+    
+    # Keep configured sites' weather fresh and answer from the latest snapshot while it refreshes
+    weather_service = get_weather_service()
+    if hasattr(weather_service, 'refresh_snapshot'):
+        weather_service.stale_while_revalidate = True
+        sites = parse_sites(os.getenv('WEATHER_PREFETCH_SITES', f"{service.lat},{service.lon}"))
+        service.weather_prefetcher = WeatherPrefetcher(weather_service, sites)
+        service.weather_prefetcher.start()
+    
+    if socket_path is None:
+        # stdout carries frames only - route stray prints to stderr
+        out_stream = sys.stdout.buffer
+        sys.stdout = sys.stderr
+        print(f"Worker {os.getpid()} serving on stdin/stdout", file=sys.stderr)
+        serve_stream(service, sys.stdin.buffer, out_stream)
+        return
+    
+    import socket
+    
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(8)
+    print(f"Worker {os.getpid()} serving on {socket_path}", file=sys.stderr)
+    
+    try:
+        keep_running = True
+        while keep_running:
+            conn, _ = server.accept()
+            with conn, conn.makefile('rb') as reader, conn.makefile('wb') as writer:
+                keep_running = serve_stream(service, reader, writer)
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
 def main():
     """Command-line interface for Node.js"""
     import sys
     
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        socket_path = None
+        if len(sys.argv) > 3 and sys.argv[2] == '--socket':
+            socket_path = sys.argv[3]
+        serve(socket_path)
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == '--verify-folding':
+        tolerance = float(sys.argv[2]) if len(sys.argv) > 2 else 1e-3
+        service = SolarForecastService('solar_forecast_openweather.pkl', fold_scaler=True)
+        report = service.verify_scaler_folding(tolerance)
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report['success'] and report['within_tolerance'] else 1)
+    
     if len(sys.argv) < 3:
         error_result = {
             'success': False,
             'error': 'Missing arguments',
-            'usage': 'python node_service.py <start_date> <end_date> [lat] [lon] [use_weather] [force_fresh]'
+            'usage': 'python node_service.py <start_date> <end_date> [lat] [lon] [use_weather] [force_fresh] | --serve [--socket <path>] | --verify-folding [tolerance_kw]'
         }
         print(json.dumps(error_result, indent=2))
         sys.exit(1)
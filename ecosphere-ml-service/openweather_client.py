@@ -0,0 +1,138 @@
+"""
+OPENWEATHER CLIENT
+HTTP client for the OneCall API:
+- one pooled requests.Session per process (keep-alive between fetches)
+- bounded exponential-backoff retries for timeouts, connection errors and 5xx
+- a per-call deadline budget covering all attempts and backoff sleeps
+- a circuit breaker that stops calling a degraded upstream for a cooldown
+
+Point OPENWEATHER_BASE_URL at a local stub server to exercise latency and
+retry behaviour offline.
+"""
+import os
+import sys
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://api.openweathermap.org/data/3.0/onecall"
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without calling the API while the circuit breaker is open"""
+
+class OpenWeatherClient:
+    def __init__(self, api_key, base_url=None, timeout=15, deadline=25, max_retries=2,
+                 backoff=0.5, failure_threshold=3, cooldown=300, on_attempt=None):
+        """
+        Args:
+            api_key: OpenWeather API key
+            base_url: OneCall endpoint (default: OPENWEATHER_BASE_URL or the public API)
+            timeout: Connect/read timeout of a single attempt, in seconds
+            deadline: Budget for one fetch including retries and backoff, in seconds
+            max_retries: Retries after the first attempt
+            backoff: First backoff sleep in seconds, doubled per retry
+            failure_threshold: Consecutive failed fetches that open the circuit
+            cooldown: Seconds the circuit stays open before a trial fetch
+            on_attempt: Callback(success) after every HTTP attempt (for quota accounting)
+        """
+        self.api_key = api_key
+        self.base_url = base_url or os.environ.get('OPENWEATHER_BASE_URL', DEFAULT_BASE_URL)
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.on_attempt = on_attempt
+
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        self.session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.counters = {'fetches': 0, 'attempts': 0, 'retries': 0, 'failures': 0, 'short_circuited': 0}
+
+    @property
+    def circuit_open(self):
+        return time.time() < self.open_until
+
+    def _retryable(self, error):
+        if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            return True
+        response = getattr(error, 'response', None)
+        return response is not None and response.status_code >= 500
+
+    def _record_failure(self):
+        self.counters['failures'] += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.time() + self.cooldown
+            print(f"OpenWeather circuit open for {self.cooldown}s after "
+                  f"{self.consecutive_failures} failed fetches", file=sys.stderr)
+
+    def fetch_onecall(self, lat, lon):
+        """
+        Fetch the OneCall forecast for a location
+
+        Returns:
+            The decoded JSON response
+
+        Raises:
+            CircuitOpenError while the upstream is considered degraded, otherwise the
+            last requests exception once retries or the deadline are exhausted
+        """
+        if self.circuit_open:
+            self.counters['short_circuited'] += 1
+            raise CircuitOpenError(f"OpenWeather circuit open for another {self.open_until - time.time():.0f}s")
+
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'appid': self.api_key,
+            'units': 'metric',
+            'exclude': 'minutely,daily,alerts'
+        }
+
+        self.counters['fetches'] += 1
+        deadline = time.time() + self.deadline
+        attempt = 0
+
+        while True:
+            remaining = deadline - time.time()
+            self.counters['attempts'] += 1
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=max(0.1, min(self.timeout, remaining)))
+                response.raise_for_status()
+                data = response.json()
+            except requests.exceptions.RequestException as e:
+                if self.on_attempt:
+                    self.on_attempt(False)
+
+                delay = self.backoff * (2 ** attempt)
+                if not self._retryable(e) or attempt >= self.max_retries or time.time() + delay >= deadline:
+                    # Client errors (bad key, bad request) say nothing about upstream health
+                    if self._retryable(e):
+                        self._record_failure()
+                    raise
+
+                attempt += 1
+                self.counters['retries'] += 1
+                # Describe the error without its URL, which carries the API key
+                reason = f"HTTP {e.response.status_code}" if getattr(e, 'response', None) is not None else type(e).__name__
+                print(f"OpenWeather attempt {attempt} failed ({reason}), retrying in {delay:.1f}s", file=sys.stderr)
+                time.sleep(delay)
+                continue
+
+            if self.on_attempt:
+                self.on_attempt(True)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            return data
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['circuit_open'] = self.circuit_open
+        stats['consecutive_failures'] = self.consecutive_failures
+        return stats
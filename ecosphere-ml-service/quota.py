@@ -0,0 +1,107 @@
+"""
+QUOTA SCHEDULER
+Token bucket spreading the daily OpenWeather budget across the day, shared by
+every worker process through the API ledger's SQLite database.
+
+The bucket refills at daily_budget / 24h up to `capacity` tokens, so a burst
+can spend at most `capacity` calls before requests are paced to the refill
+rate. Two priority classes draw from it:
+- interactive: dashboard requests, may take any available token
+- background: prefetching, only while more than `reserve` tokens remain,
+  keeping headroom for interactive traffic
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+PRIORITIES = ('interactive', 'background')
+
+class QuotaScheduler:
+    def __init__(self, db_path, daily_budget=950, capacity=60, reserve=20, name='openweather'):
+        """
+        Args:
+            db_path: SQLite database shared by all processes (the API ledger's)
+            daily_budget: Calls per day the bucket refills
+            capacity: Maximum tokens (largest burst)
+            reserve: Tokens background requests must leave for interactive ones
+            name: Bucket row name, one row per upstream
+        """
+        self.db_path = str(db_path)
+        self.rate = daily_budget / 86400.0
+        self.capacity = float(capacity)
+        self.reserve = float(reserve)
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS quota_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.counters = {'granted': 0, 'denied': 0}
+
+    def _refilled(self, row, now):
+        return self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate)
+
+    def _tokens(self):
+        """Current balance without taking the write lock"""
+        with self._lock:
+            row = self._conn.execute("SELECT tokens, updated_at FROM quota_buckets WHERE name = ?",
+                                     (self.name,)).fetchone()
+        return self._refilled(row, time.time())
+
+    @contextmanager
+    def _bucket(self):
+        """Yield {'tokens': refilled balance} inside a write transaction, then store the updated balance"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute("SELECT tokens, updated_at FROM quota_buckets WHERE name = ?",
+                                         (self.name,)).fetchone()
+                state = {'tokens': self._refilled(row, now)}
+                yield state
+
+                self._conn.execute("INSERT OR REPLACE INTO quota_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                                   (self.name, state['tokens'], now))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def acquire(self, priority='interactive', tokens=1):
+        """Take tokens for one API call if the priority class may, returns True when granted"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITIES}")
+
+        floor = self.reserve if priority == 'background' else 0.0
+        with self._bucket() as state:
+            granted = state['tokens'] - tokens >= floor
+            if granted:
+                state['tokens'] -= tokens
+
+        self.counters['granted' if granted else 'denied'] += 1
+        return granted
+
+    def charge(self, tokens):
+        """Debit tokens already spent (e.g. retries) or, if negative, credit unused ones back"""
+        if not tokens:
+            return
+        with self._bucket() as state:
+            state['tokens'] = min(self.capacity, state['tokens'] - tokens)
+
+    def seconds_until(self, priority='interactive', tokens=1):
+        """Seconds until acquire() could succeed for this priority"""
+        floor = self.reserve if priority == 'background' else 0.0
+        return max(0.0, (floor + tokens - self._tokens()) / self.rate)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats.update({
+            'tokens': round(self._tokens(), 2),
+            'capacity': self.capacity,
+            'reserve': self.reserve,
+            'refill_per_hour': round(self.rate * 3600, 2)
+        })
+        return stats
@@ -0,0 +1,238 @@
+"""
+RESULT CACHE
+Two-tier cache for forecast results:
+- memory: in-process LRU of serialized results with a TTL
+- disk: compressed entries in one SQLite file (see kv_store.py), bounded by
+  entry count and total bytes, with expired entries removed by a background sweep
+
+Counters (hits per tier, misses, expirations, evictions, writes) are exposed
+through stats() and reported in the service's api_stats.
+"""
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from kv_store import KVStore
+
+class ResultCache:
+    def __init__(self, cache_dir, ttl_seconds=600, memory_entries=64, max_entries=500,
+                 max_bytes=50 * 1024 * 1024, sweep_interval=60):
+        """
+        Args:
+            cache_dir: Directory for the disk tier's database
+            ttl_seconds: Maximum age of a cached result in either tier
+            memory_entries: LRU capacity of the in-process tier
+            max_entries: Maximum number of entries kept on disk (None for no limit)
+            max_bytes: Maximum total compressed size kept on disk (None for no limit)
+            sweep_interval: Seconds between background sweeps once start_sweeper() is called
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+
+        self.store = KVStore(self.cache_dir / 'cache.sqlite3')
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (stored_at, serialized result)
+        self._sweeper = None
+        self._stop = threading.Event()
+
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'writes': 0
+        }
+
+        self.sweep()
+
+    def get(self, key, count_miss=True):
+        """
+        Return the cached result for key, or None if missing or older than the TTL
+
+        Pass count_miss=False when re-reading a key the caller has just missed
+        (e.g. after waiting for another process), so one request counts one miss.
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return json.loads(entry[1])
+                # Another process may have refreshed the disk entry
+                del self._memory[key]
+
+        # Disk tier: one indexed read, shared with other processes
+        try:
+            entry = self.store.get(key, now)
+        except sqlite3.Error as e:
+            print(f"Result cache read failed: {e}", file=sys.stderr)
+            entry = None
+
+        with self._lock:
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                if count_miss:
+                    self.counters['misses'] += 1
+                return None
+
+            stored_at, result = entry
+            self._remember(key, stored_at, json.dumps(result))
+            self.counters['disk_hits'] += 1
+
+        return result
+
+    def put(self, key, result):
+        """Store a JSON-serializable result in both tiers"""
+        stored_at = time.time()
+        serialized = json.dumps(result)
+        self.store.put(key, result, self.ttl_seconds, stored_at=stored_at)
+        evicted = self.store.evict(self.max_entries, self.max_bytes)
+
+        with self._lock:
+            self._remember(key, stored_at, serialized)
+            for evicted_key in evicted:
+                self._memory.pop(evicted_key, None)
+            self.counters['writes'] += 1
+            self.counters['evictions'] += len(evicted)
+
+    def merge(self, key, merge_fn):
+        """
+        Atomically replace the disk entry with merge_fn(current result or None)
+        and return the stored result; the memory tier is bypassed for the read
+        """
+        stored_at = time.time()
+        result = self.store.merge(key, merge_fn, self.ttl_seconds, stored_at=stored_at)
+        evicted = self.store.evict(self.max_entries, self.max_bytes)
+
+        with self._lock:
+            self._remember(key, stored_at, json.dumps(result))
+            for evicted_key in evicted:
+                self._memory.pop(evicted_key, None)
+            self.counters['writes'] += 1
+            self.counters['evictions'] += len(evicted)
+        return result
+
+    def invalidate(self, key):
+        """Drop key from both tiers"""
+        with self._lock:
+            self._memory.pop(key, None)
+        self.store.delete(key)
+
+    def _remember(self, key, stored_at, serialized):
+        self._memory[key] = (stored_at, serialized)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def sweep(self):
+        """Drop expired entries from both tiers and enforce the disk limits"""
+        now = time.time()
+        expired = self.store.purge_expired(now)
+        evicted = self.store.evict(self.max_entries, self.max_bytes)
+
+        with self._lock:
+            self.counters['expired'] += expired
+            self.counters['evictions'] += len(evicted)
+            for key in [k for k, (stored_at, _) in self._memory.items() if now - stored_at > self.ttl_seconds]:
+                del self._memory[key]
+            for key in evicted:
+                self._memory.pop(key, None)
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except sqlite3.Error as e:
+                print(f"Result cache sweep failed: {e}", file=sys.stderr)
+
+    def start_sweeper(self):
+        """Start the background expiry sweep (for long-lived processes)"""
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='result-cache-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def stats(self):
+        """Counters plus current occupancy of both tiers"""
+        disk_entries, disk_bytes = self.store.usage()
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+                'disk_bytes': disk_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds
+            })
+        return stats
+
+class HourlyPredictionCache:
+    """
+    Per-target-hour predictions keyed by site, target hour, weather identity and
+    model identity, so a sliding or widened window only predicts new hours.
+    Each (site, model) pair is one ResultCache entry mapping hour keys to kW.
+    """
+
+    def __init__(self, cache_dir, model_id, ttl_seconds=6 * 3600, max_hours_per_site=2000):
+        self.store = ResultCache(cache_dir, ttl_seconds=ttl_seconds, memory_entries=16, max_entries=200)
+        self.model_id = model_id
+        self.max_hours_per_site = max_hours_per_site
+        self.counters = {'hour_hits': 0, 'hour_misses': 0}
+
+    @staticmethod
+    def hour_key(target_time, weather_digest):
+        """Key for one target hour predicted against one weather vector"""
+        return f"{target_time.replace(minute=0, second=0, microsecond=0).isoformat()}|{weather_digest}"
+
+    def _site_key(self, lat, lon):
+        return hashlib.md5(f"{lat:.4f}_{lon:.4f}_{self.model_id}".encode()).hexdigest()
+
+    def lookup(self, lat, lon, hour_keys):
+        """Return {hour_key: predicted_kw} for the keys already predicted"""
+        entries = (self.store.get(self._site_key(lat, lon)) or {}).get('hours', {})
+        found = {key: entries[key] for key in hour_keys if key in entries}
+
+        self.counters['hour_hits'] += len(found)
+        self.counters['hour_misses'] += len(hour_keys) - len(found)
+        return found
+
+    def update(self, lat, lon, predictions, oldest_hour):
+        """Merge {hour_key: predicted_kw}, dropping hours before oldest_hour (ISO string)"""
+        if not predictions:
+            return
+
+        def merged(current):
+            entries = (current or {}).get('hours', {})
+            entries.update(predictions)
+            # ISO timestamps sort chronologically; keep the newest hours within the cap
+            kept = sorted(key for key in entries if key >= oldest_hour)[-self.max_hours_per_site:]
+            return {'model_id': self.model_id, 'hours': {key: entries[key] for key in kept}}
+
+        # Merge against the stored entry in one transaction, so workers updating
+        # the same site concurrently keep each other's hours
+        self.store.merge(self._site_key(lat, lon), merged)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats.update({name: value for name, value in self.store.stats().items()
+                      if name in ('memory_entries', 'disk_entries', 'disk_bytes', 'evictions')})
+        return stats
@@ -0,0 +1,196 @@
+"""
+SCALER FOLDING
+Folds a fitted StandardScaler into the split thresholds of tree-based
+models (RandomForest / XGBoost / LightGBM) so serving can skip
+scaler.transform. A split on z = (x - mean) / scale at threshold t is the
+same split on the raw feature at t * scale + mean.
+
+sklearn and XGBoost compare float32 features, so the scaled value is rounded
+before the comparison; thresholds are mapped from the edge of t's float32
+rounding cell rather than from t itself to keep boundary rows on the same side.
+"""
+import copy
+import json
+import numpy as np
+
+def scaler_affine(scaler, n_features):
+    """Return (mean, scale) arrays for a StandardScaler, identity where disabled"""
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+
+    return mean, scale
+
+def float32_upper_edge(thresholds):
+    """Largest z (float64) whose float32 rounding is still <= threshold"""
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    below = thresholds.astype(np.float32)
+    below = np.where(below > thresholds, np.nextafter(below, np.float32(-np.inf)), below)
+    above = np.nextafter(below, np.float32(np.inf))
+    return (below.astype(np.float64) + above.astype(np.float64)) / 2
+
+def float32_lower_edge(thresholds):
+    """Smallest z (float64) whose float32 rounding is >= threshold (a float32 value)"""
+    thresholds = np.asarray(thresholds, dtype=np.float32)
+    below = np.nextafter(thresholds, np.float32(-np.inf))
+    return (below.astype(np.float64) + thresholds.astype(np.float64)) / 2
+
+def _fold_sklearn_tree(tree, mean, scale):
+    """Rewrite one sklearn Tree's thresholds in place (leaves are left untouched)"""
+    internal = tree.children_left != -1
+    features = tree.feature[internal]
+    # x <= t on float32(z): everything rounding into t's cell goes left
+    edges = float32_upper_edge(tree.threshold[internal])
+    tree.threshold[internal] = edges * scale[features] + mean[features]
+
+def _fold_sklearn(model, mean, scale):
+    """Fold into a sklearn tree or tree ensemble"""
+    folded = copy.deepcopy(model)
+
+    if hasattr(folded, 'tree_'):
+        estimators = [folded]
+    else:
+        estimators = np.ravel(folded.estimators_)
+
+    for estimator in estimators:
+        _fold_sklearn_tree(estimator.tree_, mean, scale)
+
+    return folded
+
+def _fold_xgboost(model, mean, scale):
+    """Fold into an XGBoost model by rewriting split_conditions in its JSON dump"""
+    import xgboost as xgb
+
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    raw = json.loads(booster.save_raw('json'))
+
+    gradient_booster = raw['learner']['gradient_booster']
+    if gradient_booster['name'] == 'dart':
+        gradient_booster = gradient_booster['gbtree']
+    if gradient_booster['name'] != 'gbtree':
+        raise ValueError(f"Scaler folding not supported for XGBoost booster '{gradient_booster['name']}'")
+
+    for tree in gradient_booster['model']['trees']:
+        if any(tree.get('split_type', [])):
+            raise ValueError("Scaler folding not supported for categorical XGBoost splits")
+
+        # Leaf nodes store their leaf value in split_conditions
+        conditions = np.array(tree['split_conditions'], dtype=np.float64)
+        internal = np.array(tree['left_children']) != -1
+        features = np.array(tree['split_indices'])[internal]
+
+        # x < t on float32(z): round the raw edge up so no float32 x lands between edge and threshold
+        edges = float32_lower_edge(conditions[internal]) * scale[features] + mean[features]
+        folded = edges.astype(np.float32)
+        folded = np.where(folded < edges, np.nextafter(folded, np.float32(np.inf)), folded)
+
+        conditions[internal] = folded
+        tree['split_conditions'] = conditions.tolist()
+
+    buffer = bytearray(json.dumps(raw).encode('utf-8'))
+    if isinstance(model, xgb.Booster):
+        return xgb.Booster(model_file=buffer)
+
+    folded = type(model)()
+    folded.load_model(buffer)
+    return folded
+
+def _fold_lightgbm(model, mean, scale):
+    """Fold into a LightGBM model by rewriting thresholds in its text dump (returns a Booster)"""
+    import lightgbm as lgb
+
+    booster = model.booster_ if hasattr(model, 'booster_') else model
+    lines = booster.model_to_string().split('\n')
+
+    # Collect per-tree split_feature / decision_type lines before rewriting thresholds
+    tree_fields = {}
+    current_tree = None
+    for index, line in enumerate(lines):
+        if line.startswith('Tree='):
+            current_tree = line
+            tree_fields[current_tree] = {}
+        elif current_tree is not None and '=' in line:
+            key = line.split('=', 1)[0]
+            if key in ('split_feature', 'threshold', 'decision_type'):
+                tree_fields[current_tree][key] = index
+        elif line.startswith('end of trees'):
+            break
+
+    for fields in tree_fields.values():
+        if 'threshold' not in fields:
+            # Single-leaf tree
+            continue
+
+        features = [int(v) for v in lines[fields['split_feature']].split('=', 1)[1].split()]
+        thresholds = [float(v) for v in lines[fields['threshold']].split('=', 1)[1].split()]
+        decision_types = [int(v) for v in lines[fields['decision_type']].split('=', 1)[1].split()]
+
+        for decision_type in decision_types:
+            if decision_type & 1:
+                raise ValueError("Scaler folding not supported for categorical LightGBM splits")
+            if (decision_type >> 2) & 3 == 1:
+                raise ValueError("Scaler folding not supported for LightGBM zero-as-missing splits")
+
+        folded_thresholds = [t * scale[f] + mean[f] for t, f in zip(thresholds, features)]
+        lines[fields['threshold']] = 'threshold=' + ' '.join(repr(float(t)) for t in folded_thresholds)
+
+    # tree_sizes holds byte offsets of the original tree blocks; LightGBM parses sequentially without it
+    lines = [line for line in lines if not line.startswith('tree_sizes=')]
+
+    return lgb.Booster(model_str='\n'.join(lines))
+
+def fold_scaler(model, scaler, n_features):
+    """
+    Return a copy of a tree model that accepts unscaled features
+
+    Args:
+        model: Fitted RandomForest/ExtraTrees/DecisionTree, XGBoost or LightGBM model
+        scaler: Fitted StandardScaler applied before the model during training
+        n_features: Number of model input features
+
+    Raises:
+        ValueError: If the model type or its splits cannot be folded
+    """
+    mean, scale = scaler_affine(scaler, n_features)
+    module = type(model).__module__
+
+    if module.startswith('sklearn') and (hasattr(model, 'tree_') or hasattr(model, 'estimators_')):
+        if not hasattr(model, 'tree_') and not all(hasattr(e, 'tree_') for e in np.ravel(model.estimators_)):
+            raise ValueError(f"Scaler folding not supported for {type(model).__name__}")
+        return _fold_sklearn(model, mean, scale)
+    elif module.startswith('xgboost'):
+        return _fold_xgboost(model, mean, scale)
+    elif module.startswith('lightgbm'):
+        return _fold_lightgbm(model, mean, scale)
+
+    raise ValueError(f"Scaler folding not supported for {type(model).__name__}")
+
+def verify_folding(model, folded_model, scaler, features, tolerance=1e-3):
+    """
+    Compare predictions of the scaled path and the folded path
+
+    Args:
+        features: Unscaled feature matrix to evaluate both paths on
+        tolerance: Maximum allowed absolute difference in kW
+
+    Returns:
+        Report dict with max/mean differences and whether they are within tolerance
+    """
+    expected_log1p = model.predict(scaler.transform(np.asarray(features, dtype=np.float64)))
+    folded_log1p = folded_model.predict(features)
+
+    expected_kw = np.maximum(np.expm1(expected_log1p), 0)
+    folded_kw = np.maximum(np.expm1(folded_log1p), 0)
+    diff_kw = np.abs(expected_kw - folded_kw)
+
+    return {
+        'rows': int(len(features)),
+        'max_abs_diff_kw': float(diff_kw.max()) if len(diff_kw) else 0.0,
+        'mean_abs_diff_kw': float(diff_kw.mean()) if len(diff_kw) else 0.0,
+        'max_abs_diff_log1p': float(np.abs(expected_log1p - folded_log1p).max()) if len(diff_kw) else 0.0,
+        'rows_over_tolerance': int((diff_kw > tolerance).sum()),
+        'tolerance_kw': tolerance,
+        'within_tolerance': bool((diff_kw <= tolerance).all())
+    }
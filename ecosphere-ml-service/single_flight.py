@@ -0,0 +1,108 @@
+"""
+SINGLE FLIGHT
+Cross-process request coalescing with lock files: for a given key exactly one
+process computes while the others wait for it and read its cached result.
+
+Locks are created with O_CREAT | O_EXCL, which is atomic on local filesystems
+on both POSIX and Windows. A lock whose file is older than stale_after seconds
+is assumed to belong to a crashed process and is broken.
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+class SingleFlight:
+    def __init__(self, lock_dir, stale_after=120, poll_interval=0.05):
+        """
+        Args:
+            lock_dir: Directory for <key>.lock files
+            stale_after: Seconds after which a lock is considered abandoned
+            poll_interval: Seconds between checks while waiting for another process
+        """
+        self.lock_dir = Path(lock_dir)
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.counters = {'computed': 0, 'coalesced': 0, 'wait_timeouts': 0, 'stale_locks_broken': 0}
+
+    def _lock_path(self, key):
+        return self.lock_dir / f"{key}.lock"
+
+    def _try_acquire(self, lock_path):
+        """Create the lock file, returns False if another process holds it"""
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{os.getpid()} {time.time()}")
+        return True
+
+    def _release(self, lock_path):
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _wait_for_release(self, lock_path, deadline):
+        """Wait until the lock is gone (True) or the deadline passes (False)"""
+        while time.time() < deadline:
+            try:
+                age = time.time() - lock_path.stat().st_mtime
+            except FileNotFoundError:
+                return True
+
+            if age > self.stale_after:
+                print(f"Breaking stale lock {lock_path.name} ({age:.0f}s old)", file=sys.stderr)
+                self._release(lock_path)
+                self.counters['stale_locks_broken'] += 1
+                return True
+
+            time.sleep(self.poll_interval)
+
+        return False
+
+    def run(self, key, compute, read_result, timeout=60):
+        """
+        Return compute() for key, computed by at most one process at a time
+
+        Args:
+            key: Filesystem-safe key (e.g. an md5 hex digest)
+            compute: Callable producing the value; it is expected to cache it
+            read_result: Callable returning the cached value or None
+            timeout: Seconds to wait for another process before computing anyway
+        """
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        lock_path = self._lock_path(key)
+        deadline = time.time() + timeout
+
+        while True:
+            if self._try_acquire(lock_path):
+                try:
+                    # The previous holder may have finished between our cache miss and acquiring
+                    result = read_result()
+                    if result is not None:
+                        self.counters['coalesced'] += 1
+                        return result
+
+                    self.counters['computed'] += 1
+                    return compute()
+                finally:
+                    self._release(lock_path)
+
+            print(f"Waiting for another process computing {key[:12]}...", file=sys.stderr)
+            if not self._wait_for_release(lock_path, deadline):
+                print(f"Timed out waiting for {key[:12]}, computing locally", file=sys.stderr)
+                self.counters['wait_timeouts'] += 1
+                self.counters['computed'] += 1
+                return compute()
+
+            result = read_result()
+            if result is not None:
+                self.counters['coalesced'] += 1
+                return result
+            # The holder produced nothing cacheable (e.g. an error) - try to take over
+
+    def stats(self):
+        return dict(self.counters)
@@ -0,0 +1,134 @@
+"""
+SITE REGISTRY
+Maps request coordinates to a site before any cache or quota decision, so
+nearby buildings share one weather snapshot and one forecast:
+- coordinates within a named site's radius resolve to that site
+- anything else snaps to the centre of a grid cell (SITE_GRID_DEG, default 0.01 deg ~ 1 km)
+
+Extra named sites can be loaded from a JSON file given by SITE_REGISTRY_FILE:
+    {"site_name": {"lat": 51.06, "lon": -114.09, "radius_km": 1.5}, ...}
+
+Usage: python site_registry.py <coordinates.csv>   (lat,lon per line; prints the dedup report)
+"""
+import json
+import math
+import os
+import sys
+import threading
+from collections import Counter
+from decimal import Decimal
+
+NAMED_SITES = {
+    'sait_campus': {'lat': 51.0643, 'lon': -114.0889, 'radius_km': 1.5}
+}
+
+# Distinct raw coordinates tracked for the dedup report
+MAX_TRACKED_COORDINATES = 100000
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+class Site:
+    def __init__(self, site_id, lat, lon, named=False):
+        self.site_id = site_id
+        self.lat = lat
+        self.lon = lon
+        self.named = named
+
+    def to_dict(self):
+        return {'site_id': self.site_id, 'lat': self.lat, 'lon': self.lon, 'named': self.named}
+
+class SiteRegistry:
+    def __init__(self, grid_deg=0.01, sites=None):
+        """
+        Args:
+            grid_deg: Grid cell size in degrees for coordinates outside named sites
+            sites: {name: {'lat', 'lon', 'radius_km'}} named sites (default: NAMED_SITES)
+        """
+        self.grid_deg = grid_deg
+        # Enough decimals to print any grid point exactly (0.01 -> 2, 0.005 -> 3)
+        self.decimals = max(0, -Decimal(str(grid_deg)).as_tuple().exponent)
+        self.sites = dict(NAMED_SITES if sites is None else sites)
+
+        self._lock = threading.Lock()
+        self._requests = Counter()
+        self._coordinates = set()
+
+    @classmethod
+    def from_env(cls):
+        sites = dict(NAMED_SITES)
+        registry_file = os.getenv('SITE_REGISTRY_FILE')
+        if registry_file:
+            try:
+                with open(registry_file, 'r') as f:
+                    sites.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring site registry file {registry_file}: {e}", file=sys.stderr)
+        return cls(float(os.getenv('SITE_GRID_DEG', '0.01')), sites)
+
+    def _snap(self, value):
+        return round(round(value / self.grid_deg) * self.grid_deg, self.decimals)
+
+    def resolve(self, lat, lon, track=True):
+        """
+        Site for a coordinate: the nearest named site whose radius contains it, else its grid cell
+
+        Args:
+            track: Count this lookup in the dedup report (False for internal re-resolution)
+        """
+        site = None
+        nearest_km = None
+        for name, spec in self.sites.items():
+            distance = haversine_km(lat, lon, spec['lat'], spec['lon'])
+            if distance <= spec.get('radius_km', 1.0) and (nearest_km is None or distance < nearest_km):
+                site, nearest_km = Site(name, spec['lat'], spec['lon'], named=True), distance
+
+        if site is None:
+            snapped_lat, snapped_lon = self._snap(lat), self._snap(lon)
+            site = Site(f"{snapped_lat:.{self.decimals}f}_{snapped_lon:.{self.decimals}f}", snapped_lat, snapped_lon)
+
+        if track:
+            with self._lock:
+                self._requests[site.site_id] += 1
+                if len(self._coordinates) < MAX_TRACKED_COORDINATES:
+                    self._coordinates.add((lat, lon))
+        return site
+
+    def stats(self):
+        """Dedup report: distinct coordinates seen versus the sites they collapsed into"""
+        with self._lock:
+            unique_sites = len(self._requests)
+            unique_coordinates = len(self._coordinates)
+            return {
+                'grid_deg': self.grid_deg,
+                'named_sites': len(self.sites),
+                'requests': sum(self._requests.values()),
+                'unique_coordinates': unique_coordinates,
+                'unique_sites': unique_sites,
+                'dedup_ratio': round(unique_coordinates / unique_sites, 2) if unique_sites else None,
+                'top_sites': dict(self._requests.most_common(10))
+            }
+
+# Shared by the weather and forecast services
+site_registry = SiteRegistry.from_env()
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python site_registry.py <coordinates.csv>")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r') as f:
+        for line in f:
+            parts = line.strip().split(',')
+            try:
+                site_registry.resolve(float(parts[0]), float(parts[1]))
+            except (ValueError, IndexError):
+                continue  # header or malformed line
+
+    print(json.dumps(site_registry.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
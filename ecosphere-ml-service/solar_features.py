@@ -0,0 +1,179 @@
+"""
+SOLAR FEATURE BUILDER
+Builds the solar model feature matrix for many hours at once from
+timestamps plus an hourly weather array, using precomputed lookup tables
+"""
+import numpy as np
+
+# Weather inputs, in the column order of the hourly weather array
+WEATHER_FEATURES = (
+    'uv_index',
+    'temperature_c',
+    'humidity_pct',
+    'pressure_kpa',
+    'dew_point_c',
+    'wind_speed_ms',
+    'wind_direction_deg',
+    'clouds_pct',
+    'visibility_m',
+    'precipitation_mmh'
+)
+
+# Values used when an hour has no weather data
+WEATHER_DEFAULTS = np.array([1.0, 15.0, 50.0, 101.3, 10.0, 3.0, 180.0, 50.0, 10000.0, 0.0])
+
+# Time-derived features, in the column order produced by time_feature_block
+TIME_FEATURES = (
+    'hour_sin',
+    'hour_cos',
+    'month_sin',
+    'month_cos',
+    'day_of_year_sin',
+    'day_of_year_cos',
+    'is_daylight',
+    'season',
+    'day_length_hours',
+    'hour',
+    'month',
+    'day_of_week',
+    'day_of_year'
+)
+
+# Every column the builder can produce: weather block followed by time block
+SOURCE_FEATURES = WEATHER_FEATURES + TIME_FEATURES
+
+# ============================================
+# LOOKUP TABLES (indexed by hour, month or day of year)
+# ============================================
+_HOURS = np.arange(24)
+HOUR_SIN = np.sin(2 * np.pi * _HOURS / 24)
+HOUR_COS = np.cos(2 * np.pi * _HOURS / 24)
+
+# Daylight window used by the model (6 AM to 9 PM)
+IS_DAYLIGHT = ((_HOURS >= 6) & (_HOURS <= 21)).astype(float)
+
+# Index 0 is unused so months can index directly
+_MONTHS = np.arange(13)
+MONTH_SIN = np.sin(2 * np.pi * _MONTHS / 12)
+MONTH_COS = np.cos(2 * np.pi * _MONTHS / 12)
+
+# Season (0=winter, 1=spring, 2=summer, 3=fall)
+SEASON_BY_MONTH = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=float)
+
+# Day length (Calgary-specific)
+DAY_LENGTH_BY_MONTH = np.array([12.0, 8.5, 10.0, 11.8, 13.7, 15.3, 16.3, 16.0, 14.5, 12.7, 10.8, 9.1, 8.2])
+
+# Index 0 is unused so days of year (1-366) can index directly
+_DAYS = np.arange(367)
+DAY_OF_YEAR_SIN = np.sin(2 * np.pi * _DAYS / 365)
+DAY_OF_YEAR_COS = np.cos(2 * np.pi * _DAYS / 365)
+
+def time_components(timestamps):
+    """Split timestamps into hour, month, day of week and day of year arrays"""
+    hours = np.asarray(timestamps, dtype='datetime64[h]')
+    days = hours.astype('datetime64[D]')
+
+    hour = hours.astype(np.int64) % 24
+    month = hours.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    # 1970-01-01 was a Thursday (Monday=0)
+    day_of_week = (days.astype(np.int64) + 3) % 7
+    day_of_year = (days - hours.astype('datetime64[Y]').astype('datetime64[D]')).astype(np.int64) + 1
+
+    return hour, month, day_of_week, day_of_year
+
+def time_feature_block(timestamps):
+    """Create all time-derived feature columns as an array in TIME_FEATURES order"""
+    hour, month, day_of_week, day_of_year = time_components(timestamps)
+
+    return np.column_stack([
+        HOUR_SIN[hour],
+        HOUR_COS[hour],
+        MONTH_SIN[month],
+        MONTH_COS[month],
+        DAY_OF_YEAR_SIN[day_of_year],
+        DAY_OF_YEAR_COS[day_of_year],
+        IS_DAYLIGHT[hour],
+        SEASON_BY_MONTH[month],
+        DAY_LENGTH_BY_MONTH[month],
+        hour,
+        month,
+        day_of_week,
+        day_of_year
+    ])
+
+def weather_matrix(rows):
+    """Convert hourly weather dicts (or None) into an array in WEATHER_FEATURES order"""
+    if isinstance(rows, np.ndarray):
+        return rows
+
+    matrix = np.tile(WEATHER_DEFAULTS, (len(rows), 1))
+
+    for i, row in enumerate(rows):
+        if row:
+            matrix[i] = [row.get(name, default) for name, default in zip(WEATHER_FEATURES, WEATHER_DEFAULTS)]
+
+    return matrix
+
+def default_for_feature(feature_name):
+    """Sensible default for a model feature the builder cannot produce"""
+    if 'uv' in feature_name:
+        return 1.0
+    elif 'temp' in feature_name:
+        return 15.0
+    elif 'cloud' in feature_name:
+        return 50.0
+    return 0.0
+
+class FeaturePlan:
+    """Column plan mapping builder output onto one model's feature order, compiled once"""
+
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+        self.missing_features = []
+        self.defaults = np.zeros(len(self.feature_names), dtype=np.float32)
+
+        target_index = []
+        source_index = []
+        for k, name in enumerate(self.feature_names):
+            if name in SOURCE_FEATURES:
+                target_index.append(k)
+                source_index.append(SOURCE_FEATURES.index(name))
+            else:
+                self.missing_features.append(name)
+                self.defaults[k] = default_for_feature(name)
+
+        self.target_index = np.array(target_index, dtype=np.intp)
+        self.source_index = np.array(source_index, dtype=np.intp)
+
+    def build(self, timestamps, weather=None):
+        """
+        Build the float32 feature matrix for many hours at once
+
+        Args:
+            timestamps: Sequence of datetimes (or datetime64 array), one per row
+            weather: Array of shape (rows, len(WEATHER_FEATURES)), or None for defaults
+        """
+        time_block = time_feature_block(timestamps)
+        if weather is None:
+            weather = np.broadcast_to(WEATHER_DEFAULTS, (len(time_block), len(WEATHER_FEATURES)))
+
+        source = np.hstack([weather, time_block])
+
+        matrix = np.tile(self.defaults, (len(source), 1))
+        matrix[:, self.target_index] = source[:, self.source_index]
+        return matrix
+
+def build_feature_matrix(timestamps, weather, feature_names):
+    """
+    Build the float32 feature matrix for many hours at once
+
+    Args:
+        timestamps: Sequence of datetimes (or datetime64 array), one per row
+        weather: Array of shape (rows, len(WEATHER_FEATURES)), or None for defaults
+        feature_names: Model feature order
+
+    Returns:
+        (matrix, missing_features) - missing features are filled with defaults
+    """
+    plan = FeaturePlan(feature_names)
+    return plan.build(timestamps, weather), plan.missing_features
@@ -3,10 +3,17 @@ SINGLE API CALL TEST: Next Hour Solar Forecast
 Converts OpenWeather data to NASA dataset format and makes one prediction
 """
 import requests
-import pandas as pd
 import numpy as np
 from datetime import datetime
-import joblib
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
+sys.path.append(project_root)
+
+from solar_features import build_feature_matrix, weather_matrix
+from model_artifacts import load_serving_model
 
 # ============================================
 # CONFIGURATION
@@ -104,47 +111,9 @@ def convert_to_nasa_features(next_hour_data):
     features['precipitation_mmh'] = rain_mm + snow_mm
     
     # ============================================
-    # 2. TIME FEATURES (from timestamp)
+    # 2. TIMESTAMP (time features are built by solar_features)
     # ============================================
-    dt = datetime.fromtimestamp(next_hour_data['dt'])
-    
-    # Basic time features
-    features['hour'] = dt.hour
-    features['month'] = dt.month
-    features['day_of_week'] = dt.weekday()  # Monday=0, Sunday=6
-    features['day_of_year'] = dt.timetuple().tm_yday
-    
-    # Circular encoding (CRITICAL for time series!)
-    features['hour_sin'] = np.sin(2 * np.pi * dt.hour / 24)
-    features['hour_cos'] = np.cos(2 * np.pi * dt.hour / 24)
-    features['month_sin'] = np.sin(2 * np.pi * dt.month / 12)
-    features['month_cos'] = np.cos(2 * np.pi * dt.month / 12)
-    
-    # Day of year circular encoding
-    features['day_of_year_sin'] = np.sin(2 * np.pi * dt.timetuple().tm_yday / 365)
-    features['day_of_year_cos'] = np.cos(2 * np.pi * dt.timetuple().tm_yday / 365)
-    
-    # Daylight flag (Calgary: ~6 AM to 9 PM)
-    features['is_daylight'] = 1 if 6 <= dt.hour <= 21 else 0
-    
-    # Season (based on month)
-    month = dt.month
-    if month in [12, 1, 2]:
-        features['season'] = 0  # Winter
-    elif month in [3, 4, 5]:
-        features['season'] = 1  # Spring
-    elif month in [6, 7, 8]:
-        features['season'] = 2  # Summer
-    else:
-        features['season'] = 3  # Fall
-    
-    # Day length estimate (Calgary-specific - adjust for your location)
-    day_lengths = {
-        1: 8.5, 2: 10.0, 3: 11.8, 4: 13.7, 5: 15.3,
-        6: 16.3, 7: 16.0, 8: 14.5, 9: 12.7, 10: 10.8,
-        11: 9.1, 12: 8.2
-    }
-    features['day_length_hours'] = day_lengths.get(month, 12.0)
+    features['timestamp'] = datetime.fromtimestamp(next_hour_data['dt'])
     
     return features
 
@@ -155,12 +124,11 @@ def load_and_predict(features_dict):
     
     # Load model
     try:
-        model_data = joblib.load(MODEL_PATH)
-        model = model_data['model']
-        feature_names = model_data['feature_names']
-        scaler = model_data['scaler']
-        metrics = model_data.get('metrics', {})
-        model_name = model_data.get('model_name', 'Unknown')
+        # Memory-mapped compiled arrays when a sidecar exists, else the full package
+        model, scaler, model_info = load_serving_model(MODEL_PATH)
+        feature_names = model_info['feature_names']
+        metrics = model_info.get('metrics', {})
+        model_name = model_info.get('model_name', 'Unknown')
         
         print(f"Loaded {model_name} model")
         print(f"   Training R²: {metrics.get('r2', 0):.3f}")
@@ -170,32 +138,27 @@ def load_and_predict(features_dict):
         return None
     
     # ============================================
-    # CRITICAL: Create DataFrame with correct feature order
+    # CRITICAL: Build feature matrix in training feature order
     # ============================================
-    features_df = pd.DataFrame([features_dict])
-    
-    # Check if we have all required features
-    missing_features = []
-    for req_feature in feature_names:
-        if req_feature not in features_df.columns:
-            missing_features.append(req_feature)
-            features_df[req_feature] = 0  # Fill missing with 0
+    features, missing_features = build_feature_matrix(
+        [features_dict['timestamp']],
+        weather_matrix([features_dict]),
+        feature_names
+    )
     
     if missing_features:
-        print(f"Missing {len(missing_features)} features (filled with 0):")
+        print(f"Missing {len(missing_features)} features (filled with defaults):")
         for feat in missing_features[:5]:
             print(f"   - {feat}")
         if len(missing_features) > 5:
             print(f"   ... and {len(missing_features) - 5} more")
     
-    # Ensure correct feature order
-    features_df = features_df[feature_names]
-    
-    # Scale features (MUST use the same scaler as training)
-    features_scaled = scaler.transform(features_df)
+    # Scale features (MUST use the same scaler as training; compiled models have it folded in)
+    if scaler is not None:
+        features = scaler.transform(features.astype(np.float64))
     
     # Make prediction (model expects log1p transformed target)
-    prediction_log1p = model.predict(features_scaled)[0]
+    prediction_log1p = model.predict(features)[0]
     
     # Convert back to kW (expm1 is inverse of log1p)
     prediction_kw = np.expm1(prediction_log1p)
@@ -226,7 +189,7 @@ def display_results(weather_data, features, prediction):
     print(f"   Wind Speed:     {features.get('wind_speed_ms', 0):.1f} m/s")
     print(f"   Pressure:       {features.get('pressure_kpa', 0):.1f} kPa")
     print(f"   Precipitation:  {features.get('precipitation_mmh', 0):.1f} mm/h")
-    print(f"   Daylight:       {'Yes' if features.get('is_daylight', 0) == 1 else 'No'}")
+    print(f"   Daylight:       {'Yes' if 6 <= dt.hour <= 21 else 'No'}")
     
     # Display prediction
     print(f"\nSOLAR GENERATION PREDICTION:")
@@ -261,7 +224,7 @@ def display_results(weather_data, features, prediction):
     print(f"   Features used: {prediction['features_used']}")
     
     if prediction['missing_features'] > 0:
-        print(f"Missing features: {prediction['missing_features']} (filled with 0)")
+        print(f"Missing features: {prediction['missing_features']} (filled with defaults)")
     
     print(f"\nAPI CALLS MADE: 1")
     print("PREDICTIONS MADE: 1")
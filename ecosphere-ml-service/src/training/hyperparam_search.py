@@ -0,0 +1,352 @@
+# src/training/hyperparam_search.py
+"""
+HYPERPARAMETER SEARCH
+Successive halving over time-series folds, shared by the trainers' --tune option.
+
+Every candidate configuration is scored with a small number of trees; the best
+1/eta move up a rung and are scored again with eta times more trees, until one
+configuration is left or the tree budget is reached. Trials run in parallel
+worker processes that together stay within the CPU budget, no new trial starts
+once the time budget is spent, and every scored trial is written to a JSON
+state file so an interrupted search resumes where it stopped.
+
+Settings for tune():
+    TUNE_TIME_BUDGET  seconds per search (default 600)
+    TUNE_RUN_BUDGET   seconds for all searches of one training run (default 3600)
+    TUNE_CANDIDATES   configurations in the first rung (default 27)
+    TUNE_CPU_BUDGET   cores shared by concurrent trials (default: all)
+    TUNE_STATE_DIR    trial state and results (default models/tuning)
+"""
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+from sklearn.model_selection import TimeSeriesSplit
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
+
+# Lists are choices, ('log', low, high) is sampled log-uniformly; single-item lists are fixed
+SEARCH_SPACES = {
+    'lightgbm': {
+        'learning_rate': ('log', 0.01, 0.2),
+        'num_leaves': [15, 31, 63, 127],
+        'max_depth': [-1, 4, 8],
+        'min_child_samples': [10, 20, 50, 100],
+        'subsample': [0.6, 0.8, 1.0],
+        'subsample_freq': [1],
+        'colsample_bytree': [0.6, 0.8, 1.0],
+        'reg_alpha': ('log', 1e-3, 1.0),
+        'reg_lambda': ('log', 1e-3, 10.0)
+    },
+    'xgboost': {
+        'learning_rate': ('log', 0.01, 0.2),
+        'max_depth': [3, 4, 6, 8],
+        'min_child_weight': [1, 3, 10, 50],
+        'subsample': [0.6, 0.8, 1.0],
+        'colsample_bytree': [0.6, 0.8, 1.0],
+        'reg_alpha': ('log', 1e-3, 1.0),
+        'reg_lambda': ('log', 1e-2, 10.0)
+    },
+    'random_forest': {
+        'max_depth': [8, 10, 15, None],
+        'min_samples_split': [2, 5, 20],
+        'min_samples_leaf': [1, 2, 10],
+        'max_features': ['sqrt', 0.5, 1.0]
+    }
+}
+
+# Trees per trial on the first and last rung
+TREE_BUDGETS = {
+    'lightgbm': (50, 800),
+    'xgboost': (50, 800),
+    'random_forest': (25, 300)
+}
+
+# lgb.train() names for the LGBMRegressor parameters in the search space
+LIGHTGBM_NATIVE_NAMES = {
+    'min_child_samples': 'min_data_in_leaf',
+    'subsample': 'bagging_fraction',
+    'subsample_freq': 'bagging_freq',
+    'colsample_bytree': 'feature_fraction',
+    'reg_alpha': 'lambda_l1',
+    'reg_lambda': 'lambda_l2'
+}
+
+def lightgbm_native_params(params):
+    """Tuned LGBMRegressor parameters renamed for an lgb.train() params dict"""
+    return {LIGHTGBM_NATIVE_NAMES.get(key, key): value for key, value in params.items()}
+
+def sample_params(space, rng):
+    params = {}
+    for name, values in space.items():
+        if isinstance(values, tuple):
+            _, low, high = values
+            params[name] = float(math.exp(rng.uniform(math.log(low), math.log(high))))
+        else:
+            params[name] = rng.choice(values)
+    return params
+
+def build_model(family, params, n_trees, n_jobs):
+    """Unfitted regressor of a model family with n_trees trees"""
+    if family == 'lightgbm':
+        import lightgbm as lgb
+        return lgb.LGBMRegressor(n_estimators=n_trees, random_state=42, verbose=-1, n_jobs=n_jobs, **params)
+    if family == 'xgboost':
+        import xgboost as xgb
+        return xgb.XGBRegressor(n_estimators=n_trees, random_state=42, verbosity=0, n_jobs=n_jobs, **params)
+    if family == 'random_forest':
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(n_estimators=n_trees, random_state=42, n_jobs=n_jobs, **params)
+    raise ValueError(f"Unknown model family '{family}', expected one of {list(SEARCH_SPACES)}")
+
+def _take(data, idx):
+    return data.iloc[idx] if hasattr(data, 'iloc') else data[idx]
+
+def _loss(metric, y_true, y_pred):
+    if metric == 'mae':
+        return mean_absolute_error(y_true, y_pred)
+    return float(np.sqrt(mean_squared_error(y_true, y_pred)))
+
+# Training data of a worker process, sent once by the pool initializer rather than with every trial
+_worker_data = None
+
+def _init_worker(X, y, folds):
+    global _worker_data
+    _worker_data = (X, y, folds)
+
+def evaluate_trial(family, params, n_trees, n_jobs, metric):
+    """Mean validation loss of one configuration over the time-series folds (in a worker process)"""
+    X, y, folds = _worker_data
+    losses = []
+    for train_idx, test_idx in folds:
+        model = build_model(family, params, n_trees, n_jobs)
+        model.fit(_take(X, train_idx), _take(y, train_idx))
+        losses.append(_loss(metric, _take(y, test_idx), model.predict(_take(X, test_idx))))
+    return float(np.mean(losses))
+
+def data_fingerprint(X, y):
+    """Shape, columns and target values, so a resumed search only reuses trials scored on the same data"""
+    digest = hashlib.sha1(np.ascontiguousarray(np.asarray(y, dtype=np.float64)).tobytes())
+    digest.update(json.dumps([list(np.shape(X)), [str(c) for c in getattr(X, 'columns', [])]]).encode('utf-8'))
+    return digest.hexdigest()
+
+def _load_state(state_path, config):
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        if state.get('config') == config:
+            return state
+        print(f"   Search settings or data changed, starting over: {state_path}")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"   Unreadable search state {state_path}, starting over: {e}")
+    return {'config': config, 'trials': []}
+
+def _save_state(state_path, state):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+def successive_halving(family, X, y, state_path=None, n_candidates=27, eta=3, min_trees=None,
+                       max_trees=None, n_splits=3, metric='rmse', time_budget=None, cpu_budget=None, seed=42):
+    """
+    Search a model family's hyperparameters by successive halving
+
+    Args:
+        family: 'lightgbm', 'xgboost' or 'random_forest'
+        X, y: Training data in time order
+        state_path: JSON file recording every scored trial; an existing one for the same settings and data is resumed
+        n_candidates: Configurations sampled for the first rung
+        eta: Each rung keeps the best 1/eta and gives them eta times more trees
+        min_trees, max_trees: Trees per trial on the first and last rung (default TREE_BUDGETS)
+        n_splits: TimeSeriesSplit folds per trial
+        metric: 'rmse' or 'mae', lower is better
+        time_budget: Seconds after which no new trial starts (running trials still finish)
+        cpu_budget: Cores shared by concurrent trials (default: all)
+        seed: Seed for sampling configurations
+
+    Returns:
+        Dict with best_params (without the tree count), best_loss, best_trees, rungs and complete
+    """
+    started = time.time()
+    deadline = started + time_budget if time_budget else None
+    default_min, default_max = TREE_BUDGETS[family]
+    min_trees = min_trees or default_min
+    max_trees = max_trees or default_max
+    cpu_budget = max(1, cpu_budget or os.cpu_count() or 1)
+
+    config = {
+        'family': family, 'n_candidates': n_candidates, 'eta': eta, 'min_trees': min_trees,
+        'max_trees': max_trees, 'n_splits': n_splits, 'metric': metric, 'seed': seed,
+        'data': data_fingerprint(X, y)
+    }
+    state = _load_state(state_path, config) if state_path else {'config': config, 'trials': []}
+
+    if not state['trials']:
+        rng = random.Random(seed)
+        state['trials'] = [{'params': sample_params(SEARCH_SPACES[family], rng), 'losses': {}}
+                           for _ in range(n_candidates)]
+    trials = state['trials']
+
+    # Rung k scores the survivors with min_trees * eta^k trees (the last rung with max_trees)
+    n_rungs = 1 + max(0, int(math.floor(math.log(max_trees / min_trees, eta) + 1e-9)))
+    # ...and stops while eta trials are left to compare
+    n_rungs = min(n_rungs, max(1, int(math.floor(math.log(n_candidates, eta) + 1e-9))))
+    rung_trees = [min(max_trees, min_trees * eta ** k) for k in range(n_rungs)]
+    rung_trees[-1] = max_trees
+
+    folds = [(train_idx, test_idx) for train_idx, test_idx in TimeSeriesSplit(n_splits=n_splits).split(X)]
+    workers = min(cpu_budget, n_candidates)
+    pool = None
+    if workers > 1:
+        # spawn, not fork: LightGBM and XGBoost use OpenMP, which is not fork-safe
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker, initargs=(X, y, folds))
+    else:
+        _init_worker(X, y, folds)
+
+    print(f"   Successive halving for {family}: {n_candidates} configurations, "
+          f"trees per rung {rung_trees}, {workers} worker(s) on {cpu_budget} cores")
+
+    survivors = list(range(len(trials)))
+    completed_rungs = []
+    try:
+        for rung, n_trees in enumerate(rung_trees):
+            key = str(n_trees)
+            pending = [i for i in survivors if key not in trials[i]['losses']]
+            if deadline and time.time() >= deadline:
+                pending = []
+            # Concurrent trials share the cores: n_jobs times trials in flight stays within the budget
+            n_jobs = max(1, cpu_budget // max(1, min(workers, len(pending))))
+
+            if pool is not None and pending:
+                futures = {pool.submit(evaluate_trial, family, trials[i]['params'], n_trees, n_jobs, metric): i
+                           for i in pending}
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    i = futures[future]
+                    try:
+                        trials[i]['losses'][key] = future.result()
+                    except BrokenProcessPool:
+                        # A worker died: nothing is recorded, so a rerun scores these trials again
+                        raise
+                    except Exception as e:
+                        print(f"   Trial {i} failed: {e}")
+                        trials[i]['losses'][key] = float('inf')
+                    if state_path:
+                        _save_state(state_path, state)
+                    # Out of time: queued trials are dropped, running ones finish and are recorded
+                    if deadline and time.time() >= deadline:
+                        for other in futures:
+                            other.cancel()
+            else:
+                for i in pending:
+                    if deadline and time.time() >= deadline:
+                        break
+                    try:
+                        trials[i]['losses'][key] = evaluate_trial(family, trials[i]['params'], n_trees, n_jobs, metric)
+                    except Exception as e:
+                        print(f"   Trial {i} failed: {e}")
+                        trials[i]['losses'][key] = float('inf')
+                    if state_path:
+                        _save_state(state_path, state)
+
+            scored = [i for i in survivors if key in trials[i]['losses']]
+            if len(scored) < len(survivors):
+                # Partly scored rung: its trials are compared on the previous rung instead
+                if not completed_rungs:
+                    completed_rungs.append((n_trees, scored))
+                break
+
+            completed_rungs.append((n_trees, survivors))
+            best_loss = min(trials[i]['losses'][key] for i in survivors)
+            print(f"   Rung {rung + 1}/{len(rung_trees)}: {len(survivors)} trials with {n_trees} trees, "
+                  f"best {metric} {best_loss:.4f} ({time.time() - started:.0f}s)")
+
+            # Promote the best 1/eta (ties keep sampling order)
+            survivors = sorted(survivors, key=lambda i: (trials[i]['losses'][key], i))[:max(1, len(survivors) // eta)]
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    if not completed_rungs or not completed_rungs[-1][1]:
+        print(f"   No trial finished within the time budget")
+        return None
+
+    n_trees, ranked = completed_rungs[-1]
+    best = min(ranked, key=lambda i: (trials[i]['losses'][str(n_trees)], i))
+    result = {
+        'family': family,
+        'best_params': trials[best]['params'],
+        'best_loss': trials[best]['losses'][str(n_trees)],
+        'best_trees': n_trees,
+        'metric': metric,
+        'rungs': [{'trees': trees, 'trials': len(ids)} for trees, ids in completed_rungs],
+        'complete': len(completed_rungs) == len(rung_trees),
+        'trials_scored': sum(len(trial['losses']) for trial in trials),
+        'elapsed_seconds': round(time.time() - started, 1),
+        'finished_at': datetime.now().isoformat()
+    }
+
+    if state_path:
+        state['result'] = result
+        _save_state(state_path, state)
+
+    print(f"   Best {family}: {metric} {result['best_loss']:.4f} with {n_trees} trees"
+          f"{'' if result['complete'] else ' (search incomplete, resumable)'}")
+    print(f"   Params: {result['best_params']}")
+    return result
+
+# Deadline shared by every tune() call in this process, set by the first one
+_run_deadline = None
+
+def tune(family, X, y, name, metric='rmse'):
+    """
+    Environment-configured search for a trainer's --tune option
+
+    Each search gets TUNE_TIME_BUDGET seconds, cut short so that all searches of
+    the run end within TUNE_RUN_BUDGET seconds of the first one starting.
+
+    Returns:
+        Best parameters without the tree count, or {} (the trainer's defaults) when the search fails
+    """
+    global _run_deadline
+    if _run_deadline is None:
+        _run_deadline = time.time() + float(os.getenv('TUNE_RUN_BUDGET', '3600'))
+
+    state_dir = os.getenv('TUNE_STATE_DIR', os.path.join(project_root, 'models', 'tuning'))
+    os.makedirs(state_dir, exist_ok=True)
+    cpu_budget = os.getenv('TUNE_CPU_BUDGET')
+
+    print(f"\n TUNING {family.upper()} ({name})")
+    print("-" * 50)
+    time_budget = min(float(os.getenv('TUNE_TIME_BUDGET', '600')), _run_deadline - time.time())
+    if time_budget <= 0:
+        print(f"   Run budget spent, keeping the default parameters")
+        return {}
+    try:
+        result = successive_halving(
+            family, X, y,
+            state_path=os.path.join(state_dir, f"{name}.json"),
+            n_candidates=int(os.getenv('TUNE_CANDIDATES', '27')),
+            metric=metric,
+            time_budget=time_budget,
+            cpu_budget=int(cpu_budget) if cpu_budget else None
+        )
+    except Exception as e:
+        print(f"   Search failed, keeping the default parameters: {e}")
+        return {}
+    return result['best_params'] if result else {}
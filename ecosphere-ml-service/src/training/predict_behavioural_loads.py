@@ -16,6 +16,22 @@ sys.path.append(project_root)
 
 MODEL_DIR = os.path.join(project_root, "models", "behavioral_loads_production_fixed")
 
+def load_compiled_model(model_path):
+    """Load the compiled .npz next to a model package, if it was exported from this package"""
+    # NumPy-only evaluator; avoids unpickling sklearn/xgboost/lightgbm
+    from tree_ensemble import load_export
+    model = load_export(model_path)
+    if model is None:
+        return None
+    print(f"Compiled model: {os.path.splitext(os.path.basename(model_path))[0]}.npz ({model.n_trees} trees)")
+    
+    return {
+        'model': model,
+        'feature_names': model.metadata.get('feature_names', []),
+        'model_type': model.metadata.get('training_info', {}).get('model_type', model.metadata.get('model_type', 'unknown')),
+        'metrics': model.metadata.get('metrics', {})
+    }
+
 def load_simple_model():
     """Load a simple model that works"""
     print(f"\n📂 LOADING MODEL FROM: {MODEL_DIR}")
@@ -45,6 +61,12 @@ def load_simple_model():
     print(f"📁 Loading: {model_files[0]}")
     
     try:
+        compiled = load_compiled_model(model_path)
+        if compiled:
+            print(f"Model type: {compiled['model_type']}")
+            print(f"   Features: {len(compiled['feature_names']) if compiled['feature_names'] else 'unknown'}")
+            return compiled
+        
         model_data = joblib.load(model_path)
         
         # Check what type of data we have
@@ -205,6 +227,10 @@ def main():
                     model_path = os.path.join(prod_dir, file)
                     print(f"📁 Loading best model: {model_path}")
                     try:
+                        model_data = load_compiled_model(model_path)
+                        if model_data:
+                            print(f"✅ Loaded best model")
+                            break
                         model_data_raw = joblib.load(model_path)
                         if isinstance(model_data_raw, dict) and 'model' in model_data_raw:
                             model_data = {
@@ -2,7 +2,16 @@
 VALIDATION TEST: Check if model responds correctly to weather changes
 """
 import numpy as np
-import joblib
+import os
+import sys
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
+sys.path.append(project_root)
+
+from solar_features import build_feature_matrix, weather_matrix
+from model_artifacts import load_serving_model
 
 def validate_model_response():
     """Test if model responds correctly to weather variables"""
@@ -11,10 +20,8 @@ def validate_model_response():
     print("="*60)
     
     # Load model
-    model_data = joblib.load("solar_forecast_openweather.pkl")
-    model = model_data['model']
-    feature_names = model_data['feature_names']
-    scaler = model_data['scaler']
+    model, scaler, model_info = load_serving_model("solar_forecast_openweather.pkl")
+    feature_names = model_info['feature_names']
     
     # Test scenarios
     test_cases = [
@@ -49,21 +56,18 @@ def validate_model_response():
     
     print(f"Testing {len(test_cases)} weather scenarios...\n")
     
-    for i, scenario in enumerate(test_cases, 1):
-        # Create feature vector
-        features = create_test_features(scenario)
-        
-        # Ensure all features exist
-        features_df = pd.DataFrame([features])
-        for feat in feature_names:
-            if feat not in features_df.columns:
-                features_df[feat] = 0
-        
-        # Scale and predict
-        features_scaled = scaler.transform(features_df[feature_names])
-        prediction_log1p = model.predict(features_scaled)[0]
-        prediction_kw = np.expm1(prediction_log1p)
-        
+    # Build every scenario in one feature matrix
+    timestamps, weather = create_test_features(test_cases)
+    features, missing_features = build_feature_matrix(timestamps, weather, feature_names)
+    # Features the scenarios do not set are 0, as this script has always filled them
+    features[:, [feature_names.index(name) for name in missing_features]] = 0
+    
+    # Scale (unless folded into a compiled model) and predict
+    if scaler is not None:
+        features = scaler.transform(features.astype(np.float64))
+    predictions_kw = np.expm1(model.predict(features))
+    
+    for i, (scenario, prediction_kw) in enumerate(zip(test_cases, predictions_kw), 1):
         print(f"SCENARIO {i}: {scenario['name']}")
         print(f"   UV Index: {scenario['uv_index']:.1f}")
         print(f"   Cloud Cover: {scenario['clouds_pct']}%")
@@ -84,41 +88,29 @@ def validate_model_response():
                 print(f"   REASONABLE: Poor conditions → low prediction")
         print()
 
-def create_test_features(scenario):
-    """Create feature dictionary for test scenario"""
-    features = {}
-    
-    # Weather features
-    features['uv_index'] = scenario['uv_index']
-    features['temperature_c'] = scenario['temperature_c']
-    features['clouds_pct'] = scenario['clouds_pct']
-    features['humidity_pct'] = 50  # Default
-    features['pressure_kpa'] = 101.3  # Default
-    features['wind_speed_ms'] = 3.0  # Default
-    features['precipitation_mmh'] = 0  # Default
-    
-    # Time features
-    hour = scenario['hour']
-    month = scenario['month']
+def create_test_features(scenarios):
+    """Create timestamps and weather array for test scenarios"""
+    # Mid-month representative day for each scenario
+    timestamps = [datetime(2024, scenario['month'], 15, scenario['hour']) for scenario in scenarios]
     
-    features['hour_sin'] = np.sin(2 * np.pi * hour / 24)
-    features['hour_cos'] = np.cos(2 * np.pi * hour / 24)
-    features['month_sin'] = np.sin(2 * np.pi * month / 12)
-    features['month_cos'] = np.cos(2 * np.pi * month / 12)
-    features['is_daylight'] = scenario['is_daylight']
-    
-    # Season
-    if month in [12, 1, 2]:
-        features['season'] = 0
-    elif month in [3, 4, 5]:
-        features['season'] = 1
-    elif month in [6, 7, 8]:
-        features['season'] = 2
-    else:
-        features['season'] = 3
+    # Weather features (unspecified values are 0, not the service's WEATHER_DEFAULTS)
+    weather = weather_matrix([
+        {
+            'uv_index': scenario['uv_index'],
+            'temperature_c': scenario['temperature_c'],
+            'clouds_pct': scenario['clouds_pct'],
+            'humidity_pct': 50,
+            'pressure_kpa': 101.3,
+            'wind_speed_ms': 3.0,
+            'precipitation_mmh': 0,
+            'dew_point_c': 0,
+            'wind_direction_deg': 0,
+            'visibility_m': 0
+        }
+        for scenario in scenarios
+    ])
     
-    return features
+    return timestamps, weather
 
 if __name__ == "__main__":
-    import pandas as pd
     validate_model_response()
\ No newline at end of file
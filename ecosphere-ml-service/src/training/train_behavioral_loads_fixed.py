@@ -214,19 +214,27 @@ def main():
     print(f"   Train: {len(X_train):,} samples")
     print(f"   Test:  {len(X_test):,} samples")
     
+    # Search hyperparameters on the training split (python train_behavioral_loads_fixed.py --tune)
+    tuned = {}
+    if '--tune' in sys.argv:
+        from hyperparam_search import tune
+        for family in ('xgboost', 'lightgbm'):
+            tuned[family] = tune(family, X_train, y_train, f"behavioral_loads_fixed_{family}")
+    
     # Train models
     all_results = {}
     
     print(f"\n3. TRAINING XGBOOST")
     print("-" * 50)
     
+    xgb_params = {'learning_rate': 0.01, 'max_depth': 4}
+    xgb_params.update(tuned.get('xgboost', {}))
     xgb_model = xgb.XGBRegressor(
         n_estimators=300,
-        learning_rate=0.01,
-        max_depth=4,
         random_state=42,
         verbosity=0,
-        n_jobs=-1
+        n_jobs=-1,
+        **xgb_params
     )
     xgb_model.fit(X_train, y_train)
     
@@ -251,13 +259,14 @@ def main():
     print(f"\n4. TRAINING LIGHTGBM")
     print("-" * 50)
     
+    lgb_params = {'learning_rate': 0.01, 'max_depth': 4}
+    lgb_params.update(tuned.get('lightgbm', {}))
     lgb_model = lgb.LGBMRegressor(
         n_estimators=300,
-        learning_rate=0.01,
-        max_depth=4,
         random_state=42,
         verbose=-1,
-        n_jobs=-1
+        n_jobs=-1,
+        **lgb_params
     )
     lgb_model.fit(X_train, y_train)
     
@@ -85,44 +85,88 @@ def create_splits(X, y, test_size=0.2):
     
     return X_train, X_test, y_train, y_test
 
-def train_xgboost_model(X_train, y_train, X_test, y_test):
-    """Train XGBoost model"""
+# Tree counts considered for the boosted models, all scored from a single fit
+N_ESTIMATORS_GRID = [100, 200, 300, 400, 500]
+# Patience of one grid step: a tree count is skipped only after a full step without improvement
+EARLY_STOPPING_ROUNDS = 100
+
+def split_validation(X_train, y_train, val_size=0.2):
+    """Hold out the latest training rows for early stopping, so the test split stays unseen"""
+    split_idx = int(len(X_train) * (1 - val_size))
+    return (X_train.iloc[:split_idx], X_train.iloc[split_idx:],
+            y_train.iloc[:split_idx], y_train.iloc[split_idx:])
+
+def select_tree_count(staged_predict, n_trees, y_val):
+    """
+    Score the grid tree counts from one fitted model on the validation rows
+    
+    Args:
+        staged_predict: Function n -> validation predictions using the first n trees
+        n_trees: Best iteration of the fit (below the grid maximum after early stopping)
+        y_val: Validation targets
+    
+    Returns:
+        (best tree count, its validation R²)
+    """
+    # Trees past an early stop may be gone, so the best iteration is scored in place of larger grid sizes
+    candidates = [n for n in N_ESTIMATORS_GRID if n <= n_trees]
+    if n_trees not in candidates:
+        candidates.append(n_trees)
+    
+    best_n, best_score = None, -np.inf
+    for n_estimators in candidates:
+        score = r2_score(y_val, staged_predict(n_estimators))
+        print(f"   n_estimators={n_estimators}: R² {score:.4f}")
+        
+        if score > best_score:
+            best_score = score
+            best_n = n_estimators
+    
+    return best_n, best_score
+
+def train_xgboost_model(X_train, y_train, X_test, y_test, tuned_params=None):
+    """Train XGBoost model (tuned_params override the defaults)"""
     print(f"\n3. TRAINING XGBOOST")
     print("-" * 50)
     
     try:
-        # Find optimal n_estimators
-        best_score = -np.inf
-        best_model = None
-        best_n = 0
+        # One fit up to the largest grid size, stopping early once the validation RMSE stalls
+        params = {
+            'learning_rate': 0.01,
+            'max_depth': 4,
+            'min_child_weight': 3,
+            'subsample': 0.8,
+            'colsample_bytree': 0.8,
+            'reg_alpha': 0.05,
+            'reg_lambda': 1.0
+        }
+        params.update(tuned_params or {})
+        X_fit, X_val, y_fit, y_val = split_validation(X_train, y_train)
+        stopped_model = xgb.XGBRegressor(
+            n_estimators=max(N_ESTIMATORS_GRID),
+            random_state=42,
+            verbosity=0,
+            n_jobs=-1,
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            **params
+        )
+        stopped_model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        n_trees = stopped_model.best_iteration + 1
+        print(f"   Best iteration: {n_trees} of {stopped_model.get_booster().num_boosted_rounds()} trees grown")
         
-        for n_estimators in [100, 200, 300, 400, 500]:
-            print(f"   Trying n_estimators={n_estimators}...", end=" ")
-            
-            model = xgb.XGBRegressor(
-                n_estimators=n_estimators,
-                learning_rate=0.01,
-                max_depth=4,
-                min_child_weight=3,
-                subsample=0.8,
-                colsample_bytree=0.8,
-                reg_alpha=0.05,
-                reg_lambda=1.0,
-                random_state=42,
-                verbosity=0,
-                n_jobs=-1
-            )
-            
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            score = r2_score(y_test, y_pred)
-            
-            print(f"R²: {score:.4f}")
-            
-            if score > best_score:
-                best_score = score
-                best_model = model
-                best_n = n_estimators
+        # Find optimal n_estimators from the first n trees of the same model
+        best_n, best_score = select_tree_count(
+            lambda n: stopped_model.predict(X_val, iteration_range=(0, n)), n_trees, y_val)
+        
+        # Refit on the whole training split with the chosen tree count
+        best_model = xgb.XGBRegressor(
+            n_estimators=best_n,
+            random_state=42,
+            verbosity=0,
+            n_jobs=-1,
+            **params
+        )
+        best_model.fit(X_train, y_train)
         
         # Final evaluation
         y_pred_train = best_model.predict(X_train)
@@ -166,43 +210,50 @@ def train_xgboost_model(X_train, y_train, X_test, y_test):
         print(f"   XGBoost Error: {e}")
         return None
 
-def train_lightgbm_model(X_train, y_train, X_test, y_test):
-    """Train LightGBM model"""
+def train_lightgbm_model(X_train, y_train, X_test, y_test, tuned_params=None):
+    """Train LightGBM model (tuned_params override the defaults)"""
     print(f"\n4. TRAINING LIGHTGBM")
     print("-" * 50)
     
     try:
-        # Find optimal n_estimators
-        best_score = -np.inf
-        best_model = None
-        
-        for n_estimators in [100, 200, 300, 400, 500]:
-            print(f"   Trying n_estimators={n_estimators}...", end=" ")
-            
-            model = lgb.LGBMRegressor(
-                n_estimators=n_estimators,
-                learning_rate=0.01,
-                max_depth=4,
-                num_leaves=15,
-                min_child_samples=20,
-                subsample=0.8,
-                colsample_bytree=0.8,
-                reg_alpha=0.1,
-                reg_lambda=0.1,
-                random_state=42,
-                verbose=-1,
-                n_jobs=-1
-            )
-            
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            score = r2_score(y_test, y_pred)
-            
-            print(f"R²: {score:.4f}")
-            
-            if score > best_score:
-                best_score = score
-                best_model = model
+        # One fit up to the largest grid size, stopping early once the validation RMSE stalls
+        params = {
+            'learning_rate': 0.01,
+            'max_depth': 4,
+            'num_leaves': 15,
+            'min_child_samples': 20,
+            'subsample': 0.8,
+            'colsample_bytree': 0.8,
+            'reg_alpha': 0.1,
+            'reg_lambda': 0.1
+        }
+        params.update(tuned_params or {})
+        X_fit, X_val, y_fit, y_val = split_validation(X_train, y_train)
+        stopped_model = lgb.LGBMRegressor(
+            n_estimators=max(N_ESTIMATORS_GRID),
+            random_state=42,
+            verbose=-1,
+            n_jobs=-1,
+            **params
+        )
+        stopped_model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], eval_metric='rmse',
+                          callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+        n_trees = stopped_model.best_iteration_
+        print(f"   Best iteration: {n_trees}")
+        
+        # Find optimal n_estimators from the first n trees of the same model
+        best_n, best_score = select_tree_count(
+            lambda n: stopped_model.predict(X_val, num_iteration=n), n_trees, y_val)
+        
+        # Refit on the whole training split with the chosen tree count
+        best_model = lgb.LGBMRegressor(
+            n_estimators=best_n,
+            random_state=42,
+            verbose=-1,
+            n_jobs=-1,
+            **params
+        )
+        best_model.fit(X_train, y_train)
         
         # Final evaluation
         y_pred_train = best_model.predict(X_train)
@@ -216,10 +267,12 @@ def train_lightgbm_model(X_train, y_train, X_test, y_test):
             'model': best_model,
             'train_r2': train_r2,
             'test_r2': test_r2,
-            'test_mae': test_mae
+            'test_mae': test_mae,
+            'best_n_estimators': best_n
         }
         
-        print(f"\n Training R²:  {train_r2:.4f}")
+        print(f"\n   Best n_estimators: {best_n}")
+        print(f"   Training R²:  {train_r2:.4f}")
         print(f"   Test R²:      {test_r2:.4f}")
         print(f"   Test MAE:     {test_mae:.3f}")
         
@@ -229,22 +282,26 @@ def train_lightgbm_model(X_train, y_train, X_test, y_test):
         print(f"   LightGBM Error: {e}")
         return None
 
-def train_random_forest_model(X_train, y_train, X_test, y_test):
-    """Train Random Forest model"""
+def train_random_forest_model(X_train, y_train, X_test, y_test, tuned_params=None):
+    """Train Random Forest model (tuned_params override the defaults)"""
     print(f"\n5. TRAINING RANDOM FOREST")
     print("-" * 50)
     
     try:
+        params = {
+            'max_depth': 10,
+            'min_samples_split': 5,
+            'min_samples_leaf': 2,
+            'max_features': 'sqrt'
+        }
+        params.update(tuned_params or {})
         model = RandomForestRegressor(
             n_estimators=200,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            max_features='sqrt',
             bootstrap=True,
             random_state=42,
             n_jobs=-1,
-            verbose=0
+            verbose=0,
+            **params
         )
         
         print("   Training...", end=" ")
@@ -615,19 +672,26 @@ def main():
     # Create splits
     X_train, X_test, y_train, y_test = create_splits(X, y, test_size=0.2)
     
+    # Search hyperparameters on the training split (python train_behavioural_loads.py --tune)
+    tuned = {}
+    if '--tune' in sys.argv:
+        from hyperparam_search import tune
+        for family in ('xgboost', 'lightgbm', 'random_forest'):
+            tuned[family] = tune(family, X_train, y_train, f"behavioural_loads_{family}")
+    
     # Train models
     models_results = {}
     
     # Train XGBoost
-    xgb_results = train_xgboost_model(X_train, y_train, X_test, y_test)
+    xgb_results = train_xgboost_model(X_train, y_train, X_test, y_test, tuned.get('xgboost'))
     models_results['xgboost'] = xgb_results
     
     # Train LightGBM
-    lgb_results = train_lightgbm_model(X_train, y_train, X_test, y_test)
+    lgb_results = train_lightgbm_model(X_train, y_train, X_test, y_test, tuned.get('lightgbm'))
     models_results['lightgbm'] = lgb_results
     
     # Train Random Forest
-    rf_results = train_random_forest_model(X_train, y_train, X_test, y_test)
+    rf_results = train_random_forest_model(X_train, y_train, X_test, y_test, tuned.get('random_forest'))
     models_results['random_forest'] = rf_results
     
     # Train Weighted Ensemble
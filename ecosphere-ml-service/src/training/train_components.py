@@ -21,7 +21,9 @@ project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
 sys.path.append(project_root)
 
 class ComponentForecaster:
-    def __init__(self):
+    def __init__(self, tune=False):
+        # Search each component's hyperparameters before training (hyperparam_search.py)
+        self.tune = tune
         self.data_dir = os.path.join(project_root, "data", "processed", "normalized")
         self.models_dir = os.path.join(project_root, "models", "components")
         self.normalized_file = os.path.join(self.data_dir, "components_normalized.csv")
@@ -126,39 +128,35 @@ class ComponentForecaster:
         n_samples = len(X)
         n_splits = min(3, max(2, n_samples // 500))
         tscv = TimeSeriesSplit(n_splits=n_splits)
+        folds = list(tscv.split(X))
+        
+        rf_params = {'max_depth': 10}
+        lgb_params = {'learning_rate': 0.05}
+        if self.tune:
+            from hyperparam_search import tune
+            # Search only on rows before the first CV test fold, so every fold's
+            # selection MAE comes from data the search never saw
+            first_test = folds[0][1][0]
+            X_lagged, y_lagged = self._add_lags(X.iloc[:first_test], y.iloc[:first_test], safe_name)
+            rf_params.update(tune('random_forest', X_lagged, y_lagged, f"components_{safe_name}_random_forest", metric='mae'))
+            lgb_params.update(tune('lightgbm', X_lagged, y_lagged, f"components_{safe_name}_lightgbm", metric='mae'))
         
         models = {
             'random_forest': {
-                'model': RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42, n_jobs=-1),
+                'model': RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1, **rf_params),
                 'scores': []
             },
             'lightgbm': {
-                'model': lgb.LGBMRegressor(n_estimators=150, learning_rate=0.05, random_state=42, verbose=-1),
+                'model': lgb.LGBMRegressor(n_estimators=150, random_state=42, verbose=-1, **lgb_params),
                 'scores': []
             }
         }
         
-        print(f" {n_splits}-fold time-series CV")
+        print(f" {len(folds)}-fold time-series CV")
         
-        for fold, (train_idx, test_idx) in enumerate(tscv.split(X), 1):
-            X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
-            y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
-            
-            # Add lag features
-            if 'consumption' in safe_name:
-                lags = [24, 48, 168]  # Daily, 2-day, weekly for consumption
-            else:
-                lags = [24, 168]  # Daily and weekly for solar
-            
-            for lag in lags:
-                X_train[f'lag_{lag}'] = y_train.shift(lag)
-                X_test[f'lag_{lag}'] = y_test.shift(lag)
-            
-            # Remove NaN
-            X_train = X_train.dropna()
-            y_train = y_train.loc[X_train.index]
-            X_test = X_test.dropna()
-            y_test = y_test.loc[X_test.index]
+        for fold, (train_idx, test_idx) in enumerate(folds, 1):
+            X_train, y_train = self._add_lags(X.iloc[train_idx], y.iloc[train_idx], safe_name)
+            X_test, y_test = self._add_lags(X.iloc[test_idx], y.iloc[test_idx], safe_name)
             
             if len(X_train) < 50 or len(X_test) < 20:
                 continue
@@ -190,16 +188,7 @@ class ComponentForecaster:
         print(f" Best: {best_model_name} (MAE: {best_score:.2f} kWh)")
         
         # Train final model on all data
-        X_final = X.copy()
-        y_final = y.copy()
-        
-        # Add lag features
-        lags = [24, 48, 168] if 'consumption' in safe_name else [24, 168]
-        for lag in lags:
-            X_final[f'lag_{lag}'] = y_final.shift(lag)
-        
-        X_final = X_final.dropna()
-        y_final = y_final.loc[X_final.index]
+        X_final, y_final = self._add_lags(X, y, safe_name)
         
         if len(X_final) < 100:
             print(f" Insufficient data for final training")
@@ -219,6 +208,17 @@ class ComponentForecaster:
             'target_col': target_col
         }
     
+    def _add_lags(self, X, y, safe_name):
+        """Lagged target features over the whole series, rows without full lags dropped"""
+        X_lagged = X.copy()
+        
+        lags = [24, 48, 168] if 'consumption' in safe_name else [24, 168]
+        for lag in lags:
+            X_lagged[f'lag_{lag}'] = y.shift(lag)
+        
+        X_lagged = X_lagged.dropna()
+        return X_lagged, y.loc[X_lagged.index]
+    
     def save_model(self, model_result, model_type='consumption'):
         """Save trained model"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M")
@@ -374,5 +374,5 @@ class ComponentForecaster:
         print("4. Compare with site_total for validation")
 
 if __name__ == "__main__":
-    forecaster = ComponentForecaster()
+    forecaster = ComponentForecaster(tune='--tune' in sys.argv)
     forecaster.run()
\ No newline at end of file
@@ -17,12 +17,91 @@ import xgboost as xgb
 import lightgbm as lgb
 import joblib
 import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Serving modules (tree_ensemble) live in the project root
+project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+sys.path.append(project_root)
+
+# Relative share of the CPU budget per candidate (bagged trees scale with cores better than boosting)
+CANDIDATE_CPU_WEIGHTS = {'LightGBM': 1, 'XGBoost': 1, 'RandomForest': 2}
+
+def split_cpu_budget(names, budget):
+    """
+    Split a core budget between candidates trained at the same time
+    
+    Returns:
+        (worker processes, {name: n_jobs}) whose n_jobs add up to at most the budget
+    """
+    workers = max(1, min(len(names), budget))
+    if workers < len(names):
+        # Fewer cores than candidates: one core each, the rest queue for a free worker
+        return workers, {name: 1 for name in names}
+    
+    weights = [CANDIDATE_CPU_WEIGHTS.get(name, 1) for name in names]
+    shares = [max(1, budget * weight // sum(weights)) for weight in weights]
+    # Hand out cores lost to rounding, heaviest candidates first
+    for i in sorted(range(len(names)), key=lambda i: -weights[i])[:max(0, budget - sum(shares))]:
+        shares[i] += 1
+    return workers, dict(zip(names, shares))
+
+def split_validation(X_train, y_train, val_size=0.2):
+    """Hold out the latest training rows for early stopping, so the test split stays unseen"""
+    split_idx = int(len(X_train) * (1 - val_size))
+    return X_train[:split_idx], X_train[split_idx:], y_train.iloc[:split_idx], y_train.iloc[split_idx:]
+
+def score_predictions(y_test, y_pred_log):
+    """Metrics in kW for log1p-space test targets and predictions"""
+    y_pred = np.expm1(y_pred_log)
+    y_test_original = np.expm1(y_test)
+    
+    # Calculate MAPE safely (avoid division by zero)
+    non_zero_mask = y_test_original > 0.1
+    if non_zero_mask.sum() > 0:
+        mape = np.mean(np.abs((y_test_original[non_zero_mask] - y_pred[non_zero_mask]) / 
+                             y_test_original[non_zero_mask])) * 100
+    else:
+        mape = float('nan')
+    
+    return {
+        'r2': r2_score(y_test_original, y_pred),
+        'mae': mean_absolute_error(y_test_original, y_pred),
+        'rmse': np.sqrt(mean_squared_error(y_test_original, y_pred)),
+        'mape': mape,
+        'mean_actual': y_test_original.mean(),
+        'mean_predicted': y_pred.mean()
+    }
+
+def run_candidate(train_func, n_jobs, X_train, y_train, X_test, y_test, tuned_params=None):
+    """Fit and score one candidate (in a worker process), returns its results with wall/CPU seconds"""
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    
+    model = train_func(X_train, y_train, X_test, y_test, n_jobs=n_jobs, tuned_params=tuned_params)
+    results = score_predictions(y_test, model.predict(X_test))
+    results.update({
+        'model': model,
+        'n_jobs': n_jobs,
+        'wall_seconds': time.perf_counter() - wall_start,
+        # process_time covers every thread of the worker, so this is the candidate's total CPU
+        'cpu_seconds': time.process_time() - cpu_start
+    })
+    return results
 
 class SolarForecastTrainer:
     """Train and compare solar forecasting models for OpenWeather API v3.0"""
     
-    def __init__(self, data_path):
+    def __init__(self, data_path, weather_archive=None, archive_site='sait_campus', tune=False):
         self.data_path = data_path
+        # Search each candidate's hyperparameters on the training split first (hyperparam_search.py)
+        self.tune = tune
+        self.tuned_params = {}
+        # Opt-in: replace the CSV's observed weather with archived forecasts where they overlap
+        self.weather_archive = weather_archive
+        self.archive_site = archive_site
         self.df = None
         self.best_model = None
         self.best_model_name = None
@@ -41,6 +120,9 @@ class SolarForecastTrainer:
         print(f" Loaded {len(self.df):,} samples")
         print(f" Date range: {self.df['timestamp'].min()} to {self.df['timestamp'].max()}")
         
+        if self.weather_archive:
+            self._apply_weather_archive()
+        
         # CRITICAL: Check if we have actual solar generation data
         if 'total_solar_kw' not in self.df.columns:
             print(" ERROR: 'total_solar_kw' column not found!")
@@ -89,6 +171,37 @@ class SolarForecastTrainer:
         
         return self.df
     
+    def _apply_weather_archive(self):
+        """
+        Use archived OpenWeather forecasts (what serving sees) as weather for the hours they cover
+
+        The archive has no solar target, so it only replaces weather columns of
+        existing CSV rows; it never adds samples.
+        """
+        from solar_features import WEATHER_FEATURES
+        from weather_archive import IncrementalReader, WeatherArchive, take, to_frame
+        
+        # Only partitions issued since the last run are read; earlier ones come from the consumer state
+        reader = IncrementalReader(WeatherArchive(self.weather_archive),
+                                   os.path.join(self.weather_archive, 'consumers', 'solar_trainer.npz'))
+        table, new_rows = reader.load()
+        table = take(table, table['site_id'] == self.archive_site)
+        print(f" Weather archive: {len(table['valid_time']):,} forecast hours for {self.archive_site} "
+              f"({new_rows:,} new archive rows since last run)")
+        if not len(table['valid_time']):
+            return
+        
+        # The CSV uses naive local timestamps, so the two UTC hours of a DST fall-back
+        # map to one key; keep the later one so the index stays unique
+        archived = to_frame(table).set_index('timestamp')
+        archived = archived[~archived.index.duplicated(keep='last')]
+        matched = self.df['timestamp'].isin(archived.index)
+        replaced = [column for column in WEATHER_FEATURES if column in self.df.columns]
+        for column in replaced:
+            self.df.loc[matched, column] = self.df.loc[matched, 'timestamp'].map(archived[column])
+        print(f" Using archived forecast weather for {int(matched.sum()):,} samples")
+        print(f" Replaced columns: {', '.join(replaced) if replaced else 'none'}")
+    
     def select_features_for_openweather(self):
         """Select features available from OpenWeather API v3.0"""
         print(f"\n SELECTING OPENWEATHER API v3.0 COMPATIBLE FEATURES")
@@ -225,62 +338,73 @@ class SolarForecastTrainer:
             'RandomForest': self._train_randomforest
         }
         
+        if self.tune:
+            from hyperparam_search import tune
+            for model_name, family in (('LightGBM', 'lightgbm'), ('XGBoost', 'xgboost'), ('RandomForest', 'random_forest')):
+                self.tuned_params[model_name] = tune(family, X_train, y_train, f"solar_{family}")
+        
+        # Candidates train concurrently, each on its own share of the cores (TRAIN_PARALLEL=0 trains in turn)
+        cpu_budget = int(os.getenv('TRAIN_CPU_BUDGET', str(os.cpu_count() or 1)))
+        parallel = os.getenv('TRAIN_PARALLEL', '1').lower() not in ('0', 'false', 'no')
+        if parallel:
+            workers, n_jobs = split_cpu_budget(list(models_to_train), cpu_budget)
+        else:
+            workers, n_jobs = 1, {name: cpu_budget for name in models_to_train}
+        print(f"\n CPU budget: {cpu_budget} cores, {workers} concurrent candidate(s): "
+              f"{', '.join(f'{name}={jobs}' for name, jobs in n_jobs.items())}")
+        
         self.all_models_results = {}
+        self.bakeoff_wall_seconds = None
         best_r2 = -float('inf')
+        bakeoff_start = time.perf_counter()
         
-        for model_name, model_func in models_to_train.items():
-            print(f"\n Training {model_name}...")
-            
+        def collect(model_name, get_results):
+            nonlocal best_r2
             try:
-                model = model_func(X_train, y_train, X_test, y_test)
-                
-                # Evaluate
-                y_pred_log = model.predict(X_test)
-                y_pred = np.expm1(y_pred_log)
-                y_test_original = np.expm1(y_test)
-                
-                # Calculate metrics
-                r2 = r2_score(y_test_original, y_pred)
-                mae = mean_absolute_error(y_test_original, y_pred)
-                rmse = np.sqrt(mean_squared_error(y_test_original, y_pred))
-                
-                # Calculate MAPE safely (avoid division by zero)
-                non_zero_mask = y_test_original > 0.1
-                if non_zero_mask.sum() > 0:
-                    mape = np.mean(np.abs((y_test_original[non_zero_mask] - y_pred[non_zero_mask]) / 
-                                         y_test_original[non_zero_mask])) * 100
-                else:
-                    mape = float('nan')
-                
-                self.all_models_results[model_name] = {
-                    'model': model,
-                    'r2': r2,
-                    'mae': mae,
-                    'rmse': rmse,
-                    'mape': mape,
-                    'mean_actual': y_test_original.mean(),
-                    'mean_predicted': y_pred.mean()
-                }
-                
-                print(f"   Performance:")
-                print(f"     R²:  {r2:.4f}")
-                print(f"     MAE: {mae:.3f} kW")
-                print(f"     RMSE:{rmse:.3f} kW")
-                if not np.isnan(mape):
-                    print(f"     MAPE:{mape:.2f}%")
-                
-                # Update best model
-                if r2 > best_r2:
-                    best_r2 = r2
-                    self.best_model = model
-                    self.best_model_name = model_name
-                    self.metrics = self.all_models_results[model_name].copy()
-                    del self.metrics['model']
-                    print(f"      New best model!")
-                    
+                results = get_results()
             except Exception as e:
-                print(f"    Error: {e}")
+                print(f"\n {model_name} error: {e}")
                 self.all_models_results[model_name] = {'error': str(e)}
+                return
+            
+            self.all_models_results[model_name] = results
+            print(f"\n {model_name} finished in {results['wall_seconds']:.1f}s "
+                  f"({results['cpu_seconds']:.1f}s CPU on {results['n_jobs']} cores)")
+            print(f"   Performance:")
+            print(f"     R²:  {results['r2']:.4f}")
+            print(f"     MAE: {results['mae']:.3f} kW")
+            print(f"     RMSE:{results['rmse']:.3f} kW")
+            if not np.isnan(results['mape']):
+                print(f"     MAPE:{results['mape']:.2f}%")
+            
+            # Update best model
+            if results['r2'] > best_r2:
+                best_r2 = results['r2']
+                self.best_model = results['model']
+                self.best_model_name = model_name
+                self.metrics = {key: value for key, value in results.items() if key != 'model'}
+                print(f"      New best model!")
+        
+        if workers > 1:
+            # spawn, not fork: LightGBM and XGBoost use OpenMP, which is not fork-safe
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = {}
+                for model_name, model_func in models_to_train.items():
+                    print(f" Training {model_name}...")
+                    futures[pool.submit(run_candidate, model_func, n_jobs[model_name], X_train, y_train,
+                                        X_test, y_test, self.tuned_params.get(model_name))] = model_name
+                for future in as_completed(futures):
+                    collect(futures[future], future.result)
+        else:
+            for model_name, model_func in models_to_train.items():
+                print(f"\n Training {model_name}...")
+                collect(model_name, lambda: run_candidate(model_func, n_jobs[model_name], X_train, y_train,
+                                                          X_test, y_test, self.tuned_params.get(model_name)))
+        
+        self.bakeoff_wall_seconds = time.perf_counter() - bakeoff_start
+
+        # Report in candidate order, not completion order
+        self.all_models_results = {name: self.all_models_results[name] for name in models_to_train}
         
         # Display comparison
         self._display_model_comparison()
@@ -292,7 +416,7 @@ class SolarForecastTrainer:
         return self.best_model
     
     def _display_model_comparison(self):
-        """Display comparison table"""
+        """Display comparison table, with wall/CPU time per candidate"""
         print(f"\n MODEL COMPARISON")
         print("-" * 60)
         print(f"{'Model':<12} {'R²':>8} {'MAE (kW)':>10} {'RMSE (kW)':>12}")
@@ -304,12 +428,31 @@ class SolarForecastTrainer:
                       f"{results['rmse']:>12.3f}")
         
         print("-" * 60)
+        
+        print(f"\n TRAINING TIME")
+        print("-" * 60)
+        print(f"{'Model':<12} {'Cores':>6} {'Wall (s)':>10} {'CPU (s)':>10} {'CPU/wall':>10}")
+        print("-" * 60)
+        
+        total_wall = 0.0
+        for model_name, results in self.all_models_results.items():
+            if 'wall_seconds' in results:
+                total_wall += results['wall_seconds']
+                print(f"{model_name:<12} {results['n_jobs']:>6} {results['wall_seconds']:>10.1f} "
+                      f"{results['cpu_seconds']:>10.1f} {results['cpu_seconds'] / max(results['wall_seconds'], 1e-9):>10.2f}")
+        
+        print("-" * 60)
+        if self.bakeoff_wall_seconds is not None:
+            print(f"Bake-off wall time: {self.bakeoff_wall_seconds:.1f}s "
+                  f"(candidates' wall times add up to {total_wall:.1f}s)")
     
-    def _train_lightgbm(self, X_train, y_train, X_test, y_test):
-        """Train LightGBM with optimized parameters"""
-        # Create datasets
-        train_data = lgb.Dataset(X_train, label=y_train)
-        valid_data = lgb.Dataset(X_test, label=y_test, reference=train_data)
+    @staticmethod
+    def _train_lightgbm(X_train, y_train, X_test, y_test, n_jobs=-1, tuned_params=None):
+        """Train LightGBM with optimized parameters (tuned_params override them)"""
+        # Create datasets (early stopping watches the tail of the training split, not the test set)
+        X_fit, X_val, y_fit, y_val = split_validation(X_train, y_train)
+        train_data = lgb.Dataset(X_fit, label=y_fit)
+        valid_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
         
         # Optimized parameters
         params = {
@@ -327,11 +470,14 @@ class SolarForecastTrainer:
             'lambda_l2': 0.1,
             'verbose': -1,
             'random_state': 42,
-            'n_jobs': -1
+            'n_jobs': n_jobs
         }
+        if tuned_params:
+            from hyperparam_search import lightgbm_native_params
+            params.update(lightgbm_native_params(tuned_params))
         
         # Train with early stopping
-        model = lgb.train(
+        stopped_model = lgb.train(
             params,
             train_data,
             num_boost_round=2000,
@@ -342,43 +488,70 @@ class SolarForecastTrainer:
             ]
         )
         
+        # Refit on the whole training split with the best iteration's tree count
+        model = lgb.train(params, lgb.Dataset(X_train, label=y_train),
+                          num_boost_round=stopped_model.best_iteration)
+        
         return model
     
-    def _train_xgboost(self, X_train, y_train, X_test, y_test):
-        """Train XGBoost with optimized parameters"""
-        model = xgb.XGBRegressor(
+    @staticmethod
+    def _train_xgboost(X_train, y_train, X_test, y_test, n_jobs=-1, tuned_params=None):
+        """Train XGBoost with optimized parameters (tuned_params override them)"""
+        params = {
+            'learning_rate': 0.01,
+            'max_depth': 8,
+            'min_child_weight': 50,
+            'subsample': 0.8,
+            'colsample_bytree': 0.8,
+            'reg_alpha': 0.1,
+            'reg_lambda': 1.0
+        }
+        params.update(tuned_params or {})
+        stopped_model = xgb.XGBRegressor(
             n_estimators=1000,
-            learning_rate=0.01,
-            max_depth=8,
-            min_child_weight=50,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            reg_alpha=0.1,
-            reg_lambda=1.0,
             random_state=42,
-            n_jobs=-1,
-            verbosity=0
+            n_jobs=n_jobs,
+            verbosity=0,
+            # Stop once validation RMSE has not improved for 100 rounds
+            early_stopping_rounds=100,
+            **params
         )
         
-        model.fit(
-            X_train, y_train,
-            eval_set=[(X_test, y_test)],
+        X_fit, X_val, y_fit, y_val = split_validation(X_train, y_train)
+        stopped_model.fit(
+            X_fit, y_fit,
+            eval_set=[(X_val, y_val)],
             verbose=False
         )
         
+        # Refit on the whole training split with the best iteration's tree count
+        model = xgb.XGBRegressor(
+            n_estimators=stopped_model.best_iteration + 1,
+            random_state=42,
+            n_jobs=n_jobs,
+            verbosity=0,
+            **params
+        )
+        model.fit(X_train, y_train)
+        
         return model
     
-    def _train_randomforest(self, X_train, y_train, X_test, y_test):
-        """Train Random Forest"""
+    @staticmethod
+    def _train_randomforest(X_train, y_train, X_test, y_test, n_jobs=-1, tuned_params=None):
+        """Train Random Forest (tuned_params override the defaults)"""
+        params = {
+            'max_depth': 15,
+            'min_samples_split': 20,
+            'min_samples_leaf': 10,
+            'max_features': 'sqrt'
+        }
+        params.update(tuned_params or {})
         model = RandomForestRegressor(
             n_estimators=300,
-            max_depth=15,
-            min_samples_split=20,
-            min_samples_leaf=10,
-            max_features='sqrt',
             random_state=42,
-            n_jobs=-1,
-            verbose=0
+            n_jobs=n_jobs,
+            verbose=0,
+            **params
         )
         
         model.fit(X_train, y_train)
@@ -479,6 +652,18 @@ class SolarForecastTrainer:
         joblib.dump(model_package, output_path)
         print(f" Model saved to: {output_path}")
         
+        # Sidecar + memory-mappable tree arrays so serving and health checks skip unpickling
+        try:
+            from model_artifacts import sidecar_path, write_artifacts
+            sidecar = write_artifacts(output_path, model_package)
+            print(f" Sidecar saved to: {sidecar_path(output_path)}")
+            if sidecar['compiled']:
+                print(f" Compiled arrays: {sidecar['compiled']['arrays']} ({sidecar['compiled']['n_trees']} trees)")
+            if 'max_abs_diff' in sidecar:
+                print(f" Compiled max abs difference on probe rows: {sidecar['max_abs_diff']:.3e}")
+        except ImportError as e:
+            print(f" Model artifacts skipped: {e}")
+        
         # Save metadata
         metadata = {
             'model_info': {
@@ -522,9 +707,15 @@ def main():
     # Configuration
     DATA_PATH = "../../data/generation_forecast/sait_nasa_readywithopw_for_training.csv"
     OUTPUT_MODEL = "solar_forecast_openweather.pkl"
+    WEATHER_ARCHIVE = os.getenv('WEATHER_ARCHIVE_DIR', os.path.join(project_root, 'weather_cache', 'archive'))
     
-    # 1. Initialize trainer
-    trainer = SolarForecastTrainer(DATA_PATH)
+    # 1. Initialize trainer (--weather-archive swaps in archived forecast weather where collected)
+    use_archive = '--weather-archive' in sys.argv
+    if use_archive and not os.path.isdir(WEATHER_ARCHIVE):
+        print(f" Weather archive not found: {WEATHER_ARCHIVE}")
+        use_archive = False
+    trainer = SolarForecastTrainer(DATA_PATH, WEATHER_ARCHIVE if use_archive else None,
+                                   tune='--tune' in sys.argv)
     
     # 2. Load and prepare data
     df = trainer.load_and_prepare_data()
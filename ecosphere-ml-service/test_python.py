@@ -2,6 +2,10 @@ import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 
+# --offline replays recorded (or synthetic) weather instead of calling OpenWeather
+if '--offline' in sys.argv:
+    os.environ['WEATHER_BACKEND'] = 'replay'
+
 from node_service import SolarForecastService
 from datetime import datetime, timedelta
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Service modules live in the project root, next to node_service.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
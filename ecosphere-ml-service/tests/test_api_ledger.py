@@ -0,0 +1,54 @@
+"""ApiLedger: atomic per-day counters shared across processes, legacy JSON import"""
+import json
+import multiprocessing
+from datetime import datetime
+
+from api_ledger import ApiLedger, read_day_counts
+
+def record_calls(db_path, n):
+    ledger = ApiLedger(db_path)
+    for _ in range(n):
+        ledger.record('onecall', True, datetime(2026, 10, 16, 12, 0))
+    ledger.close()
+
+def test_record_counts_calls_and_failures(tmp_path):
+    ledger = ApiLedger(tmp_path / 'ledger.db')
+    when = datetime(2026, 10, 16, 9, 30)
+    assert ledger.record('onecall', True, when) == 1
+    assert ledger.record('onecall', False, when) == 2
+
+    assert ledger.day_counts('2026-10-16') == (2, 1, when.isoformat())
+    assert ledger.calls_on('2026-10-17') == 0
+    assert [call['success'] for call in ledger.history()] == [False, True]
+
+def test_counts_are_atomic_across_processes(tmp_path):
+    db_path = str(tmp_path / 'ledger.db')
+    ApiLedger(db_path).close()
+    processes = [multiprocessing.get_context('spawn').Process(target=record_calls, args=(db_path, 25))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert read_day_counts(db_path, '2026-10-16')[0] == 100
+
+def test_read_day_counts_without_ledger(tmp_path):
+    assert read_day_counts(str(tmp_path / 'missing.db'), '2026-10-16') == (0, 0, None)
+    assert not (tmp_path / 'missing.db').exists()
+
+def test_migrates_json_log_once(tmp_path):
+    json_path = tmp_path / 'api_calls.json'
+    json_path.write_text(json.dumps({
+        'today': '2026-10-16',
+        'calls_today': 7,
+        'history': [{'timestamp': '2026-10-16T08:00:00', 'endpoint': 'onecall', 'success': True},
+                    {'timestamp': '2026-10-15T08:00:00', 'endpoint': 'onecall', 'success': False}]
+    }))
+    ledger = ApiLedger(tmp_path / 'ledger.db')
+
+    assert ledger.migrate_json_log(json_path)
+    assert not ledger.migrate_json_log(json_path)
+    # The stored counter wins over the truncated history
+    assert ledger.calls_on('2026-10-16') == 7
+    assert ledger.day_counts('2026-10-15')[:2] == (1, 1)
@@ -0,0 +1,59 @@
+"""HourlyWeather: OneCall entries aligned to whole-hour slots"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from hourly_weather import HourlyWeather
+from solar_features import WEATHER_DEFAULTS, WEATHER_FEATURES
+
+FIRST_HOUR = datetime(2025, 6, 15, 6, 0)
+START = FIRST_HOUR.timestamp()
+UVI = WEATHER_FEATURES.index('uv_index')
+
+def entry(offset_seconds, uvi, main='Clear'):
+    return {'dt': int(START + offset_seconds), 'uvi': uvi, 'temp': 20, 'pressure': 1000,
+            'rain': {'1h': 0.5}, 'snow': {'1h': 0.25}, 'weather': [{'main': main, 'description': main.lower()}]}
+
+def test_entries_align_to_nearest_hour():
+    # Entries arrive out of order and a few minutes off the hour
+    hourly = [entry(2 * 3600 + 300, 3.0), entry(-120, 1.0), entry(3600 + 60, 2.0, 'Clouds')]
+    weather = HourlyWeather.from_onecall(hourly, FIRST_HOUR.replace(minute=42), hours=4, tolerance=1800)
+
+    assert weather.start == START
+    assert weather.present.tolist() == [True, True, True, False]
+    assert weather.values[:3, UVI].tolist() == [1.0, 2.0, 3.0]
+    assert weather.weather_main == ['Clear', 'Clouds', 'Clear', None]
+    # Unit conversions: hPa to kPa, rain + snow
+    assert weather.hour(0)['pressure_kpa'] == 100.0
+    assert weather.hour(0)['precipitation_mmh'] == 0.75
+
+def test_slots_beyond_tolerance_are_absent():
+    hourly = [entry(0, 1.0), entry(5 * 3600, 5.0)]
+    weather = HourlyWeather.from_onecall(hourly, FIRST_HOUR, hours=6, tolerance=3600)
+
+    assert weather.present.tolist() == [True, True, False, False, True, True]
+    np.testing.assert_array_equal(weather.values[2], WEATHER_DEFAULTS)
+
+def test_tie_goes_to_earlier_entry():
+    hourly = [entry(-1800, 1.0), entry(1800, 2.0)]
+    weather = HourlyWeather.from_onecall(hourly, FIRST_HOUR, hours=1, tolerance=1800)
+
+    assert weather.values[0, UVI] == 1.0
+
+def test_block_looks_up_target_hours():
+    hourly = [entry(h * 3600, float(h)) for h in range(4)]
+    weather = HourlyWeather.from_onecall(hourly, FIRST_HOUR, hours=4)
+    targets = [FIRST_HOUR + timedelta(hours=h) for h in (2, 0, 7, -1)]
+
+    matrix, index = weather.block(targets)
+    assert index.tolist() == [2, 0, -1, -1]
+    assert matrix[:2, UVI].tolist() == [2.0, 0.0]
+    np.testing.assert_array_equal(matrix[2:], np.tile(WEATHER_DEFAULTS, (2, 1)))
+
+def test_round_trips_through_dict():
+    weather = HourlyWeather.from_onecall([entry(0, 4.0)], FIRST_HOUR, hours=3)
+    restored = HourlyWeather.from_dict(weather.to_dict())
+
+    np.testing.assert_array_equal(restored.values, weather.values)
+    assert restored.present.tolist() == weather.present.tolist()
+    assert HourlyWeather.from_dict({'2025-06-15': []}) is None
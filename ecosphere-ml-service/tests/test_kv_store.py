@@ -0,0 +1,39 @@
+"""KVStore: compressed SQLite entries with expiry, groups and eviction"""
+import kv_store
+from kv_store import KVStore
+
+def test_round_trip_and_expiry(tmp_path):
+    store = KVStore(tmp_path / 'cache.db')
+    value = {'hourly': [{'temp': 3.5, 'clouds': 40}], 'site': 'sait_campus'}
+    size = store.put('a', value, ttl_seconds=60, stored_at=1000.0)
+
+    assert size > 0
+    assert store.get('a', now=1030.0) == (1000.0, value)
+    assert store.get('a', now=1061.0) is None
+    assert store.purge_expired(now=1061.0) == 1
+    assert store.usage() == (0, 0)
+
+def test_latest_in_group(tmp_path):
+    store = KVStore(tmp_path / 'cache.db')
+    store.put('old', 1, ttl_seconds=600, group='site', stored_at=1000.0)
+    store.put('new', 2, ttl_seconds=600, group='site', stored_at=1100.0)
+    store.put('other', 3, ttl_seconds=600, group='elsewhere', stored_at=1200.0)
+
+    assert store.latest('site', now=1150.0) == ('new', 1100.0, 2)
+    assert store.latest('missing', now=1150.0) is None
+
+def test_evicts_oldest_first(tmp_path):
+    store = KVStore(tmp_path / 'cache.db')
+    for i in range(5):
+        store.put(f"k{i}", i, ttl_seconds=600, stored_at=1000.0 + i)
+
+    assert store.evict(max_entries=3) == ['k0', 'k1']
+    assert store.usage()[0] == 3
+    assert store.evict(max_entries=3) == []
+
+def test_json_codec_without_msgpack(tmp_path, monkeypatch):
+    monkeypatch.setattr(kv_store, 'msgpack', None)
+    store = KVStore(tmp_path / 'cache.db')
+    store.put('a', [1, 2, 3], ttl_seconds=60, stored_at=1000.0)
+
+    assert store.get('a', now=1001.0) == (1000.0, [1, 2, 3])
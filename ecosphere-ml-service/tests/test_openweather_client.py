@@ -0,0 +1,106 @@
+"""OpenWeatherClient against a local HTTP stub: connection reuse, retries, circuit breaker"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from openweather_client import CircuitOpenError, OpenWeatherClient
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests += 1
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = json.dumps({'hourly': []} if status == 200 else {'message': 'error'}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.connections = 0
+    server.requests = 0
+    server.statuses = []  # status codes for the next requests, 200 once empty
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_client(server, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return OpenWeatherClient('test-key', base_url=f"http://127.0.0.1:{server.server_port}/onecall", **kwargs)
+
+def test_pooled_session_reuses_one_connection(stub):
+    client = make_client(stub)
+    for _ in range(10):
+        assert client.fetch_onecall(51.04, -114.07) == {'hourly': []}
+
+    assert stub.requests == 10
+    assert stub.connections == 1
+
+def test_retries_5xx_then_succeeds(stub):
+    stub.statuses = [503, 502]
+    attempts = []
+    client = make_client(stub, max_retries=2, on_attempt=attempts.append)
+
+    assert client.fetch_onecall(51.04, -114.07) == {'hourly': []}
+    assert stub.requests == 3
+    assert attempts == [False, False, True]
+    assert client.stats()['retries'] == 2
+    assert client.stats()['consecutive_failures'] == 0
+
+def test_does_not_retry_4xx(stub):
+    stub.statuses = [401]
+    client = make_client(stub, max_retries=2, failure_threshold=1)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.fetch_onecall(51.04, -114.07)
+    assert stub.requests == 1
+    # A bad key says nothing about upstream health
+    assert not client.circuit_open
+
+def test_circuit_opens_half_opens_and_closes(stub):
+    stub.statuses = [500, 500, 500]
+    client = make_client(stub, max_retries=0, failure_threshold=2, cooldown=0.2)
+
+    # Two failed fetches open the circuit
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.fetch_onecall(51.04, -114.07)
+    assert client.circuit_open
+
+    # Open: fails fast without calling the upstream
+    with pytest.raises(CircuitOpenError):
+        client.fetch_onecall(51.04, -114.07)
+    assert stub.requests == 2
+    assert client.stats()['short_circuited'] == 1
+
+    # Half-open after the cooldown: one trial fetch, a failure reopens at once
+    time.sleep(0.25)
+    assert not client.circuit_open
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.fetch_onecall(51.04, -114.07)
+    assert stub.requests == 3
+    assert client.circuit_open
+
+    # A successful trial closes the circuit
+    time.sleep(0.25)
+    assert client.fetch_onecall(51.04, -114.07) == {'hourly': []}
+    assert not client.circuit_open
+    assert client.stats()['consecutive_failures'] == 0
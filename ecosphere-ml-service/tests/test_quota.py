@@ -0,0 +1,49 @@
+"""QuotaScheduler: token bucket with burst capacity, refill and a background reserve"""
+import pytest
+
+import quota
+from quota import QuotaScheduler
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(quota.time, 'time', lambda: now[0])
+    return now
+
+def test_burst_is_limited_to_capacity(tmp_path, clock):
+    scheduler = QuotaScheduler(tmp_path / 'ledger.db', daily_budget=864, capacity=5, reserve=0)
+
+    assert [scheduler.acquire() for _ in range(6)] == [True] * 5 + [False]
+    # 864 calls/day refill one token every 100 seconds
+    assert scheduler.seconds_until() == pytest.approx(100)
+    clock[0] += 100
+    assert scheduler.acquire()
+
+def test_background_leaves_reserve_for_interactive(tmp_path, clock):
+    scheduler = QuotaScheduler(tmp_path / 'ledger.db', daily_budget=864, capacity=5, reserve=3)
+
+    assert scheduler.acquire('background')
+    assert scheduler.acquire('background')
+    assert not scheduler.acquire('background')
+    assert scheduler.acquire('interactive')
+    assert scheduler.stats()['denied'] == 1
+
+def test_bucket_is_shared_between_schedulers(tmp_path, clock):
+    first = QuotaScheduler(tmp_path / 'ledger.db', daily_budget=864, capacity=3, reserve=0)
+    second = QuotaScheduler(tmp_path / 'ledger.db', daily_budget=864, capacity=3, reserve=0)
+
+    assert first.acquire() and second.acquire()
+    second.charge(1)  # a retry spent one more call
+    assert not first.acquire()
+
+def test_credit_is_capped_at_capacity(tmp_path, clock):
+    scheduler = QuotaScheduler(tmp_path / 'ledger.db', daily_budget=864, capacity=5, reserve=0)
+
+    assert scheduler.acquire()
+    scheduler.charge(-10)  # more credited back than was ever taken
+    assert scheduler.stats()['tokens'] == 5
+    assert [scheduler.acquire() for _ in range(6)] == [True] * 5 + [False]
+
+def test_unknown_priority(tmp_path):
+    with pytest.raises(ValueError):
+        QuotaScheduler(tmp_path / 'ledger.db').acquire('urgent')
@@ -0,0 +1,37 @@
+"""ResultCache: two-tier lookups and their counters"""
+from result_cache import ResultCache
+
+def test_memory_and_disk_hits(tmp_path):
+    cache = ResultCache(tmp_path)
+    cache.put('key', {'predictions': [1.5, 2.5]})
+    assert cache.get('key') == {'predictions': [1.5, 2.5]}
+
+    # A second process only has the disk tier
+    other = ResultCache(tmp_path)
+    assert other.get('key') == {'predictions': [1.5, 2.5]}
+    assert cache.counters['memory_hits'] == 1
+    assert other.counters['disk_hits'] == 1
+
+def test_reread_after_miss_is_not_counted(tmp_path):
+    cache = ResultCache(tmp_path)
+    assert cache.get('key') is None
+    assert cache.get('key', count_miss=False) is None
+    assert cache.counters['misses'] == 1
+
+    cache.put('key', {'predictions': []})
+    assert cache.get('key', count_miss=False) == {'predictions': []}
+    assert cache.counters['memory_hits'] == 1
+
+def test_hourly_updates_from_two_workers_are_merged(tmp_path):
+    from result_cache import HourlyPredictionCache
+
+    first = HourlyPredictionCache(tmp_path, 'model')
+    second = HourlyPredictionCache(tmp_path, 'model')
+    # The first worker has the site entry in its memory tier before the second writes
+    first.update(51.0, -114.0, {'2026-06-01T10:00:00|w': 1.0}, '2026-06-01T00:00:00')
+    second.update(51.0, -114.0, {'2026-06-01T11:00:00|w': 2.0}, '2026-06-01T00:00:00')
+    first.update(51.0, -114.0, {'2026-06-01T12:00:00|w': 3.0}, '2026-06-01T00:00:00')
+
+    reader = HourlyPredictionCache(tmp_path, 'model')
+    keys = ['2026-06-01T10:00:00|w', '2026-06-01T11:00:00|w', '2026-06-01T12:00:00|w']
+    assert reader.lookup(51.0, -114.0, keys) == dict(zip(keys, [1.0, 2.0, 3.0]))
@@ -0,0 +1,42 @@
+"""fold_scaler: folded trees take raw features and match the scaled path exactly"""
+import lightgbm as lgb
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from scaler_folding import fold_scaler, verify_folding
+
+def training_data(rows=600, n_features=5, seed=0):
+    rng = np.random.default_rng(seed)
+    # Features on very different scales, as weather inputs are (pressure vs visibility)
+    X = rng.normal(size=(rows, n_features)) * [1, 10, 100, 0.1, 1000] + [0, 15, 101.3, 0, 10000]
+    y = np.log1p(np.abs(X[:, 0] + X[:, 1] / 10 + np.sin(X[:, 2] / 100)) * 5)
+    return X, y
+
+MODELS = {
+    'random_forest': lambda: RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    'xgboost': lambda: xgb.XGBRegressor(n_estimators=50, max_depth=5, random_state=0),
+    'lightgbm': lambda: lgb.LGBMRegressor(n_estimators=50, num_leaves=15, random_state=0, verbose=-1)
+}
+
+@pytest.mark.parametrize('name', sorted(MODELS))
+def test_folded_model_matches_scaled_path(name):
+    X, y = training_data()
+    scaler = StandardScaler().fit(X)
+    model = MODELS[name]().fit(scaler.transform(X), y)
+
+    folded = fold_scaler(model, scaler, X.shape[1])
+
+    # Serving features arrive as float32-representable values
+    features = training_data(rows=2000, seed=1)[0].astype(np.float32).astype(np.float64)
+    report = verify_folding(model, folded, scaler, features)
+    assert report['within_tolerance']
+    assert report['max_abs_diff_log1p'] == 0.0
+
+def test_unsupported_model():
+    X, y = training_data(rows=50)
+    scaler = StandardScaler().fit(X)
+    with pytest.raises(ValueError):
+        fold_scaler(object(), scaler, X.shape[1])
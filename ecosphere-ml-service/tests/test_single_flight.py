@@ -0,0 +1,48 @@
+"""SingleFlight: one computation per key, waiters read the cached result"""
+import os
+import threading
+import time
+
+from single_flight import SingleFlight
+
+def test_concurrent_callers_compute_once(tmp_path):
+    flight = SingleFlight(tmp_path / 'locks', poll_interval=0.01)
+    cache = {}
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        cache['result'] = 42
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.run('key', compute, lambda: cache.get('result'))))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert flight.stats()['computed'] == 1
+    assert flight.stats()['coalesced'] == 4
+    assert not (tmp_path / 'locks' / 'key.lock').exists()
+
+def test_stale_lock_is_broken(tmp_path):
+    flight = SingleFlight(tmp_path, stale_after=1, poll_interval=0.01)
+    lock_path = tmp_path / 'key.lock'
+    lock_path.write_text('12345 0')
+    old = time.time() - 60
+    os.utime(lock_path, (old, old))
+
+    assert flight.run('key', lambda: 'fresh', lambda: None) == 'fresh'
+    assert flight.stats()['stale_locks_broken'] == 1
+
+def test_wait_timeout_computes_locally(tmp_path):
+    flight = SingleFlight(tmp_path, poll_interval=0.01)
+    (tmp_path / 'key.lock').write_text('12345 0')
+
+    assert flight.run('key', lambda: 'local', lambda: None, timeout=0.1) == 'local'
+    assert flight.stats()['wait_timeouts'] == 1
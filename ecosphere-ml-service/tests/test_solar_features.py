@@ -0,0 +1,73 @@
+"""FeaturePlan: the vectorized matrix matches the per-row features it replaced"""
+from datetime import datetime
+
+import numpy as np
+
+from solar_features import FeaturePlan, WEATHER_FEATURES, weather_matrix
+
+DEFAULT_WEATHER = {
+    'uv_index': 1.0, 'temperature_c': 15.0, 'humidity_pct': 50.0, 'pressure_kpa': 101.3, 'dew_point_c': 10.0,
+    'wind_speed_ms': 3.0, 'wind_direction_deg': 180.0, 'clouds_pct': 50.0, 'visibility_m': 10000.0,
+    'precipitation_mmh': 0.0
+}
+
+def row_features(dt, weather_data=None):
+    """The per-row dict SolarForecastService built before the shared builder"""
+    hour, month, day_of_year = dt.hour, dt.month, dt.timetuple().tm_yday
+    features = {name: (weather_data or {}).get(name, default) for name, default in DEFAULT_WEATHER.items()}
+    features.update({
+        'hour_sin': np.sin(2 * np.pi * hour / 24),
+        'hour_cos': np.cos(2 * np.pi * hour / 24),
+        'month_sin': np.sin(2 * np.pi * month / 12),
+        'month_cos': np.cos(2 * np.pi * month / 12),
+        'day_of_year_sin': np.sin(2 * np.pi * day_of_year / 365),
+        'day_of_year_cos': np.cos(2 * np.pi * day_of_year / 365),
+        'is_daylight': 1 if 6 <= hour <= 21 else 0,
+        'season': {12: 0, 1: 0, 2: 0, 3: 1, 4: 1, 5: 1, 6: 2, 7: 2, 8: 2}.get(month, 3),
+        'day_length_hours': {1: 8.5, 2: 10.0, 3: 11.8, 4: 13.7, 5: 15.3, 6: 16.3, 7: 16.0, 8: 14.5,
+                             9: 12.7, 10: 10.8, 11: 9.1, 12: 8.2}[month],
+        'hour': hour,
+        'month': month,
+        'day_of_week': dt.weekday(),
+        'day_of_year': day_of_year
+    })
+    return features
+
+TIMESTAMPS = [
+    datetime(2024, 2, 29, 5, 0),   # leap day, before the daylight window
+    datetime(2024, 12, 31, 21, 0), # day 366, last daylight hour
+    datetime(2025, 1, 1, 0, 0),
+    datetime(2025, 6, 15, 13, 0),  # a Sunday
+    datetime(2025, 9, 30, 22, 0)
+]
+
+FEATURE_NAMES = ['uv_index', 'clouds_pct', 'hour_sin', 'hour_cos', 'day_of_year_sin', 'season',
+                 'day_length_hours', 'is_daylight', 'temperature_c', 'day_of_week', 'day_of_year',
+                 'month_cos', 'visibility_m']
+
+def test_matches_per_row_features_without_weather():
+    matrix = FeaturePlan(FEATURE_NAMES).build(TIMESTAMPS)
+
+    expected = np.array([[row_features(dt)[name] for name in FEATURE_NAMES] for dt in TIMESTAMPS])
+    np.testing.assert_allclose(matrix, expected, rtol=1e-6, atol=1e-6)
+
+def test_matches_per_row_features_with_partial_weather():
+    weather_rows = [{'uv_index': 4.5, 'clouds_pct': 20.0}, None, {'temperature_c': -12.0},
+                    {'visibility_m': 2500.0, 'uv_index': 7.0}, {}]
+    matrix = FeaturePlan(FEATURE_NAMES).build(TIMESTAMPS, weather_matrix(weather_rows))
+
+    expected = np.array([[row_features(dt, weather)[name] for name in FEATURE_NAMES]
+                         for dt, weather in zip(TIMESTAMPS, weather_rows)])
+    np.testing.assert_allclose(matrix, expected, rtol=1e-6, atol=1e-6)
+
+def test_unknown_features_get_defaults():
+    plan = FeaturePlan(['uv_lag_1h', 'temp_rolling_3h', 'cloud_change', 'something_else', 'hour'])
+    matrix = plan.build([datetime(2025, 6, 15, 13, 0)])
+
+    assert plan.missing_features == ['uv_lag_1h', 'temp_rolling_3h', 'cloud_change', 'something_else']
+    np.testing.assert_array_equal(matrix[0], [1.0, 15.0, 50.0, 0.0, 13.0])
+    assert matrix.dtype == np.float32
+
+def test_weather_matrix_column_order():
+    row = {name: float(i) for i, name in enumerate(WEATHER_FEATURES)}
+    np.testing.assert_array_equal(weather_matrix([row])[0], np.arange(len(WEATHER_FEATURES)))
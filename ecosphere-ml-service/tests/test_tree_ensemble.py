@@ -0,0 +1,85 @@
+"""compile_model: flat-array ensembles match the original models on threshold probe rows"""
+import os
+import time
+
+import joblib
+import lightgbm as lgb
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from model_artifacts import COMPILED_TOLERANCE
+from tree_ensemble import CompiledTreeEnsemble, compile_model, export_model_package, load_export, max_probe_diff
+
+def training_data(rows=800, n_features=5, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, n_features)) * [1, 10, 100, 0.1, 1000] + [0, 15, 101.3, 0, 10000]
+    y = np.log1p(np.abs(X[:, 0] + X[:, 1] / 10 + np.sin(X[:, 2] / 100)) * 5)
+    return X, y
+
+def early_stopped_xgboost(X, y):
+    model = xgb.XGBRegressor(n_estimators=500, learning_rate=0.3, max_depth=6, early_stopping_rounds=5, random_state=0)
+    model.fit(X[:600], y[:600], eval_set=[(X[600:], y[600:])], verbose=False)
+    # predict() stops at the best iteration, so the compiled model must too
+    assert model.best_iteration + 1 < model.get_booster().num_boosted_rounds()
+    return model
+
+def early_stopped_lightgbm(X, y):
+    model = lgb.LGBMRegressor(n_estimators=500, learning_rate=0.3, num_leaves=31, random_state=0, verbose=-1)
+    model.fit(X[:600], y[:600], eval_set=[(X[600:], y[600:])],
+              callbacks=[lgb.early_stopping(5, verbose=False)])
+    return model
+
+MODELS = {
+    'random_forest': lambda X, y: RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(X, y),
+    'xgboost': lambda X, y: xgb.XGBRegressor(n_estimators=50, max_depth=5, random_state=0).fit(X, y),
+    'lightgbm': lambda X, y: lgb.LGBMRegressor(n_estimators=50, num_leaves=15, random_state=0, verbose=-1).fit(X, y),
+    'xgboost_early_stopped': early_stopped_xgboost,
+    'lightgbm_early_stopped': early_stopped_lightgbm
+}
+
+@pytest.mark.parametrize('name', sorted(MODELS))
+@pytest.mark.parametrize('with_scaler', [False, True])
+def test_compiled_model_matches_original(name, with_scaler):
+    X, y = training_data()
+    scaler = StandardScaler().fit(X) if with_scaler else None
+    model = MODELS[name](scaler.transform(X) if scaler else X, y)
+
+    ensemble = compile_model(model, scaler, X.shape[1])
+
+    assert max_probe_diff(ensemble, model, scaler, X.shape[1]) <= COMPILED_TOLERANCE
+    expected = model.predict(scaler.transform(X) if scaler else X)
+    assert np.abs(ensemble.predict(X) - expected).max() <= COMPILED_TOLERANCE
+
+def test_save_and_load_round_trip(tmp_path):
+    X, y = training_data()
+    ensemble = compile_model(MODELS['xgboost'](X, y), None, X.shape[1])
+    ensemble.metadata = {'feature_names': list('abcde')}
+
+    loaded = CompiledTreeEnsemble.load(ensemble.save(str(tmp_path / 'model.npz')))
+    assert loaded.metadata == ensemble.metadata
+    np.testing.assert_array_equal(loaded.predict(X), ensemble.predict(X))
+
+    mapped = CompiledTreeEnsemble.load_arrays(ensemble.save_arrays(str(tmp_path / 'arrays')),
+                                              ensemble.bias, ensemble.max_depth)
+    np.testing.assert_array_equal(mapped.predict(X), ensemble.predict(X))
+
+def test_export_is_ignored_once_package_changes(tmp_path):
+    X, y = training_data()
+    package = {'model': MODELS['random_forest'](X, y), 'feature_names': list('abcde')}
+    package_path = str(tmp_path / 'model.pkl')
+    joblib.dump(package, package_path)
+
+    export_model_package(package_path)
+    assert load_export(package_path) is not None
+
+    time.sleep(0.01)
+    joblib.dump(package, package_path)
+    assert load_export(package_path) is None
+
+    # Compiled-only deployments ship without the package
+    export_model_package(package_path)
+    os.remove(package_path)
+    assert load_export(package_path) is not None
@@ -0,0 +1,62 @@
+"""WeatherArchive and IncrementalReader: partitioned forecast rows, shortest-lead reads"""
+import numpy as np
+
+from hourly_weather import HourlyWeather
+from solar_features import WEATHER_FEATURES
+from weather_archive import IncrementalReader, WeatherArchive, to_frame
+
+HOUR = 3600
+START = 1_760_000_400  # an exact UTC hour
+
+def snapshot(fetched_at, start=START, hours=6, value=0.0):
+    values = np.full((hours, len(WEATHER_FEATURES)), value)
+    return HourlyWeather(start, values, np.ones(hours, dtype=bool), ['Clear'] * hours, ['clear sky'] * hours,
+                         fetched_at=fetched_at)
+
+def test_refetch_in_same_hour_replaces_rows(tmp_path):
+    archive = WeatherArchive(tmp_path)
+    assert archive.append('sait_campus', snapshot(START - HOUR, value=1.0)) == 6
+    assert archive.append('sait_campus', snapshot(START - HOUR + 600, value=2.0)) == 6
+
+    table = archive.read()
+    assert len(table['valid_time']) == 6
+    assert (table['values'] == 2.0).all()
+
+def test_reader_keeps_shortest_lead_and_only_reads_new_issues(tmp_path):
+    archive = WeatherArchive(tmp_path)
+    reader = IncrementalReader(archive, tmp_path / 'consumers' / 'test.npz')
+    archive.append('sait_campus', snapshot(START - 2 * HOUR, value=1.0))
+
+    table, new_rows = reader.load(now=START)
+    assert new_rows == 6
+
+    # A later issue overlaps the first one's valid hours
+    archive.append('sait_campus', snapshot(START - HOUR, start=START + 2 * HOUR, value=2.0))
+    table, new_rows = reader.load(now=START + HOUR)
+    assert new_rows == 6
+    assert len(table['valid_time']) == 8
+    overlap = table['valid_time'] >= START + 2 * HOUR
+    assert (table['values'][overlap] == 2.0).all()
+    assert (table['values'][~overlap] == 1.0).all()
+
+    # Nothing new since the watermark
+    table, new_rows = reader.load(now=START + HOUR)
+    assert new_rows == 0
+    assert len(table['valid_time']) == 8
+
+def test_current_issue_hour_is_not_consumed(tmp_path):
+    archive = WeatherArchive(tmp_path)
+    reader = IncrementalReader(archive, tmp_path / 'state.npz')
+    archive.append('sait_campus', snapshot(START + 60))
+
+    assert reader.load(now=START + 120)[1] == 0
+    assert reader.load(now=START + HOUR)[1] == 6
+
+def test_to_frame_columns(tmp_path):
+    archive = WeatherArchive(tmp_path)
+    archive.append('sait_campus', snapshot(START - HOUR))
+    frame = to_frame(archive.read())
+
+    assert list(frame['lead_hours']) == list(range(1, 7))
+    assert set(WEATHER_FEATURES) <= set(frame.columns)
+    assert (frame['site_id'] == 'sait_campus').all()
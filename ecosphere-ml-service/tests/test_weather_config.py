@@ -0,0 +1,34 @@
+"""read_ledger_stats: read-only API usage, from the ledger or the legacy call log"""
+import json
+from datetime import datetime
+
+from api_ledger import ApiLedger
+from weather_config import read_ledger_stats
+
+def test_counts_legacy_call_log_until_ledger_exists(tmp_path, monkeypatch):
+    monkeypatch.setenv('WEATHER_CACHE_DIR', str(tmp_path))
+    monkeypatch.setenv('WEATHER_BACKEND', 'live')
+    now = datetime.now()
+    today = now.strftime('%Y-%m-%d')
+    (tmp_path / 'api_calls.json').write_text(json.dumps({
+        'today': today,
+        'calls_today': 3,
+        'history': [{'timestamp': f"{today}T08:00:00", 'endpoint': 'onecall', 'success': True},
+                    {'timestamp': f"{today}T09:00:00", 'endpoint': 'onecall', 'success': False},
+                    {'timestamp': '2020-01-01T09:00:00', 'endpoint': 'onecall', 'success': True}]
+    }))
+
+    stats = read_ledger_stats()
+    assert stats['calls_today'] == 3
+    assert stats['failed_calls_today'] == 1
+    assert stats['last_call'] == f"{today}T09:00:00"
+    assert not (tmp_path / 'api_ledger.sqlite3').exists()
+
+    # Once the service has created the ledger, it is the only source
+    ApiLedger(tmp_path / 'api_ledger.sqlite3').record('onecall', True, now)
+    assert read_ledger_stats()['calls_today'] == 1
+
+def test_missing_cache_dir_reads_as_no_calls(tmp_path, monkeypatch):
+    monkeypatch.setenv('WEATHER_CACHE_DIR', str(tmp_path / 'missing'))
+    monkeypatch.setenv('WEATHER_BACKEND', 'live')
+    assert read_ledger_stats()['calls_today'] == 0
@@ -0,0 +1,456 @@
+"""
+COMPILED TREE ENSEMBLE
+Flattens trained RandomForest / XGBoost / LightGBM models (and weighted
+ensembles of them) into contiguous NumPy arrays saved as .npz, plus a
+vectorized evaluator that needs only NumPy at serving time.
+
+Every split is stored as `x <= threshold` on float64 features:
+- sklearn/XGBoost float32 comparisons are mapped to the float32 cell edge
+- XGBoost's strict `x < t` becomes `x <= nextafter(edge, -inf)`
+- a StandardScaler applied before the model is folded into the thresholds
+Leaves point at themselves, so evaluation is a fixed number of gather steps.
+
+Usage: python tree_ensemble.py <model_package.pkl> [output.npz]
+"""
+import json
+import os
+import sys
+import warnings
+import numpy as np
+
+import model_artifacts
+from scaler_folding import float32_lower_edge, float32_upper_edge, scaler_affine
+
+# Identity-link objectives: raw margin is the prediction
+XGBOOST_OBJECTIVES = ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror', 'reg:quantileerror')
+LIGHTGBM_OBJECTIVES = ('regression', 'regression_l1', 'huber', 'fair', 'quantile', 'mape')
+
+class CompiledTreeEnsemble:
+    """Tree ensemble stored as flat node arrays: prediction = bias + sum(tree_weight * leaf value)"""
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'default_left', 'roots', 'tree_weight')
+
+    def __init__(self, feature, threshold, left, right, value, default_left, roots, tree_weight,
+                 bias=0.0, max_depth=None, metadata=None):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.tree_weight = np.asarray(tree_weight, dtype=np.float64)
+        self.bias = float(bias)
+        self.max_depth = self._depth() if max_depth is None else int(max_depth)
+        self.metadata = metadata or {}
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def _depth(self):
+        """Number of split levels in the deepest tree"""
+        depth = 0
+        frontier = self.roots
+        while True:
+            internal = frontier[self.left[frontier] != frontier]
+            if len(internal) == 0:
+                return depth
+            frontier = np.concatenate([self.left[internal], self.right[internal]])
+            depth += 1
+
+    def apply(self, X):
+        """Leaf node index reached in every tree, shape (rows, trees)"""
+        X = np.asarray(X, dtype=np.float64)
+        rows = np.arange(len(X))[:, None]
+        node = np.repeat(self.roots[None, :], len(X), axis=0)
+        check_missing = bool(np.isnan(X).any())
+
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[node]]
+            go_left = values <= self.threshold[node]
+            if check_missing:
+                go_left = np.where(np.isnan(values), self.default_left[node], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        return node
+
+    def predict(self, X):
+        """Predict for a 2D feature matrix (rows in training feature order)"""
+        return self.bias + self.value[self.apply(X)] @ self.tree_weight
+
+    def save(self, path):
+        """Save arrays plus JSON metadata as an uncompressed .npz (no pickled objects)"""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        np.savez(path,
+                 bias=np.float64(self.bias),
+                 max_depth=np.int32(self.max_depth),
+                 metadata=np.array(json.dumps(self.metadata)),
+                 **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Load an ensemble saved by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in cls.ARRAYS}
+            return cls(bias=float(data['bias']),
+                       max_depth=int(data['max_depth']),
+                       metadata=json.loads(str(data['metadata'])),
+                       **arrays)
+
+    def save_arrays(self, directory):
+        """Save each array as its own .npy so it can be memory-mapped (scalars go in the sidecar)"""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            # Replace rather than overwrite: running workers keep their mapping of the old file
+            path = os.path.join(directory, f"{name}.npy")
+            with open(f"{path}.tmp", 'wb') as f:
+                np.save(f, getattr(self, name))
+            os.replace(f"{path}.tmp", path)
+        return directory
+
+    @classmethod
+    def load_arrays(cls, directory, bias, max_depth, metadata=None, mmap_mode='r'):
+        """Load arrays saved by save_arrays(); with mmap_mode='r' workers share the page cache"""
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in cls.ARRAYS}
+        return cls(bias=bias, max_depth=max_depth, metadata=metadata, **arrays)
+
+    @classmethod
+    def combine(cls, ensembles, weights):
+        """Merge ensembles into one whose prediction is the weighted sum of theirs"""
+        parts = {name: [] for name in cls.ARRAYS}
+        offset = 0
+        bias = 0.0
+        for ensemble, weight in zip(ensembles, weights):
+            for name in ('feature', 'threshold', 'value', 'default_left'):
+                parts[name].append(getattr(ensemble, name))
+            parts['left'].append(ensemble.left + offset)
+            parts['right'].append(ensemble.right + offset)
+            parts['roots'].append(ensemble.roots + offset)
+            parts['tree_weight'].append(ensemble.tree_weight * weight)
+            bias += ensemble.bias * weight
+            offset += ensemble.n_nodes
+
+        return cls(bias=bias, **{name: np.concatenate(values) for name, values in parts.items()})
+
+class _TreeBuilder:
+    """Accumulates trees into flat node arrays"""
+
+    def __init__(self):
+        self.nodes = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'value', 'default_left')}
+        self.roots = []
+        self.n_nodes = 0
+
+    def add_tree(self, left, right, feature, threshold, value, default_left):
+        """Add one tree given per-node arrays (children -1 at leaves, root at index 0)"""
+        left = np.asarray(left, dtype=np.int64)
+        right = np.asarray(right, dtype=np.int64)
+        leaf = left == -1
+        own_index = np.arange(len(left))
+
+        self.nodes['left'].append(np.where(leaf, own_index, left) + self.n_nodes)
+        self.nodes['right'].append(np.where(leaf, own_index, right) + self.n_nodes)
+        self.nodes['feature'].append(np.where(leaf, 0, feature))
+        self.nodes['threshold'].append(np.where(leaf, 0.0, threshold))
+        self.nodes['value'].append(np.where(leaf, value, 0.0))
+        self.nodes['default_left'].append(np.asarray(default_left, dtype=bool))
+        self.roots.append(self.n_nodes)
+        self.n_nodes += len(left)
+
+    def build(self, tree_weight, bias=0.0):
+        arrays = {name: np.concatenate(values) for name, values in self.nodes.items()}
+        if np.isscalar(tree_weight):
+            tree_weight = np.full(len(self.roots), tree_weight)
+        return CompiledTreeEnsemble(roots=self.roots, tree_weight=tree_weight, bias=bias, **arrays)
+
+def _compile_sklearn(model, mean, scale):
+    """Compile a sklearn decision tree, RandomForest or ExtraTrees regressor"""
+    if hasattr(model, 'tree_'):
+        estimators = [model]
+    elif type(model).__name__ in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        estimators = list(model.estimators_)
+    else:
+        raise ValueError(f"Tree compilation not supported for {type(model).__name__}")
+
+    builder = _TreeBuilder()
+    for estimator in estimators:
+        tree = estimator.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("Tree compilation supports single-output regressors only")
+
+        internal = tree.children_left != -1
+        feature = np.where(internal, tree.feature, 0)
+        # sklearn compares float32(x) <= t
+        threshold = float32_upper_edge(tree.threshold) * scale[feature] + mean[feature]
+        default_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=bool))
+
+        builder.add_tree(tree.children_left, tree.children_right, feature, threshold,
+                         tree.value[:, 0, 0], default_left)
+
+    return builder.build(1.0 / len(estimators))
+
+def _compile_xgboost(model, mean, scale):
+    """Compile an XGBoost regressor or Booster from its JSON model"""
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    learner = json.loads(booster.save_raw('json'))['learner']
+
+    objective = learner['objective']['name']
+    if objective not in XGBOOST_OBJECTIVES:
+        raise ValueError(f"Tree compilation not supported for XGBoost objective '{objective}'")
+    if int(learner['learner_model_param'].get('num_target', 1)) != 1:
+        raise ValueError("Tree compilation supports single-target XGBoost models only")
+
+    gradient_booster = learner['gradient_booster']
+    tree_weights = None
+    if gradient_booster['name'] == 'dart':
+        tree_weights = gradient_booster.get('weight_drop')
+        gradient_booster = gradient_booster['gbtree']
+    if gradient_booster['name'] != 'gbtree':
+        raise ValueError(f"Tree compilation not supported for XGBoost booster '{gradient_booster['name']}'")
+
+    trees = gradient_booster['model']['trees']
+    if tree_weights is None:
+        tree_weights = [1.0] * len(trees)
+
+    # The sklearn wrapper predicts with the early-stopping best iteration only
+    try:
+        best_iteration = model.best_iteration if hasattr(model, 'get_booster') else None
+    except AttributeError:
+        best_iteration = None
+    if best_iteration is not None:
+        trees_per_iteration = int(gradient_booster['model']['gbtree_model_param'].get('num_parallel_tree', 1))
+        trees = trees[:(best_iteration + 1) * trees_per_iteration]
+        tree_weights = tree_weights[:len(trees)]
+
+    builder = _TreeBuilder()
+    for tree in trees:
+        if any(tree.get('split_type', [])):
+            raise ValueError("Tree compilation not supported for categorical XGBoost splits")
+
+        left = np.array(tree['left_children'])
+        feature = np.where(left != -1, np.array(tree['split_indices']), 0)
+        conditions = np.array(tree['split_conditions'], dtype=np.float64)
+        # XGBoost compares float32(x) < t; leaves store their value in split_conditions
+        edge = float32_lower_edge(conditions) * scale[feature] + mean[feature]
+        threshold = np.nextafter(edge, -np.inf)
+
+        builder.add_tree(left, tree['right_children'], feature, threshold, conditions,
+                         np.array(tree['default_left'], dtype=bool))
+
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+    return builder.build(np.array(tree_weights, dtype=np.float64), bias=base_score)
+
+def _compile_lightgbm(model, mean, scale):
+    """Compile a LightGBM regressor or Booster from its JSON dump"""
+    booster = model.booster_ if hasattr(model, 'booster_') else model
+    dump = booster.dump_model()
+
+    objective = dump.get('objective', '').split()[0] if dump.get('objective') else ''
+    if objective not in LIGHTGBM_OBJECTIVES:
+        raise ValueError(f"Tree compilation not supported for LightGBM objective '{objective}'")
+    if dump.get('num_tree_per_iteration', 1) != 1:
+        raise ValueError("Tree compilation supports single-output LightGBM models only")
+
+    builder = _TreeBuilder()
+    for info in dump['tree_info']:
+        nodes = []
+        stack = [(info['tree_structure'], -1, False)]
+        left, right = [], []
+
+        # Depth-first flatten; children indices are filled in once assigned
+        while stack:
+            node, parent, is_left = stack.pop()
+            index = len(nodes)
+            nodes.append(node)
+            left.append(-1)
+            right.append(-1)
+            if parent >= 0:
+                if is_left:
+                    left[parent] = index
+                else:
+                    right[parent] = index
+            if 'leaf_value' not in node:
+                stack.append((node['right_child'], index, False))
+                stack.append((node['left_child'], index, True))
+
+        feature = np.zeros(len(nodes), dtype=np.int64)
+        threshold = np.zeros(len(nodes))
+        value = np.zeros(len(nodes))
+        default_left = np.zeros(len(nodes), dtype=bool)
+
+        for index, node in enumerate(nodes):
+            if 'leaf_value' in node:
+                if 'leaf_coeff' in node:
+                    raise ValueError("Tree compilation not supported for LightGBM linear trees")
+                value[index] = node['leaf_value']
+                continue
+
+            if node['decision_type'] != '<=':
+                raise ValueError("Tree compilation not supported for categorical LightGBM splits")
+            if node['missing_type'] == 'Zero':
+                raise ValueError("Tree compilation not supported for LightGBM zero-as-missing splits")
+
+            f = node['split_feature']
+            feature[index] = f
+            threshold[index] = node['threshold'] * scale[f] + mean[f]
+            if node['missing_type'] == 'NaN':
+                default_left[index] = node['default_left']
+            else:
+                # Missing values are treated as zero
+                default_left[index] = 0.0 <= node['threshold']
+
+        builder.add_tree(left, right, feature, threshold, value, default_left)
+
+    n_trees = len(dump['tree_info'])
+    return builder.build(1.0 / n_trees if dump.get('average_output') else 1.0)
+
+def compile_model(model, scaler=None, n_features=None):
+    """
+    Flatten a fitted tree model into a CompiledTreeEnsemble
+
+    Args:
+        model: RandomForest/ExtraTrees/DecisionTree regressor, XGBoost or LightGBM
+            regressor/Booster, or a WeightedEnsemble of those
+        scaler: Optional StandardScaler applied before the model; it is folded
+            into the thresholds so the compiled model takes unscaled features
+        n_features: Number of input features (required with a scaler lacking mean_)
+
+    Raises:
+        ValueError: If the model type, objective or splits cannot be compiled
+    """
+    if n_features is None:
+        n_features = getattr(model, 'n_features_in_', None) or len(getattr(scaler, 'mean_', []))
+    mean, scale = scaler_affine(scaler, n_features)
+
+    if hasattr(model, 'models') and hasattr(model, 'weights'):
+        members = [compile_model(member, scaler, n_features) for member in model.models]
+        return CompiledTreeEnsemble.combine(members, model.weights)
+
+    module = type(model).__module__
+    if module.startswith('sklearn'):
+        return _compile_sklearn(model, mean, scale)
+    elif module.startswith('xgboost'):
+        return _compile_xgboost(model, mean, scale)
+    elif module.startswith('lightgbm'):
+        return _compile_lightgbm(model, mean, scale)
+
+    raise ValueError(f"Tree compilation not supported for {type(model).__name__}")
+
+def json_scalars(values):
+    """Keep only the JSON-serializable scalar entries of a metrics/info dict"""
+    result = {}
+    for key, value in (values or {}).items():
+        if isinstance(value, (bool, int, float, str, np.number)):
+            result[key] = value.item() if isinstance(value, np.number) else value
+    return result
+
+def probe_matrix(ensemble, n_features, rows=2000, seed=0):
+    """Feature rows straddling the ensemble's own split thresholds, for verification"""
+    rng = np.random.default_rng(seed)
+    internal = ensemble.left != np.arange(ensemble.n_nodes)
+    X = np.zeros((rows, n_features))
+
+    for f in range(n_features):
+        thresholds = ensemble.threshold[internal & (ensemble.feature == f)]
+        if len(thresholds) == 0:
+            continue
+        picks = rng.choice(thresholds, size=rows)
+        spread = max(np.ptp(thresholds), 1.0) * 1e-3
+        X[:, f] = picks + rng.choice([-1.0, 1.0], size=rows) * rng.uniform(0, spread, size=rows)
+
+    return X
+
+def max_probe_diff(ensemble, model, scaler=None, n_features=None):
+    """Max abs difference between the original model (and scaler) and the compiled ensemble on probe rows"""
+    n_features = n_features or int(ensemble.feature.max()) + 1
+    X = probe_matrix(ensemble, n_features)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = model.predict(scaler.transform(X) if scaler is not None else X)
+    return float(np.abs(expected - ensemble.predict(X)).max())
+
+def export_model_package(package_path, output_path=None):
+    """
+    Compile a joblib model package ({'model', 'feature_names', 'scaler', ...}) to .npz
+
+    Returns:
+        (output_path, max_abs_diff) - difference between the package's own
+        prediction path and the compiled model on threshold probe rows
+
+    Raises:
+        ValueError when the model cannot be compiled or the difference exceeds
+        model_artifacts.COMPILED_TOLERANCE (nothing is written)
+    """
+    import joblib
+
+    package = joblib.load(package_path)
+    if not isinstance(package, dict) or 'model' not in package:
+        package = {'model': package}
+
+    model = package['model']
+    scaler = package.get('scaler')
+    feature_names = list(package.get('feature_names') or [])
+    n_features = len(feature_names) or None
+
+    ensemble = compile_model(model, scaler, n_features)
+    ensemble.metadata = {
+        'feature_names': feature_names,
+        'model_type': type(model).__name__,
+        'metrics': json_scalars(package.get('metrics')),
+        'training_info': json_scalars(package.get('training_info')),
+        'source': os.path.basename(package_path),
+        'scaler_folded': scaler is not None
+    }
+    # Lets loaders tell whether the package was replaced after this export
+    ensemble.metadata.update(model_artifacts.package_stamp(package_path))
+
+    # Compare against the original model on rows around every split
+    max_abs_diff = max_probe_diff(ensemble, model, scaler, n_features)
+    ensemble.metadata['max_abs_diff'] = max_abs_diff
+    if max_abs_diff > model_artifacts.COMPILED_TOLERANCE:
+        raise ValueError(f"Compiled model differs from {os.path.basename(package_path)} by {max_abs_diff:.3e} "
+                         f"on probe rows (tolerance {model_artifacts.COMPILED_TOLERANCE:.0e})")
+
+    output_path = output_path or os.path.splitext(package_path)[0] + '.npz'
+    ensemble.save(output_path)
+    return output_path, max_abs_diff
+
+def load_export(package_path):
+    """
+    The .npz exported from a model package, or None when there is none or it is stale
+
+    An export is stale when the package beside it was replaced after export_model_package
+    (size or mtime changed), or when it predates the recorded package stamp.
+    """
+    compiled_path = os.path.splitext(package_path)[0] + '.npz'
+    if not os.path.exists(compiled_path):
+        return None
+
+    ensemble = CompiledTreeEnsemble.load(compiled_path)
+    if os.path.exists(package_path) and ('package_size' not in ensemble.metadata or
+                                         not model_artifacts.package_matches(ensemble.metadata, package_path)):
+        print(f"Compiled model {os.path.basename(compiled_path)} is stale, ignoring", file=sys.stderr)
+        return None
+    return ensemble
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python tree_ensemble.py <model_package.pkl> [output.npz]")
+        sys.exit(1)
+
+    try:
+        output_path, max_abs_diff = export_model_package(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    except ValueError as e:
+        print(f"Export failed: {e}")
+        sys.exit(1)
+    print(f"Compiled model saved to: {output_path}")
+    print(f"Max abs difference vs original model on probe rows: {max_abs_diff:.3e}")
+
+if __name__ == "__main__":
+    main()
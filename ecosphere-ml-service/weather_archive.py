@@ -0,0 +1,214 @@
+"""
+WEATHER ARCHIVE
+Every fetched forecast snapshot, kept as training data instead of being
+dropped after the cache TTL.
+
+Layout: <root>/site=<site_id>/<issue day>.npz, one compressed columnar file per
+site and local day of the forecast issue hour. Each row is one valid hour of
+one issue: issue_time and valid_time (epoch seconds), fetched_at, the
+WEATHER_FEATURES values and weather_main. Rows are unique on
+(site, valid hour, issue hour); a refetch within the same hour replaces its rows.
+
+IncrementalReader gives a consumer (the solar trainer) the archive as one
+table with the shortest-lead forecast per (site, valid hour), keeping its own
+accumulated copy plus a watermark so each run only opens partitions with issue
+hours it has not seen.
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+
+from solar_features import WEATHER_FEATURES
+
+COLUMNS = ('site_id', 'issue_time', 'valid_time', 'fetched_at', 'values', 'weather_main')
+
+def empty_table():
+    return {
+        'site_id': np.array([], dtype='U64'),
+        'issue_time': np.array([], dtype=np.int64),
+        'valid_time': np.array([], dtype=np.int64),
+        'fetched_at': np.array([], dtype=np.float64),
+        'values': np.empty((0, len(WEATHER_FEATURES)), dtype=np.float32),
+        'weather_main': np.array([], dtype='U32')
+    }
+
+def concat_tables(tables):
+    tables = [table for table in tables if len(table['valid_time'])]
+    if not tables:
+        return empty_table()
+    return {column: np.concatenate([table[column] for table in tables]) for column in COLUMNS}
+
+def take(table, index):
+    return {column: table[column][index] for column in COLUMNS}
+
+def dedupe(table, key_columns):
+    """Keep one row per key (the most recently fetched), sorted by key"""
+    if not len(table['valid_time']):
+        return table
+    # lexsort sorts by its last key first: key columns, then fetched_at within a key
+    order = np.lexsort([table['fetched_at']] + [table[column] for column in reversed(key_columns)])
+    table = take(table, order)
+    last_of_key = np.ones(len(order), dtype=bool)
+    same_as_next = np.ones(len(order) - 1, dtype=bool)
+    for column in key_columns:
+        same_as_next &= table[column][:-1] == table[column][1:]
+    last_of_key[:-1] = ~same_as_next
+    return take(table, last_of_key)
+
+def latest_per_valid_hour(table):
+    """Shortest-lead forecast per (site, valid hour): the row from the latest issue"""
+    table = dedupe(table, ('site_id', 'valid_time', 'issue_time'))
+    if not len(table['valid_time']):
+        return table
+    # Sorted by (site, valid, issue), so the last row of each (site, valid) group has the latest issue
+    last = np.ones(len(table['valid_time']), dtype=bool)
+    last[:-1] = ~((table['site_id'][:-1] == table['site_id'][1:]) &
+                  (table['valid_time'][:-1] == table['valid_time'][1:]))
+    return take(table, last)
+
+def to_frame(table):
+    """pandas DataFrame with a local 'timestamp' per valid hour and one column per weather feature"""
+    import pandas as pd
+
+    frame = pd.DataFrame(table['values'].astype(np.float64), columns=list(WEATHER_FEATURES))
+    frame.insert(0, 'timestamp', pd.to_datetime([datetime.fromtimestamp(t) for t in table['valid_time']]))
+    frame.insert(1, 'site_id', table['site_id'])
+    frame.insert(2, 'lead_hours', (table['valid_time'] - table['issue_time']) // 3600)
+    frame['weather_main'] = table['weather_main']
+    return frame
+
+class WeatherArchive:
+    def __init__(self, root):
+        """
+        Args:
+            root: Archive directory (created on first append)
+        """
+        self.root = os.fspath(root)
+
+    def _partition_path(self, site_id, issue_time):
+        day = datetime.fromtimestamp(issue_time).strftime('%Y-%m-%d')
+        return os.path.join(self.root, f"site={site_id}", f"{day}.npz")
+
+    def _load(self, path, site_id):
+        with np.load(path) as data:
+            rows = len(data['valid_time'])
+            table = {column: data[column] for column in COLUMNS if column != 'site_id'}
+        table['site_id'] = np.full(rows, site_id, dtype='U64')
+        return table
+
+    def append(self, site_id, snapshot):
+        """
+        Archive the present hours of a HourlyWeather snapshot
+
+        Returns:
+            Number of rows in the snapshot's partition after the merge
+        """
+        slots = np.flatnonzero(snapshot.present)
+        if not len(slots):
+            return 0
+
+        issue_time = int(snapshot.fetched_at // 3600 * 3600)
+        new = {
+            'site_id': np.full(len(slots), site_id, dtype='U64'),
+            'issue_time': np.full(len(slots), issue_time, dtype=np.int64),
+            'valid_time': (snapshot.start + 3600 * slots).astype(np.int64),
+            'fetched_at': np.full(len(slots), snapshot.fetched_at, dtype=np.float64),
+            'values': snapshot.values[slots].astype(np.float32),
+            'weather_main': np.array([snapshot.weather_main[slot] or '' for slot in slots], dtype='U32')
+        }
+
+        path = self._partition_path(site_id, issue_time)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            table = concat_tables([self._load(path, site_id), new])
+        except (OSError, ValueError, KeyError):
+            table = new  # missing or unreadable partition
+        table = dedupe(table, ('issue_time', 'valid_time'))
+
+        # Write atomically so concurrent readers never see a partial partition
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **{column: table[column] for column in COLUMNS if column != 'site_id'})
+        os.replace(tmp_path, path)
+        return len(table['valid_time'])
+
+    def partitions(self, since_day=None):
+        """[(site_id, day, path)] for every partition, optionally from since_day ('YYYY-MM-DD') on"""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for site_dir in sorted(os.listdir(self.root)):
+            if not site_dir.startswith('site='):
+                continue
+            site_path = os.path.join(self.root, site_dir)
+            for name in sorted(os.listdir(site_path)):
+                day = name[:-len('.npz')]
+                if name.endswith('.npz') and '.tmp' not in name and (since_day is None or day >= since_day):
+                    found.append((site_dir[len('site='):], day, os.path.join(site_path, name)))
+        return found
+
+    def read(self, since=None, until=None):
+        """
+        Rows issued after since and before until (epoch seconds, either optional)
+
+        Only partitions on or after since's day are opened.
+        """
+        since_day = datetime.fromtimestamp(since).strftime('%Y-%m-%d') if since is not None else None
+        tables = []
+        for site_id, _, path in self.partitions(since_day):
+            try:
+                table = self._load(path, site_id)
+            except (OSError, ValueError, KeyError):
+                continue
+            keep = np.ones(len(table['valid_time']), dtype=bool)
+            if since is not None:
+                keep &= table['issue_time'] > since
+            if until is not None:
+                keep &= table['issue_time'] < until
+            tables.append(take(table, keep))
+        return concat_tables(tables)
+
+class IncrementalReader:
+    def __init__(self, archive, state_path):
+        """
+        Args:
+            archive: WeatherArchive to read
+            state_path: .npz holding this consumer's accumulated table and watermark
+        """
+        self.archive = archive
+        self.state_path = os.fspath(state_path)
+
+    def _load_state(self):
+        try:
+            with np.load(self.state_path) as data:
+                table = {column: data[column] for column in COLUMNS}
+                return table, int(data['watermark'])
+        except (OSError, ValueError, KeyError):
+            return empty_table(), None
+
+    def load(self, now=None):
+        """
+        Accumulated shortest-lead table including issue hours archived since the last load
+
+        Only completed issue hours are consumed, so a refetch later in the
+        current hour cannot change rows already past the watermark.
+
+        Returns:
+            (table, number of new archive rows read)
+        """
+        table, watermark = self._load_state()
+        current_hour = int((datetime.now().timestamp() if now is None else now) // 3600 * 3600)
+        new = self.archive.read(since=watermark, until=current_hour)
+
+        if len(new['valid_time']):
+            table = latest_per_valid_hour(concat_tables([table, new]))
+            watermark = int(new['issue_time'].max())
+
+            state_dir = os.path.dirname(self.state_path)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp.npz"
+            np.savez_compressed(tmp_path, watermark=watermark, **table)
+            os.replace(tmp_path, self.state_path)
+
+        return table, len(new['valid_time'])
@@ -0,0 +1,231 @@
+"""
+WEATHER BACKENDS
+Pluggable transport under OpenWeatherClient, selected with WEATHER_BACKEND:
+- live:   the OpenWeather API (default)
+- record: the live API, saving every OneCall response to WEATHER_RECORD_DIR
+- replay: recorded responses served deterministically without the network,
+          with injected latency and failures; a synthetic forecast is served
+          when nothing has been recorded
+
+Backends are requests transport adapters mounted on the client's session, so
+retries, timeouts, the circuit breaker and quota accounting run exactly as
+they do against the live API.
+
+Replay settings:
+    WEATHER_REPLAY_LATENCY_MS   added to every response (default 0)
+    WEATHER_REPLAY_JITTER_MS    uniform extra latency (default 0)
+    WEATHER_REPLAY_FAILURE_RATE fraction of requests answered with HTTP 503 (default 0)
+    WEATHER_REPLAY_SEED         seed for jitter and failures (default 0)
+"""
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from weather_config import backend_mode
+
+DEFAULT_RECORD_DIR = Path(__file__).parent / 'weather_recordings'
+
+def _query_coordinates(url):
+    query = parse_qs(urlsplit(url).query)
+    return float(query['lat'][0]), float(query['lon'][0])
+
+def synthetic_onecall(lat, lon, now):
+    """Deterministic 48-hour OneCall-shaped forecast starting at the current hour"""
+    first_hour = int(now // 3600 * 3600)
+    hourly = []
+    for i in range(48):
+        dt = first_hour + 3600 * i
+        local_hour = time.localtime(dt).tm_hour
+        sun = max(0.0, math.sin((local_hour - 6) * math.pi / 15))
+        clouds = int(40 + 35 * math.sin(i / 7.0))
+        hourly.append({
+            'dt': dt,
+            'temp': round(5 + 10 * sun, 2),
+            'humidity': 60 - int(20 * sun),
+            'pressure': 1015,
+            'dew_point': -2.0,
+            'uvi': round(4 * sun * (1 - clouds / 150), 2),
+            'clouds': clouds,
+            'visibility': 10000,
+            'wind_speed': 3.5,
+            'wind_deg': 240,
+            'weather': [{'main': 'Clouds' if clouds > 50 else 'Clear',
+                         'description': 'broken clouds' if clouds > 50 else 'clear sky'}]
+        })
+    return {'lat': lat, 'lon': lon, 'timezone_offset': 0, 'current': dict(hourly[0]), 'hourly': hourly}
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that saves every successful OneCall response (never the request URL, which carries the API key)"""
+
+    def __init__(self, record_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.record_dir = Path(record_dir)
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        self.recorded = 0
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            try:
+                lat, lon = _query_coordinates(request.url)
+                recorded_at = time.time()
+                path = self.record_dir / f"onecall_{lat:.4f}_{lon:.4f}_{int(recorded_at)}.json"
+                with open(path, 'w') as f:
+                    json.dump({'lat': lat, 'lon': lon, 'recorded_at': recorded_at, 'response': response.json()}, f)
+                self.recorded += 1
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Failed to record OneCall response: {e}", file=sys.stderr)
+        return response
+
+    def stats(self):
+        return {'mode': 'record', 'recorded': self.recorded, 'record_dir': str(self.record_dir)}
+
+class ReplayAdapter(BaseAdapter):
+    """Transport answering OneCall requests from recordings, shifted to the current hour"""
+
+    def __init__(self, record_dir, latency=0.0, jitter=0.0, failure_rate=0.0, seed=0, shift_time=True):
+        """
+        Args:
+            record_dir: Directory of RecordingAdapter files
+            latency: Seconds added to every response
+            jitter: Maximum extra seconds, drawn uniformly per request
+            failure_rate: Fraction of requests answered with HTTP 503
+            seed: Seed for jitter and failure draws (same seed, same sequence)
+            shift_time: Move each recording's timestamps so its first hour is the current hour
+        """
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.shift_time = shift_time
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next = {}
+        self.counters = {'requests': 0, 'served': 0, 'failures': 0, 'timeouts': 0, 'synthetic': 0}
+
+        # (lat, lon) -> recorded responses in recording order
+        self.recordings = {}
+        record_dir = Path(record_dir)
+        for path in sorted(record_dir.glob('onecall_*.json')) if record_dir.is_dir() else []:
+            try:
+                with open(path, 'r') as f:
+                    entry = json.load(f)
+                self.recordings.setdefault((entry['lat'], entry['lon']), []).append(
+                    (entry['recorded_at'], entry['response']))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Skipping recording {path.name}: {e}", file=sys.stderr)
+        for responses in self.recordings.values():
+            responses.sort(key=lambda item: item[0])
+
+    @classmethod
+    def from_env(cls, record_dir):
+        return cls(
+            record_dir,
+            latency=float(os.getenv('WEATHER_REPLAY_LATENCY_MS', '0')) / 1000.0,
+            jitter=float(os.getenv('WEATHER_REPLAY_JITTER_MS', '0')) / 1000.0,
+            failure_rate=float(os.getenv('WEATHER_REPLAY_FAILURE_RATE', '0')),
+            seed=int(os.getenv('WEATHER_REPLAY_SEED', '0'))
+        )
+
+    def _payload(self, lat, lon, now):
+        """Next recording for the nearest recorded site (round-robin per site), or a synthetic forecast"""
+        if not self.recordings:
+            self.counters['synthetic'] += 1
+            return synthetic_onecall(lat, lon, now)
+
+        site = min(self.recordings, key=lambda key: (key[0] - lat) ** 2 + (key[1] - lon) ** 2)
+        responses = self.recordings[site]
+        index = self._next.get(site, 0)
+        self._next[site] = (index + 1) % len(responses)
+        payload = json.loads(json.dumps(responses[index][1]))
+
+        hourly = payload.get('hourly') or []
+        if self.shift_time and hourly:
+            shift = int(now // 3600 * 3600) - int(hourly[0]['dt'] // 3600 * 3600)
+            for entry in hourly:
+                entry['dt'] += shift
+            for key in ('dt', 'sunrise', 'sunset'):
+                if key in payload.get('current', {}):
+                    payload['current'][key] += shift
+        return payload
+
+    def _response(self, request, status, payload=None):
+        response = requests.Response()
+        response.status_code = status
+        response.reason = 'OK' if status == 200 else 'Service Unavailable'
+        response._content = json.dumps(payload if payload is not None else {'cod': status}).encode('utf-8')
+        response.headers['Content-Type'] = 'application/json'
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        lat, lon = _query_coordinates(request.url)
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+
+        with self._lock:
+            self.counters['requests'] += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            payload = None if failed else self._payload(lat, lon, time.time())
+
+        if read_timeout is not None and delay > read_timeout:
+            time.sleep(read_timeout)
+            with self._lock:
+                self.counters['timeouts'] += 1
+            raise requests.exceptions.ReadTimeout(f"Replayed response slower than the {read_timeout}s timeout",
+                                                  request=request)
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            self.counters['failures' if failed else 'served'] += 1
+        return self._response(request, 503) if failed else self._response(request, 200, payload)
+
+    def close(self):
+        pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats.update({
+            'mode': 'replay',
+            'recorded_sites': len(self.recordings),
+            'recordings': sum(len(responses) for responses in self.recordings.values()),
+            'latency_ms': round(self.latency * 1000, 1),
+            'failure_rate': self.failure_rate
+        })
+        return stats
+
+def install(session, mode=None, record_dir=None):
+    """
+    Mount the configured backend on a requests session
+
+    Returns:
+        The mounted adapter, or None for the live backend
+    """
+    mode = mode or backend_mode()
+    record_dir = record_dir or os.getenv('WEATHER_RECORD_DIR') or DEFAULT_RECORD_DIR
+
+    if mode == 'live':
+        return None
+    if mode == 'record':
+        adapter = RecordingAdapter(record_dir, pool_connections=4, pool_maxsize=4)
+    else:
+        adapter = ReplayAdapter.from_env(record_dir)
+
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    print(f"Weather backend: {mode} ({record_dir})", file=sys.stderr)
+    return adapter
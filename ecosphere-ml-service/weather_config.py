@@ -0,0 +1,59 @@
+"""
+WEATHER CONFIG
+Settings and paths shared by the weather service and its lightweight readers
+(get_api_stats.py, forecasts without weather). Importing this module has no
+side effects and pulls in neither requests nor numpy.
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+
+from api_ledger import read_day_counts, read_json_day_counts
+
+BACKEND_MODES = ('live', 'record', 'replay')
+LEDGER_FILE = 'api_ledger.sqlite3'
+# Call log used before the ledger; imported when the weather service first starts
+LEGACY_CALL_LOG = 'api_calls.json'
+
+def backend_mode():
+    """Configured weather backend (WEATHER_BACKEND, see weather_backends.py)"""
+    mode = os.getenv('WEATHER_BACKEND', 'live').lower()
+    if mode not in BACKEND_MODES:
+        raise ValueError(f"Unknown WEATHER_BACKEND '{mode}', expected one of {BACKEND_MODES}")
+    return mode
+
+def weather_cache_dir(mode=None):
+    """Weather cache directory (WEATHER_CACHE_DIR; replayed forecasts get their own ledger, quota, snapshots and archive)"""
+    default_cache_dir = Path(__file__).parent / 'weather_cache'
+    if (mode or backend_mode()) == 'replay':
+        default_cache_dir = default_cache_dir / 'replay'
+    return Path(os.getenv('WEATHER_CACHE_DIR') or default_cache_dir)
+
+def max_calls_per_day():
+    return int(os.getenv('WEATHER_MAX_CALLS_PER_DAY', '950'))
+
+def read_ledger_stats():
+    """
+    Today's API usage counters, read from the shared ledger without starting the weather service
+
+    The ledger is opened read-only: nothing is created, migrated or pruned.
+    Until the ledger exists the legacy api_calls.json is counted instead, and
+    a missing cache directory reads as no calls.
+    """
+    daily_limit = max_calls_per_day()
+    today = datetime.now().strftime('%Y-%m-%d')
+    ledger_path = weather_cache_dir() / LEDGER_FILE
+    if ledger_path.exists():
+        calls_today, failures_today, last_call = read_day_counts(ledger_path, today)
+    else:
+        calls_today, failures_today, last_call = read_json_day_counts(weather_cache_dir() / LEGACY_CALL_LOG, today)
+
+    return {
+        'calls_today': calls_today,
+        'failed_calls_today': failures_today,
+        'max_calls_per_day': daily_limit,
+        'remaining_calls': daily_limit - calls_today,
+        'last_reset': f"{today}T00:00:00",
+        'last_call': last_call,
+        'today': today
+    }
@@ -0,0 +1,109 @@
+"""
+WEATHER PREFETCH
+Keeps weather snapshots for a configured set of sites fresh in the background,
+so dashboard requests find a current snapshot instead of waiting on the API.
+
+An asyncio loop on a daemon thread checks every site each `interval` seconds
+and refreshes, a few at a time, those whose snapshot is missing or within
+`lead_time` seconds of the cache TTL. Refreshes use the 'background' quota
+class, so they never eat into the headroom kept for interactive requests.
+
+Sites come from WEATHER_PREFETCH_SITES as "lat,lon;lat,lon".
+"""
+import asyncio
+import sys
+import threading
+
+def parse_sites(text):
+    """Parse "lat,lon;lat,lon" into [(lat, lon), ...]"""
+    sites = []
+    for item in (text or '').split(';'):
+        if item.strip():
+            lat, lon = item.split(',')
+            sites.append((float(lat), float(lon)))
+    return sites
+
+class WeatherPrefetcher:
+    def __init__(self, weather_service, sites, interval=30, lead_time=90, concurrency=4):
+        """
+        Args:
+            weather_service: WeatherService whose snapshots are refreshed
+            sites: [(lat, lon), ...] to keep fresh
+            interval: Seconds between checks
+            lead_time: Refresh this many seconds before a snapshot leaves the cache TTL
+            concurrency: Maximum refreshes in flight at once
+        """
+        self.weather_service = weather_service
+        self.sites = list(sites)
+        self.interval = interval
+        self.lead_time = lead_time
+        self.concurrency = concurrency
+
+        self.counters = {'checks': 0, 'refreshes': 0, 'deferred': 0, 'failures': 0}
+        self._thread = None
+        self._loop = None
+        self._stop = None
+
+    def _refresh_age(self):
+        """Snapshot age at which a site is due for a refresh"""
+        return max(0, self.weather_service.cache_ttl - self.lead_time)
+
+    def _due_sites(self):
+        due = []
+        for lat, lon in self.sites:
+            age = self.weather_service.snapshot_age(lat, lon)
+            if age is None or age >= self._refresh_age():
+                due.append((lat, lon))
+        return due
+
+    async def _refresh(self, semaphore, lat, lon):
+        async with semaphore:
+            try:
+                snapshot = await asyncio.get_running_loop().run_in_executor(
+                    None, self.weather_service.refresh_snapshot, lat, lon, 'background', self._refresh_age()
+                )
+            except Exception as e:
+                self.counters['failures'] += 1
+                print(f"Weather prefetch failed for {lat},{lon}: {e}", file=sys.stderr)
+                return
+
+            # A stale snapshot back means the quota deferred the call; retry on the next check
+            if snapshot is not None and snapshot.age_seconds < self._refresh_age():
+                self.counters['refreshes'] += 1
+            else:
+                self.counters['deferred'] += 1
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        while not self._stop.is_set():
+            self.counters['checks'] += 1
+            due = await self._loop.run_in_executor(None, self._due_sites)
+            if due:
+                await asyncio.gather(*(self._refresh(semaphore, lat, lon) for lat, lon in due))
+
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the prefetch loop on a daemon thread (no-op without sites)"""
+        if self._thread is None and self.sites:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name='weather-prefetch', daemon=True)
+            self._thread.start()
+            print(f"Weather prefetch started for {len(self.sites)} site(s)", file=sys.stderr)
+
+    def stop(self):
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['sites'] = len(self.sites)
+        return stats
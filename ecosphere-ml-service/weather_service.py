@@ -1,11 +1,19 @@
 import requests
 import os
-import json
 from datetime import datetime, timedelta
-import hashlib
-import time
-from pathlib import Path
 import sys
+import threading
+
+import weather_backends
+from api_ledger import ApiLedger
+from hourly_weather import HourlyWeather
+from kv_store import KVStore
+from openweather_client import OpenWeatherClient
+from quota import QuotaScheduler
+from weather_archive import WeatherArchive
+from single_flight import SingleFlight
+from weather_config import LEDGER_FILE, LEGACY_CALL_LOG, max_calls_per_day, read_ledger_stats, weather_cache_dir
+from site_registry import site_registry
 
 class WeatherService:
     def __init__(self, api_key=None):
@@ -15,131 +23,184 @@ class WeatherService:
             # Fallback to a test key if none provided
             self.api_key = ''
             
-        self.base_url = "https://api.openweathermap.org/data/3.0/onecall"
-        self.cache_dir = Path(__file__).parent / 'weather_cache'
-        self.cache_dir.mkdir(exist_ok=True)
+        # Pooled HTTP client with retries and a circuit breaker; every attempt counts against the quota
+        self.client = OpenWeatherClient(
+            self.api_key,
+            on_attempt=lambda success: self._log_api_call('onecall', success=success)
+        )
+        self.base_url = self.client.base_url
+        
+        # Live API, or record/replay for offline runs (see weather_backends.py)
+        self.backend_mode = weather_backends.backend_mode()
+        self.backend = weather_backends.install(self.client.session, self.backend_mode)
+        
+        self.cache_dir = weather_cache_dir(self.backend_mode)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.single_flight = SingleFlight(self.cache_dir / 'locks')
+        
+        # One forecast snapshot per (site, fetch hour); date ranges are sliced from it
+        self.sites = site_registry
+        self.cache_ttl = 600
+        self.snapshot_store = KVStore(self.cache_dir / 'snapshots.sqlite3')
+        self.snapshot_retention = 48 * 3600
         
-        # Rate limiting (950 calls/day)
-        self.max_calls_per_day = 950
-        self.call_log_file = self.cache_dir / 'api_calls.json'
-        self._init_call_log()
+        # Every fetched snapshot is also archived as training data (WEATHER_ARCHIVE_DIR='' disables)
+        archive_dir = os.getenv('WEATHER_ARCHIVE_DIR', str(self.cache_dir / 'archive'))
+        self.archive = WeatherArchive(archive_dir) if archive_dir else None
+        self._snapshots = {}  # location -> latest HourlyWeather seen by this process
+        self._lock = threading.Lock()
+        
+        # Stale-while-revalidate (long-lived workers): serve the latest snapshot at once and refresh it in the background
+        self.stale_while_revalidate = False
+        self._revalidating = set()
+        
+        # Rate limiting (950 calls/day), counted in a ledger shared by all worker processes
+        self.max_calls_per_day = max_calls_per_day()
+        self.call_log_file = self.cache_dir / LEGACY_CALL_LOG
+        self.ledger = ApiLedger(self.cache_dir / LEDGER_FILE)
+        self.ledger.migrate_json_log(self.call_log_file)
+        
+        # Token bucket pacing the daily budget, with headroom kept for interactive requests
+        self.quota = QuotaScheduler(
+            self.cache_dir / LEDGER_FILE,
+            daily_budget=self.max_calls_per_day,
+            capacity=int(os.getenv('WEATHER_QUOTA_BURST', '60')),
+            reserve=int(os.getenv('WEATHER_QUOTA_RESERVE', '20'))
+        )
         
         print(f"WeatherService initialized with API key: {'Yes' if self.api_key else 'No'}", file=sys.stderr)
         
-    def _init_call_log(self):
-        """Initialize or load API call log"""
-        if not self.call_log_file.exists():
-            self.call_log = {
-                'today': datetime.now().strftime('%Y-%m-%d'),
-                'calls_today': 0,
-                'last_reset': datetime.now().isoformat(),
-                'history': []
-            }
-            self._save_call_log()
-        else:
-            with open(self.call_log_file, 'r') as f:
-                self.call_log = json.load(f)
-            
-            # Reset if it's a new day
-            today = datetime.now().strftime('%Y-%m-%d')
-            if self.call_log['today'] != today:
-                self.call_log['today'] = today
-                self.call_log['calls_today'] = 0
-                self.call_log['last_reset'] = datetime.now().isoformat()
-                self._save_call_log()
-    
-    def _save_call_log(self):
-        """Save API call log to file"""
-        with open(self.call_log_file, 'w') as f:
-            json.dump(self.call_log, f, indent=2)
-    
-    def _check_rate_limit(self):
-        """Check if we can make another API call"""
+    def _check_rate_limit(self, priority='interactive'):
+        """Check if we can make another API call (daily cap, then a token for this priority)"""
         today = datetime.now().strftime('%Y-%m-%d')
+        if self.ledger.calls_on(today) >= self.max_calls_per_day:
+            print(f"Daily limit reached ({self.max_calls_per_day}/day)", file=sys.stderr)
+            return False
         
-        if self.call_log['today'] != today:
-            # New day, reset counter
-            self.call_log['today'] = today
-            self.call_log['calls_today'] = 0
-            self.call_log['last_reset'] = datetime.now().isoformat()
+        if not self.quota.acquire(priority):
+            print(f"Quota paced for {priority} requests, next token in "
+                  f"{self.quota.seconds_until(priority):.0f}s", file=sys.stderr)
+            return False
         
-        return self.call_log['calls_today'] < self.max_calls_per_day
+        return True
     
     def _log_api_call(self, endpoint, success=True):
         """Log an API call"""
-        self.call_log['calls_today'] += 1
-        self.call_log['history'].append({
-            'timestamp': datetime.now().isoformat(),
-            'endpoint': endpoint,
-            'success': success
-        })
+        calls_today = self.ledger.record(endpoint, success, datetime.now())
         
-        # Keep only last 1000 entries
-        if len(self.call_log['history']) > 1000:
-            self.call_log['history'] = self.call_log['history'][-1000:]
+        print(f"API calls today: {calls_today}/{self.max_calls_per_day}", file=sys.stderr)
+    
+    def _snapshot_location(self, lat, lon):
+        """Location part of a snapshot key: the site nearby coordinates share snapshots under"""
+        return self.sites.resolve(lat, lon, track=False).site_id
+    
+    def _site_coordinates(self, lat, lon):
+        """Coordinates of the site a location belongs to, used for every cache, quota and API decision"""
+        site = self.sites.resolve(lat, lon, track=False)
+        return site.lat, site.lon
+    
+    def _get_snapshot_key(self, lat, lon, fetch_time):
+        """Snapshot key: site plus the hour the forecast was fetched in"""
+        return f"{self._snapshot_location(lat, lon)}_{fetch_time.strftime('%Y%m%d%H')}"
+    
+    def _read_entry(self, entry):
+        """HourlyWeather from a snapshot store entry, or None if in an older format"""
+        _, stored_at, value = entry
+        try:
+            # Snapshots written before fetched_at was stored are dated by their write time
+            return HourlyWeather.from_dict(value.get('data'), fetched_at=stored_at)
+        except (ValueError, AttributeError, KeyError, TypeError):
+            return None
+    
+    def _get_latest_snapshot(self, lat, lon, max_age=None):
+        """
+        Most recent snapshot for a location regardless of age
         
-        self._save_call_log()
+        The in-process copy is used while younger than max_age (default: the
+        cache TTL); otherwise disk is checked for a newer one from another process.
+        """
+        location = self._snapshot_location(lat, lon)
+        with self._lock:
+            remembered = self._snapshots.get(location)
+        if remembered is not None and remembered.age_seconds <= (self.cache_ttl if max_age is None else max_age):
+            return remembered
         
-        print(f"API calls today: {self.call_log['calls_today']}/{self.max_calls_per_day}", file=sys.stderr)
+        # Another process may have fetched a newer one: one indexed read of the site's newest entry
+        entry = self.snapshot_store.latest(location)
+        snapshot = self._read_entry(entry) if entry is not None else None
+        if snapshot is not None and (remembered is None or snapshot.fetched_at > remembered.fetched_at):
+            self._remember_snapshot(location, snapshot)
+            return snapshot
+        return remembered
     
-    def _get_cache_key(self, lat, lon, start_date, end_date):
-        """Generate cache key for weather data"""
-        cache_str = f"{lat}_{lon}_{start_date}_{end_date}"
-        return hashlib.md5(cache_str.encode()).hexdigest()
+    def _get_fresh_snapshot(self, lat, lon, max_age=None):
+        """Latest snapshot for a location if fetched within max_age seconds (default: the 10 minute TTL)"""
+        max_age = self.cache_ttl if max_age is None else max_age
+        snapshot = self._get_latest_snapshot(lat, lon, max_age)
+        if snapshot is not None and snapshot.age_seconds <= max_age:
+            return snapshot
+        return None
     
-    def _get_cache_path(self, cache_key):
-        """Get cache file path"""
-        return self.cache_dir / f"{cache_key}.json"
+    def _remember_snapshot(self, location, snapshot):
+        with self._lock:
+            self._snapshots[location] = snapshot
+            if len(self._snapshots) > 64:
+                del self._snapshots[min(self._snapshots, key=lambda key: self._snapshots[key].fetched_at)]
     
-    def _is_cache_valid(self, cache_path, max_age_minutes=10):
-        """Check if cache is still valid"""
-        if not cache_path.exists():
-            return False
-        
-        # Check file age
-        file_age = time.time() - cache_path.stat().st_mtime
-        return file_age <= (max_age_minutes * 60)
+    def snapshot_age(self, lat, lon):
+        """Seconds since the latest snapshot for a location was fetched, None if there is none"""
+        lat, lon = self._site_coordinates(lat, lon)
+        snapshot = self._get_latest_snapshot(lat, lon)
+        return None if snapshot is None else snapshot.age_seconds
     
     def get_cached_weather(self, lat, lon, start_date, end_date):
-        """Get weather from cache if available and fresh"""
-        cache_key = self._get_cache_key(lat, lon, start_date, end_date)
-        cache_path = self._get_cache_path(cache_key)
-        
-        if self._is_cache_valid(cache_path):
-            print(f"Using cached weather data (fresh)", file=sys.stderr)
-            with open(cache_path, 'r') as f:
-                return json.load(f)
+        """Get weather for a date range from a fresh cached snapshot, if any"""
+        lat, lon = self._site_coordinates(lat, lon)
+        snapshot = self._get_fresh_snapshot(lat, lon)
+        if snapshot is None:
+            return None
         
-        return None
+        print(f"Using cached weather data (fresh)", file=sys.stderr)
+        return self._slice_range(snapshot, start_date, end_date)
+    
+    def _slice_range(self, snapshot, start_date, end_date):
+        """Hours of a snapshot falling on start_date through end_date (inclusive)"""
+        range_start = datetime.strptime(start_date, "%Y-%m-%d")
+        range_end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+        return snapshot.between(range_start, range_end)
     
-    def _save_to_cache(self, lat, lon, start_date, end_date, data):
-        """Save weather data to cache"""
-        cache_key = self._get_cache_key(lat, lon, start_date, end_date)
-        cache_path = self._get_cache_path(cache_key)
-        
-        with open(cache_path, 'w') as f:
-            json.dump({
-                'data': data,
-                'cached_at': datetime.now().isoformat(),
-                'lat': lat,
-                'lon': lon,
-                'date_range': f"{start_date}_{end_date}"
-            }, f, indent=2)
-        
-        print(f"Saved weather data to cache", file=sys.stderr)
+    def _save_to_cache(self, lat, lon, snapshot_key, snapshot):
+        """Save a snapshot to the store and drop snapshots that no longer cover any future hour"""
+        location = self._snapshot_location(lat, lon)
+        
+        # One transaction per write, so concurrent readers never see a partial entry
+        self.snapshot_store.put(snapshot_key, {
+            'data': snapshot.to_dict(),
+            'cached_at': datetime.now().isoformat(),
+            'lat': lat,
+            'lon': lon
+        }, self.snapshot_retention, group=location)
+        self._remember_snapshot(location, snapshot)
+        self.snapshot_store.purge_expired()
+        
+        print(f"Saved weather snapshot to cache", file=sys.stderr)
     
-    def get_weather_forecast(self, lat, lon, start_date, end_date, force_fresh=False):
+    def get_weather_forecast(self, lat, lon, start_date, end_date, force_fresh=False, priority='interactive'):
         """
         Get weather forecast with caching and rate limiting
         Returns forecast for maximum 48 hours from current time
+        
+        Every date range is sliced from one snapshot per (location, fetch hour),
+        so range variants share a single API call. priority is 'interactive'
+        (dashboard) or 'background' (prefetch, which must leave quota headroom).
         """
         try:
             print(f"Getting weather for {lat},{lon} from {start_date} to {end_date}", file=sys.stderr)
+            lat, lon = self._site_coordinates(lat, lon)
             
             # Calculate date range constraints
             current_time = datetime.now()
             end_date_dt = datetime.strptime(end_date, "%Y-%m-%d")
-            start_date_dt = datetime.strptime(start_date, "%Y-%m-%d")
             
             # Adjust to max 48 hours from now
             max_end_date = current_time + timedelta(hours=48)
@@ -148,102 +209,31 @@ class WeatherService:
                 end_date_dt = max_end_date
                 end_date = end_date_dt.strftime("%Y-%m-%d")
             
-            # Check cache first (unless force_fresh)
-            if not force_fresh:
-                cached_data = self.get_cached_weather(lat, lon, start_date, end_date)
-                if cached_data:
-                    return cached_data['data']
-            
-            # Check rate limit
-            if not self._check_rate_limit():
-                print(f"Rate limit reached ({self.max_calls_per_day}/day). Using cached data if available.", file=sys.stderr)
-                # Try to get any cached data, even if not fresh
-                cache_key = self._get_cache_key(lat, lon, start_date, end_date)
-                cache_path = self._get_cache_path(cache_key)
-                if cache_path.exists():
-                    with open(cache_path, 'r') as f:
-                        cached = json.load(f)
-                        print(f"Using cached weather data (stale)", file=sys.stderr)
-                        return cached['data']
-                return None
-            
-            # Make API call
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'appid': self.api_key,
-                'units': 'metric',
-                'exclude': 'minutely,daily,alerts'
-            }
-            
-            print(f"Fetching fresh weather data from API...", file=sys.stderr)
-            print(f"   URL: {self.base_url}", file=sys.stderr)
-            print(f"   Params: lat={lat}, lon={lon}", file=sys.stderr)
-            
-            response = requests.get(self.base_url, params=params, timeout=15)
-            response.raise_for_status()
-            weather_data = response.json()
-            
-            # Log successful API call
-            self._log_api_call('onecall', success=True)
-            
-            # Process ALL 48 hours of forecasts
-            forecasts = {}
-            total_hours_collected = 0
-            
-            # We need to collect up to 48 hours
-            hour_offset = 0
-            while total_hours_collected < 48 and hour_offset < 48:
-                target_time = current_time + timedelta(hours=hour_offset)
-                date_str = target_time.strftime("%Y-%m-%d")
-                hour = target_time.hour
-                
-                # Initialize date if not exists
-                if date_str not in forecasts:
-                    forecasts[date_str] = []
-                
-                # Find closest hourly forecast
-                closest_forecast = self._find_closest_hourly(weather_data['hourly'], target_time)
-                if closest_forecast:
-                    forecasts[date_str].append({
-                        'hour': hour,
-                        'timestamp': target_time.isoformat(),
-                        'uv_index': closest_forecast.get('uvi', 0),
-                        'temperature_c': closest_forecast.get('temp', 15),
-                        'humidity_pct': closest_forecast.get('humidity', 50),
-                        'pressure_kpa': closest_forecast.get('pressure', 1013) / 10.0,
-                        'dew_point_c': closest_forecast.get('dew_point', 10),
-                        'wind_speed_ms': closest_forecast.get('wind_speed', 3),
-                        'wind_direction_deg': closest_forecast.get('wind_deg', 0),
-                        'clouds_pct': closest_forecast.get('clouds', 50),
-                        'visibility_m': closest_forecast.get('visibility', 10000),
-                        'precipitation_mmh': self._get_precipitation(closest_forecast),
-                        'weather_main': closest_forecast.get('weather', [{}])[0].get('main', 'Clear'),
-                        'weather_description': closest_forecast.get('weather', [{}])[0].get('description', 'clear sky'),
-                        'is_daylight': 1 if 6 <= hour <= 21 else 0  # Add daylight flag
-                    })
-                    total_hours_collected += 1
+            if force_fresh:
+                snapshot_key = self._get_snapshot_key(lat, lon, current_time)
+                snapshot = self._fetch_snapshot(lat, lon, snapshot_key, current_time, priority)
+            else:
+                # Check cache first
+                snapshot = self._get_fresh_snapshot(lat, lon)
+                if snapshot is not None:
+                    print(f"Using cached weather data (fresh)", file=sys.stderr)
+                elif self.stale_while_revalidate:
+                    # Serve the latest snapshot now if it covers the range, refresh it off the request path
+                    snapshot = self._get_latest_snapshot(lat, lon)
+                    if snapshot is not None and self._slice_range(snapshot, start_date, end_date).present.any():
+                        print(f"Using cached weather data (stale, {snapshot.age_seconds:.0f}s old), "
+                              f"refreshing in background", file=sys.stderr)
+                        self._revalidate(lat, lon, priority)
+                    else:
+                        snapshot = None
                 
-                hour_offset += 1
+                if snapshot is None:
+                    snapshot = self.refresh_snapshot(lat, lon, priority)
             
-            # Debug: show what we got
-            print(f"Received weather data for:", file=sys.stderr)
-            for date_str, hours in forecasts.items():
-                if hours:
-                    daylight_hours = [h for h in hours if h['is_daylight'] == 1]
-                    nighttime_hours = [h for h in hours if h['is_daylight'] == 0]
-                    print(f"   {date_str}: {len(hours)} total hours ({len(daylight_hours)} daylight, {len(nighttime_hours)} nighttime)", file=sys.stderr)
-            
-            print(f"   Total: {total_hours_collected} hours collected for 48-hour window", file=sys.stderr)
-            
-            # Cache the results
-            self._save_to_cache(lat, lon, start_date, end_date, forecasts)
-            
-            return forecasts
+            return self._slice_range(snapshot, start_date, end_date) if snapshot is not None else None
             
         except requests.exceptions.RequestException as e:
             print(f"Weather API error: {e}", file=sys.stderr)
-            self._log_api_call('onecall', success=False)
             return None
         except Exception as e:
             print(f"Unexpected error in get_weather_forecast: {e}", file=sys.stderr)
@@ -251,36 +241,135 @@ class WeatherService:
             traceback.print_exc(file=sys.stderr)
             return None
     
-    def _find_closest_hourly(self, hourly_data, target_time):
-        """Find closest hourly forecast to target time"""
-        target_timestamp = target_time.timestamp()
+    def refresh_snapshot(self, lat, lon, priority='background', max_age=None):
+        """
+        Fetch a new snapshot for a location; only one process calls the API for it at a time
         
-        closest = None
-        min_diff = float('inf')
+        A snapshot younger than max_age (default: the cache TTL) that another
+        process fetched meanwhile is returned instead of calling the API again.
+        """
+        lat, lon = self._site_coordinates(lat, lon)
+        current_time = datetime.now()
+        snapshot_key = self._get_snapshot_key(lat, lon, current_time)
+        
+        return self.single_flight.run(
+            snapshot_key,
+            lambda: self._fetch_snapshot(lat, lon, snapshot_key, current_time, priority),
+            lambda: self._get_fresh_snapshot(lat, lon, max_age),
+            timeout=30
+        )
+    
+    def _revalidate(self, lat, lon, priority):
+        """Refresh a location's snapshot on a background thread (at most one per location)"""
+        location = self._snapshot_location(lat, lon)
+        with self._lock:
+            if location in self._revalidating:
+                return
+            self._revalidating.add(location)
         
-        for forecast in hourly_data:
-            diff = abs(forecast['dt'] - target_timestamp)
-            if diff < min_diff:
-                min_diff = diff
-                closest = forecast
+        def run():
+            try:
+                self.refresh_snapshot(lat, lon, priority)
+            except Exception as e:
+                print(f"Background weather refresh failed for {location}: {e}", file=sys.stderr)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(location)
         
-        return closest if min_diff <= 3600 else None
+        threading.Thread(target=run, name=f"weather-revalidate-{location}", daemon=True).start()
     
-    def _get_precipitation(self, forecast):
-        """Extract precipitation amount"""
-        rain = forecast.get('rain', {}).get('1h', 0)
-        snow = forecast.get('snow', {}).get('1h', 0)
-        return rain + snow
+    def _fetch_snapshot(self, lat, lon, snapshot_key, current_time, priority='interactive'):
+        """Call the API (rate limit permitting) and cache the 48-hour snapshot"""
+        # Check rate limit
+        if not self._check_rate_limit(priority):
+            print(f"Rate limit reached. Using cached data if available.", file=sys.stderr)
+            # Try to get any cached data, even if not fresh
+            snapshot = self._get_latest_snapshot(lat, lon)
+            if snapshot is not None:
+                print(f"Using cached weather data (stale)", file=sys.stderr)
+            return snapshot
+        
+        # Make API call for the site the snapshot is keyed by
+        query_lat, query_lon = self._site_coordinates(lat, lon)
+        
+        print(f"Fetching fresh weather data from API...", file=sys.stderr)
+        print(f"   URL: {self.base_url}", file=sys.stderr)
+        print(f"   Params: lat={query_lat}, lon={query_lon}", file=sys.stderr)
+        
+        attempts_before = self.client.counters['attempts']
+        try:
+            weather_data = self.client.fetch_onecall(query_lat, query_lon)
+        except requests.exceptions.RequestException as e:
+            # Upstream degraded or unreachable: serve the last good snapshot if there is one
+            print(f"Weather API error: {e}", file=sys.stderr)
+            snapshot = self._get_latest_snapshot(lat, lon)
+            if snapshot is None:
+                raise
+            print(f"Using cached weather data (stale)", file=sys.stderr)
+            return snapshot
+        finally:
+            # One token was taken for the fetch; settle retries (or a call the open circuit never made)
+            self.quota.charge(self.client.counters['attempts'] - attempts_before - 1)
+        
+        # Align forecasts to the current hour and the 48 hours after it
+        snapshot = HourlyWeather.from_onecall(weather_data['hourly'], current_time, hours=49)
+        
+        # Debug: show what we got
+        print(f"Received weather data for:", file=sys.stderr)
+        for date_str, (total, daylight) in snapshot.hours_by_date().items():
+            print(f"   {date_str}: {total} total hours ({daylight} daylight, {total - daylight} nighttime)", file=sys.stderr)
+        
+        print(f"   Total: {int(snapshot.present.sum())} hours collected for 48-hour window", file=sys.stderr)
+        
+        # Cache the snapshot
+        self._save_to_cache(lat, lon, snapshot_key, snapshot)
+        
+        if self.archive is not None:
+            try:
+                self.archive.append(self._snapshot_location(lat, lon), snapshot)
+            except (OSError, ValueError) as e:
+                print(f"Failed to archive weather snapshot: {e}", file=sys.stderr)
+        
+        return snapshot
     
     def get_api_stats(self):
         """Get API usage statistics"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        calls_today, failures_today, last_call = self.ledger.day_counts(today)
+        
         return {
-            'calls_today': self.call_log['calls_today'],
+            'calls_today': calls_today,
+            'failed_calls_today': failures_today,
             'max_calls_per_day': self.max_calls_per_day,
-            'remaining_calls': self.max_calls_per_day - self.call_log['calls_today'],
-            'last_reset': self.call_log['last_reset'],
-            'today': self.call_log['today']
+            'remaining_calls': self.max_calls_per_day - calls_today,
+            'last_reset': f"{today}T00:00:00",
+            'last_call': last_call,
+            'today': today,
+            'http': self.client.stats(),
+            'quota': self.quota.stats(),
+            'backend': self.backend.stats() if self.backend is not None else {'mode': 'live'}
         }
 
-# Singleton instance with API key
-weather_service = WeatherService()
\ No newline at end of file
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_weather_service():
+    """The process-wide WeatherService, created on first use"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = WeatherService()
+    return _instance
+
+def __getattr__(name):
+    # `from weather_service import weather_service` still works, but only builds the service when imported by name
+    if name == 'weather_service':
+        return get_weather_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def read_api_stats():
+    """API usage counters: the live service's once created in this process, otherwise read-only from the ledger"""
+    if _instance is not None:
+        return _instance.get_api_stats()
+    return read_ledger_stats()